@@ -0,0 +1,199 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..opponents.opponents import DEFAULT_SCALE, mirror_states
+from ..simulator.constants import *
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+symmetries = [
+    "left_right",  # Mirror about the centre line between the goals, swapping players
+    "top_bottom",  # Mirror about the line through both goals
+    "both",  # Both mirrors, a half turn of the board swapping players
+]
+
+# Frame axes reversed by each symmetry, for (..., H, W, 3) frames
+_FLIP_AXES = {"left_right": (-2,), "top_bottom": (-3,), "both": (-3, -2)}
+
+# Arrays holding agent states, or frames when they have image dimensions
+STATE_KEYS = ["states", "next_states", "observations", "next_observations"]
+FRAME_KEYS = ["frames", "next_frames"]
+
+# Columns holding y positions and y velocities of agent states
+_KEYS = KlaskSimulator.agent_state_keys
+_Y_POSITIONS = [i for i, key in enumerate(_KEYS) if key.endswith("pos_y")]
+_Y_VELOCITIES = [i for i, key in enumerate(_KEYS) if key.endswith("vel_y")]
+
+# Biscuit 2 starts above biscuit 3, top-bottom mirrors swap them to keep that layout
+_BISCUIT_SWAP = [i for i, key in enumerate(_KEYS) if key.startswith("biscuit2")] + [
+    i for i, key in enumerate(_KEYS) if key.startswith("biscuit3")
+]
+_BISCUIT_SWAPPED = _BISCUIT_SWAP[4:] + _BISCUIT_SWAP[:4]
+
+# Game state bits of each player, in the bitmask layout of rollout shards
+_P1_BITS = sum(
+    1 << state.value for state in KlaskSimulator.GameStates if 1 <= state.value <= 4
+)
+_P2_BITS = _P1_BITS << 4
+_PLAYING_BIT = 1 << KlaskSimulator.GameStates.PLAYING.value
+
+
+def flip_states(states, symmetry, scale=DEFAULT_SCALE):
+    # Mirror agent state arrays, in KlaskSimulator.agent_state_keys order
+    if symmetry in ["left_right", "both"]:
+        states = mirror_states(states, scale)
+    else:
+        states = np.array(states, dtype=np.float64, copy=True)
+
+    if symmetry in ["top_bottom", "both"]:
+        states[..., _Y_POSITIONS] = KG_BOARD_HEIGHT * scale - states[..., _Y_POSITIONS]
+        states[..., _Y_VELOCITIES] = -states[..., _Y_VELOCITIES]
+        states[..., _BISCUIT_SWAP] = states[..., _BISCUIT_SWAPPED]
+    return states
+
+
+def flip_actions(actions, symmetry):
+    # Mirror normalized actions, either (N, 2) of one player or (N, 4) of player 1
+    # then player 2. Left-right mirrors swap the players of (N, 4) actions.
+    actions = np.array(actions, copy=True)
+    if symmetry in ["left_right", "both"]:
+        actions[..., 0::2] = -actions[..., 0::2]
+        if actions.shape[-1] == 4:
+            actions = actions[..., [2, 3, 0, 1]]
+    if symmetry in ["top_bottom", "both"]:
+        actions[..., 1::2] = -actions[..., 1::2]
+    return actions
+
+
+def flip_players(players, symmetry):
+    # Swap player 1 and player 2 under left-right mirrors
+    players = np.array(players, copy=True)
+    if symmetry in ["left_right", "both"]:
+        players = 3 - players
+    return players
+
+
+def flip_game_states(game_states, symmetry):
+    # Swap the game states of both players in bitmasks of KlaskSimulator.GameStates
+    game_states = np.array(game_states, copy=True)
+    if symmetry in ["left_right", "both"]:
+        game_states = (
+            (game_states & _PLAYING_BIT)
+            | ((game_states & _P1_BITS) << 4)
+            | ((game_states & _P2_BITS) >> 4)
+        ).astype(game_states.dtype)
+    return game_states
+
+
+def flip_rewards(rewards, terminals, symmetry):
+    # KlaskEnv rewards winning and losing with opposite signs, so left-right mirrors
+    # negate the rewards of terminal steps. The staying alive reward is unchanged.
+    rewards = np.array(rewards, copy=True)
+    if symmetry in ["left_right", "both"]:
+        rewards = np.where(terminals, -rewards, rewards).astype(rewards.dtype)
+    return rewards
+
+
+class MirrorAugmenter:
+    """Produces the mirrored counterparts of batches of transitions."""
+
+    def __init__(self, flips=None, scale=DEFAULT_SCALE):
+        # Produce every symmetry by default
+        self.symmetries = symmetries if flips is None else list(flips)
+        assert all(symmetry in symmetries for symmetry in self.symmetries)
+        self.scale = scale
+
+        # Empty board and its asymmetric pixels (the logos), created with the first frame
+        self.board = None
+        self.masks = None
+
+    def __call__(self, arrays):
+        # Return the transitions followed by each of their mirrored counterparts, with a
+        # "symmetry" array indexing ["none"] + symmetries. Outputs are preallocated and
+        # filled in place. Episode indices of mirrored copies are offset to stay unique.
+        length = len(next(iter(arrays.values())))
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        if "actions" in arrays and arrays["actions"].shape[-1] == 2:
+            arrays.setdefault("players", np.ones(length, dtype=np.uint8))
+
+        copies = 1 + len(self.symmetries)
+        augmented = {}
+        for name, array in arrays.items():
+            output = np.empty((copies * length,) + array.shape[1:], dtype=array.dtype)
+            output[:length] = array
+            for index, symmetry in enumerate(self.symmetries, start=1):
+                rows = slice(index * length, (index + 1) * length)
+                if self.__is_frame(name, array):
+                    self.flip_frames(array, symmetry, out=output[rows])
+                else:
+                    output[rows] = self.__flip_array(name, array, arrays, symmetry)
+            augmented[name] = output
+
+        augmented["symmetry"] = np.repeat(np.arange(copies, dtype=np.uint8), length)
+        if "episodes" in arrays and length:
+            offset = arrays["episodes"].max() + 1
+            augmented["episodes"] += augmented["symmetry"] * offset
+        return augmented
+
+    def flip(self, arrays, symmetry):
+        # Mirror a batch of transitions, arrays that do not change are passed through
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        return {
+            name: (
+                self.flip_frames(array, symmetry)
+                if self.__is_frame(name, array)
+                else self.__flip_array(name, array, arrays, symmetry)
+            )
+            for name, array in arrays.items()
+        }
+
+    def flip_frames(self, frames, symmetry, out=None):
+        # Flip (N, H, W, 3) or channel-first (N, 3, H, W) frames in their own layout,
+        # which is much faster. The board logos are not symmetric, so their pixels are
+        # restored wherever no body covers them.
+        channel_first = frames.shape[-1] != 3
+        axes = _FLIP_AXES[symmetry]
+        if channel_first:
+            axes = tuple(axis + 1 for axis in axes)
+
+        if out is None:
+            out = np.empty_like(frames)
+        np.copyto(out, np.flip(frames, axes))
+
+        board, flipped_board, mask = self.__board(symmetry)
+        view = np.moveaxis(out, -3, -1) if channel_first else out
+        region = view[:, mask]
+        background = (region == flipped_board[mask]).all(-1)
+        view[:, mask] = np.where(background[..., None], board[mask], region)
+        return out
+
+    def __is_frame(self, name, array):
+        return name in FRAME_KEYS or (name in STATE_KEYS and array.ndim == 4)
+
+    def __flip_array(self, name, array, arrays, symmetry):
+        # Mirror any array other than frames, unknown arrays are passed through
+        if name in STATE_KEYS:
+            return flip_states(array, symmetry, self.scale).astype(array.dtype)
+        if name == "actions":
+            return flip_actions(array, symmetry)
+        if name == "players":
+            return flip_players(array, symmetry)
+        if name == "game_states":
+            return flip_game_states(array, symmetry)
+        if name == "rewards":
+            return flip_rewards(array, arrays["terminals"], symmetry)
+        return array
+
+    def __board(self, symmetry):
+        # Render the empty board once, then find the pixels each flip changes
+        if self.board is None:
+            sim = KlaskSimulator(render_mode="rgb_array")
+            self.board = sim.render_board()
+            self.masks = {}
+            for name, axes in _FLIP_AXES.items():
+                flipped_board = np.flip(self.board, axes)
+                self.masks[name] = flipped_board, (flipped_board != self.board).any(-1)
+
+        flipped_board, mask = self.masks[symmetry]
+        return self.board, flipped_board, mask
@@ -0,0 +1,103 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import struct
+import zlib
+
+import numpy as np
+
+# Message types
+MSG_HELLO = 1  # Worker announces its block of environments, worker -> learner
+MSG_RESET = 2  # Learner resets every environment of a worker, learner -> worker
+MSG_STEP = 3  # Learner sends one action per environment, learner -> worker
+MSG_RESULT = 4  # Observations and step results of a block, worker -> learner
+MSG_CLOSE = 5  # Learner is done, the worker exits, learner -> worker
+
+# Message layouts (little endian, no padding)
+HEADER = struct.Struct("<B")
+HELLO = struct.Struct("<BHB")  # type, environments, observation type index
+RESET = struct.Struct("<BBQ")  # type, has seed, seed of the first environment
+STEP = struct.Struct("<BH")  # type, environments, followed by float32 actions
+RESULT = struct.Struct("<BHBI")  # type, environments, flags, payload size
+CLOSE = struct.Struct("<B")  # type
+
+# Result flags
+FLAG_COMPRESSED = 1  # Payload is zlib compressed
+
+# Observation types, indexed in hello messages
+OBSERVATION_TYPES = ["frame", "state"]
+
+
+def recv_exact(sock, size):
+    # Receive exactly size bytes, raising ConnectionError if the peer closes
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed by peer")
+        received += count
+    return bytes(buffer)
+
+
+def encode_step(actions):
+    # Pack a (N, 2) array of actions
+    actions = np.ascontiguousarray(actions, dtype="<f4")
+    return STEP.pack(MSG_STEP, len(actions)) + actions.tobytes()
+
+
+def decode_step(count, payload):
+    return np.frombuffer(payload, dtype="<f4").reshape(count, 2)
+
+
+def encode_result(
+    observations, rewards, terminated, truncated, terminal_observations, compress
+):
+    # Pack the results of one block. Terminal observations follow for every
+    # environment that ended, in environment order.
+    payload = b"".join(
+        [
+            np.ascontiguousarray(rewards, dtype="<f4").tobytes(),
+            np.ascontiguousarray(terminated, dtype=np.uint8).tobytes(),
+            np.ascontiguousarray(truncated, dtype=np.uint8).tobytes(),
+            np.ascontiguousarray(observations).tobytes(),
+        ]
+        + [np.ascontiguousarray(obs).tobytes() for obs in terminal_observations]
+    )
+
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_COMPRESSED
+    return RESULT.pack(MSG_RESULT, len(observations), flags, len(payload)) + payload
+
+
+def decode_result(count, flags, payload, observation_space):
+    # Unpack the results of one block, returns observations, rewards, terminated,
+    # truncated and a dict of terminal observations keyed by environment index
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+
+    offset = 0
+
+    def take(dtype, shape):
+        nonlocal offset
+        array = np.frombuffer(
+            payload, dtype=dtype, count=int(np.prod(shape)), offset=offset
+        ).reshape(shape)
+        offset += array.nbytes
+        return array
+
+    rewards = take("<f4", (count,))
+    terminated = take(np.uint8, (count,)).astype(bool)
+    truncated = take(np.uint8, (count,)).astype(bool)
+    observations = take(observation_space.dtype, (count, *observation_space.shape))
+
+    terminal_observations = {}
+    for index in np.flatnonzero(terminated | truncated):
+        terminal_observations[int(index)] = take(
+            observation_space.dtype, observation_space.shape
+        )
+
+    return observations, rewards, terminated, truncated, terminal_observations
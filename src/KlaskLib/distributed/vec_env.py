@@ -0,0 +1,240 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+import selectors
+import socket
+
+import numpy as np
+
+from ..environment.environment import KlaskEnv
+from .protocol import *
+
+
+class KlaskDistributedVecEnv(VecEnv):
+    """
+    Vectorized environment aggregating blocks of environments hosted by rollout
+    workers, which connect over TCP from this or other hosts.
+
+    Each worker fills one slot of envs_per_worker environments. A worker that fails
+    or times out leaves its slot vacant until the next worker connects, without
+    holding up the other workers. The environments of a vacant slot report a
+    truncated episode every step, with info["worker_failed"] set.
+    """
+
+    def __init__(
+        self,
+        num_workers,
+        envs_per_worker,
+        host="0.0.0.0",
+        port=0,
+        observation_type="frame",
+        timeout=60.0,
+    ):
+        assert observation_type in OBSERVATION_TYPES, "Invalid observation type"
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.observation_type = observation_type
+        self.timeout = timeout
+
+        # Spaces match the environments hosted by the workers
+        env = KlaskEnv(render_mode=None, observation_type=observation_type)
+        super().__init__(
+            num_workers * envs_per_worker, env.observation_space, env.action_space
+        )
+        env.close()
+
+        # Listen for workers, spare workers wait in the backlog until needed. The
+        # selector tells when a worker is waiting, so vacant slots are filled without
+        # blocking.
+        self.listener = socket.create_server((host, port), backlog=64)
+        self.listener.settimeout(timeout)
+        self.port = self.listener.getsockname()[1]
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+        self.workers = [None] * num_workers
+        self.failed = [False] * num_workers
+        self.started = False
+        self.observations = np.zeros(
+            (self.num_envs, *self.observation_space.shape),
+            dtype=self.observation_space.dtype,
+        )
+
+    def reset(self):
+        # Wait for a worker in every slot on the first reset only, later resets fill
+        # vacant slots with waiting workers and otherwise leave them vacant
+        if not self.started:
+            for slot in range(self.num_workers):
+                self.workers[slot] = self.__accept_worker(block=True)
+            self.started = True
+        self.__fill_vacant_slots()
+
+        seeds = self._seeds
+        for slot in range(self.num_workers):
+            if self.workers[slot] is not None:
+                self.__send_reset(slot, seeds[slot * self.envs_per_worker])
+        for slot in range(self.num_workers):
+            if self.workers[slot] is None:
+                continue
+            try:
+                self.__block(self.observations, slot)[:] = self.__receive(slot)[0]
+            except OSError:
+                self.__drop_worker(slot)
+
+        self._reset_seeds()
+        self._reset_options()
+        return self.observations.copy()
+
+    def step_async(self, actions):
+        for slot in range(self.num_workers):
+            if self.workers[slot] is None:
+                continue
+            try:
+                self.workers[slot].sendall(
+                    encode_step(self.__block(np.asarray(actions), slot))
+                )
+            except OSError:
+                self.failed[slot] = True
+
+    def step_wait(self):
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos = [{} for _ in range(self.num_envs)]
+
+        for slot in range(self.num_workers):
+            start = slot * self.envs_per_worker
+            if self.workers[slot] is not None:
+                try:
+                    observations, block_rewards, terminated, truncated, terminal = (
+                        self.__receive(slot)
+                    )
+                except OSError:
+                    self.__drop_worker(slot)
+                else:
+                    self.__block(self.observations, slot)[:] = observations
+                    self.__block(rewards, slot)[:] = block_rewards
+                    self.__block(dones, slot)[:] = terminated | truncated
+                    for i, terminal_observation in terminal.items():
+                        infos[start + i] = {
+                            "terminal_observation": terminal_observation,
+                            "TimeLimit.truncated": bool(
+                                truncated[i] and not terminated[i]
+                            ),
+                        }
+                    continue
+
+            # The slot has no worker, end its episodes on their last observations
+            for i in range(self.envs_per_worker):
+                infos[start + i] = {
+                    "terminal_observation": self.observations[start + i].copy(),
+                    "TimeLimit.truncated": True,
+                    "worker_failed": True,
+                }
+            self.__block(dones, slot)[:] = True
+
+        # Workers that connected since fill vacant slots, and start new episodes
+        self.__fill_vacant_slots()
+        return self.observations.copy(), rewards, dones, infos
+
+    def close(self):
+        # Release the workers, they exit once the session is closed
+        for slot, sock in enumerate(self.workers):
+            if sock is not None:
+                try:
+                    sock.sendall(CLOSE.pack(MSG_CLOSE))
+                except OSError:
+                    pass
+                sock.close()
+                self.workers[slot] = None
+        self.selector.close()
+        self.listener.close()
+
+    def get_attr(self, attr_name, indices=None):
+        # Remote environments are headless, other attributes are not available
+        if attr_name == "render_mode":
+            return [None for _ in self._get_indices(indices)]
+        raise AttributeError(f"{attr_name} is not available on remote environments")
+
+    def set_attr(self, attr_name, value, indices=None):
+        raise AttributeError(f"{attr_name} can not be set on remote environments")
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        raise AttributeError(f"{method_name} can not be called on remote environments")
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def __block(self, array, slot):
+        # View of the rows of an array that belong to one worker slot
+        start = slot * self.envs_per_worker
+        return array[start : start + self.envs_per_worker]
+
+    def __accept_worker(self, block=False):
+        # Accept a worker with a matching block of environments. Without blocking,
+        # returns None once no worker is waiting.
+        while True:
+            if not block and not self.selector.select(timeout=0):
+                return None
+
+            sock, _ = self.listener.accept()
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.settimeout(self.timeout)
+                _, num_envs, observation_type = HELLO.unpack(
+                    recv_exact(sock, HELLO.size)
+                )
+            except OSError:
+                sock.close()
+                continue
+
+            if (
+                num_envs == self.envs_per_worker
+                and OBSERVATION_TYPES[observation_type] == self.observation_type
+            ):
+                return sock
+            sock.close()
+
+    def __fill_vacant_slots(self):
+        # Give vacant slots to waiting workers, which reset their environments
+        for slot in range(self.num_workers):
+            if self.workers[slot] is not None:
+                continue
+
+            sock = self.__accept_worker()
+            if sock is None:
+                return
+            self.workers[slot] = sock
+            self.__send_reset(slot, None)
+            try:
+                self.__block(self.observations, slot)[:] = self.__receive(slot)[0]
+            except OSError:
+                self.__drop_worker(slot)
+
+    def __drop_worker(self, slot):
+        # Close a failed worker, leaving its slot vacant
+        self.workers[slot].close()
+        self.workers[slot] = None
+        self.failed[slot] = False
+
+    def __send_reset(self, slot, seed):
+        try:
+            self.workers[slot].sendall(
+                RESET.pack(MSG_RESET, seed is not None, 0 if seed is None else seed)
+            )
+        except OSError:
+            self.failed[slot] = True
+
+    def __receive(self, slot):
+        # Receive the results of one worker
+        if self.failed[slot]:
+            raise ConnectionError("Worker failed")
+
+        sock = self.workers[slot]
+        msg_type, count, flags, size = RESULT.unpack(recv_exact(sock, RESULT.size))
+        if msg_type != MSG_RESULT or count != self.envs_per_worker:
+            raise ConnectionError("Unexpected message from worker")
+        return decode_result(
+            count, flags, recv_exact(sock, size), self.observation_space
+        )
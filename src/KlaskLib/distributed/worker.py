@@ -0,0 +1,131 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from gymnasium.wrappers import TimeLimit
+
+import socket
+import time
+
+import numpy as np
+
+from ..environment.environment import KlaskEnv
+from ..opponents.opponents import opponents
+from .protocol import *
+
+
+class KlaskRolloutWorker:
+    """Hosts a block of environments stepped on behalf of a remote learner."""
+
+    def __init__(
+        self,
+        num_envs,
+        observation_type="frame",
+        opponent=None,
+        max_episode_steps=1000,
+        compress=True,
+    ):
+        assert observation_type in OBSERVATION_TYPES, "Invalid observation type"
+        self.observation_type = observation_type
+        self.compress = compress
+
+        # Headless environments, frames are still rendered as observations
+        self.envs = [
+            TimeLimit(
+                KlaskEnv(
+                    render_mode=None,
+                    observation_type=observation_type,
+                    opponent=None if opponent is None else opponents[opponent](),
+                ),
+                max_episode_steps=max_episode_steps,
+            )
+            for _ in range(num_envs)
+        ]
+
+    def run(self, host, port, reconnect_delay=1.0, max_reconnects=None):
+        # Serve a learner until it closes the session, reconnecting whenever the
+        # connection is lost
+        reconnects = 0
+        while True:
+            try:
+                with socket.create_connection((host, port)) as sock:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    reconnects = 0
+                    if self.__serve(sock):
+                        return
+            except OSError:
+                pass
+
+            reconnects += 1
+            if max_reconnects is not None and reconnects > max_reconnects:
+                raise ConnectionError(f"Could not reach a learner at {host}:{port}")
+            time.sleep(reconnect_delay)
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+    def __serve(self, sock):
+        # Handle messages until the learner closes the session (True) or the
+        # connection drops (raises)
+        sock.sendall(
+            HELLO.pack(
+                MSG_HELLO,
+                len(self.envs),
+                OBSERVATION_TYPES.index(self.observation_type),
+            )
+        )
+
+        while True:
+            (msg_type,) = HEADER.unpack(recv_exact(sock, HEADER.size))
+
+            if msg_type == MSG_RESET:
+                _, has_seed, seed = RESET.unpack(
+                    bytes([msg_type]) + recv_exact(sock, RESET.size - HEADER.size)
+                )
+                observations = np.stack(
+                    [
+                        env.reset(seed=seed + i if has_seed else None)[0]
+                        for i, env in enumerate(self.envs)
+                    ]
+                )
+                zeros = np.zeros(len(self.envs))
+                sock.sendall(
+                    encode_result(observations, zeros, zeros, zeros, [], self.compress)
+                )
+
+            elif msg_type == MSG_STEP:
+                _, count = STEP.unpack(
+                    bytes([msg_type]) + recv_exact(sock, STEP.size - HEADER.size)
+                )
+                actions = decode_step(count, recv_exact(sock, count * 2 * 4))
+                sock.sendall(self.__step(actions))
+
+            elif msg_type == MSG_CLOSE:
+                return True
+
+            else:
+                raise ConnectionError(f"Unknown message type {msg_type}")
+
+    def __step(self, actions):
+        # Step every environment, resetting the ones that end
+        observations = []
+        rewards = np.zeros(len(self.envs), dtype=np.float32)
+        terminated = np.zeros(len(self.envs), dtype=bool)
+        truncated = np.zeros(len(self.envs), dtype=bool)
+        terminal_observations = []
+
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, rewards[i], terminated[i], truncated[i], _ = env.step(action)
+            if terminated[i] or truncated[i]:
+                terminal_observations.append(observation)
+                observation, _ = env.reset()
+            observations.append(observation)
+
+        return encode_result(
+            np.stack(observations),
+            rewards,
+            terminated,
+            truncated,
+            terminal_observations,
+            self.compress,
+        )
@@ -21,32 +21,136 @@ class KlaskEnv(gym.Env):
         "render_fps": 120,
     }
 
-    def __init__(self, render_mode="rgb_array"):
+    observation_types = [
+        "frame",  # Rendered frame (channel-first)
+        "state",  # Agent state vector, in pixel units
+        "half_frame",  # Own half of the board (channel-first), and the agent state vector
+    ]
+
+    stall_modes = [
+        "truncate",  # Truncate the episode once the game stalls
+        "skip_render",  # Keep the episode, reusing the last frame while the game stalls
+    ]
+
+    # Drift of a stalled body after which skipped frames are rendered again (pixels)
+    STALL_MAX_DRIFT = 0.5
+
+    def __init__(
+        self,
+        render_mode="rgb_array",
+        observation_type="frame",
+        opponent=None,
+        physics=None,
+        record_contacts=False,
+        stall_ticks=None,
+        stall_mode="truncate",
+        stall_impulse=0.0,
+        max_episode_steps=None,
+        start_states=None,
+        start_state_probability=1.0,
+    ):
         super().__init__()
 
-        # Initialize simulator
-        assert render_mode in self.metadata["render_modes"], "Invalid render mode"
-        self.sim = KlaskSimulator(render_mode=render_mode)
+        # Initialize simulator, frame observations are rendered even without a render mode
+        assert (
+            render_mode is None or render_mode in self.metadata["render_modes"]
+        ), "Invalid render mode"
+        assert observation_type in self.observation_types, "Invalid observation type"
+        self.render_mode = render_mode
+        self.observation_type = observation_type
+        sim_render_mode = render_mode
+        if render_mode is None and observation_type in ["frame", "half_frame"]:
+            sim_render_mode = "rgb_array"
+        self.sim = KlaskSimulator(
+            render_mode=sim_render_mode,
+            physics=physics,
+            record_contacts=record_contacts,
+            detect_stalls=stall_ticks is not None,
+        )
+        self.record_contacts = record_contacts
+
+        # Stall handling, after stall_ticks quiescent ticks. Savings of truncation are
+        # counted against max_episode_steps, usually that of the TimeLimit wrapper.
+        assert stall_mode in self.stall_modes, "Invalid stall mode"
+        self.stall_ticks = stall_ticks
+        self.stall_mode = stall_mode
+        self.sim.stall_impulse = stall_impulse
+        self.max_episode_steps = max_episode_steps
+        self.episode_steps = 0
+        self.renders_skipped = 0
+        self.stale_ticks = 0
+
+        # Only request the simulator outputs consumed on every step. Frames are also
+        # needed to display human render modes, otherwise they are rendered on demand.
+        self.outputs = ["game_state"]
+        if observation_type == "frame" or render_mode in ["human", "human_unclocked"]:
+            self.outputs.append("frame")
+        if observation_type in ["state", "half_frame"] or opponent is not None:
+            self.outputs.append("agent_state")
+        self.step_outputs = [output for output in self.outputs if output != "frame"]
+        self.frame = None
+
+        # Resets draw from an optional start state bank with the given probability,
+        # using the environment's random stream, otherwise from the corner starts
+        self.start_states = start_states
+        self.start_state_probability = start_state_probability
+
+        # Player 2 is driven by an optional scripted opponent, otherwise it stays still
+        self.opponent = opponent
+        self.agent_states = None
 
         # Using continuous actions
         self.action_space = spaces.Box(
             low=np.array([-1.0, -1.0]), high=np.array([1.0, 1.0]), dtype=np.float32
         )
 
-        # Using image as input (channel-first; channel-last also works)
-        self.observation_space = spaces.Box(
-            low=0, high=255, shape=(3, 609, 787), dtype=np.uint8
-        )
+        if observation_type == "frame":
+            # Using image as input (channel-first; channel-last also works)
+            self.observation_space = spaces.Box(
+                low=0, high=255, shape=(3, 609, 787), dtype=np.uint8
+            )
+        elif observation_type == "half_frame":
+            # Using the image of the agent's own half, up to the centre line, and the
+            # agent states covering the opponent half
+            self.observation_space = spaces.Dict(
+                {
+                    "frame": spaces.Box(
+                        low=0,
+                        high=255,
+                        shape=(3, 609, self.sim.half_width),
+                        dtype=np.uint8,
+                    ),
+                    "state": spaces.Box(
+                        low=-np.inf, high=np.inf, shape=(24,), dtype=np.float32
+                    ),
+                }
+            )
+        else:
+            # Using agent states as input
+            self.observation_space = spaces.Box(
+                low=-np.inf, high=np.inf, shape=(24,), dtype=np.float32
+            )
 
     def step(self, action):
-        # Apply the action to the environment
+        # Apply the action to the environment, frames of stalled games may be reused
         assert self.action_space.contains(action), "Invalid action"
-        frame, game_states, agent_states = self.sim.step(
-            (action[0] * MAX_FORCE, action[1] * MAX_FORCE), (0.0, 0.0)
+        skip_render = self.__skips_render()
+        frame, game_states, self.agent_states = self.sim.step(
+            (float(action[0]) * MAX_FORCE, float(action[1]) * MAX_FORCE),
+            self.__opponent_action(),
+            outputs=self.step_outputs if skip_render else self.outputs,
+        )
+        self.episode_steps += 1
+        stalled = (
+            self.stall_ticks is not None
+            and self.sim.quiescent_ticks >= self.stall_ticks
         )
+        if skip_render:
+            frame = self.__stalled_frame(stalled)
+        self.frame = frame
 
         # Process observation
-        observation = np.moveaxis(frame, -1, 0)
+        observation = self.__process_observation(self.frame, self.agent_states)
 
         # Compute the reward
         reward = 0.0
@@ -63,19 +167,124 @@ class KlaskEnv(gym.Env):
         # Check if episode is done
         terminated = truncated = not KlaskSimulator.GameStates.PLAYING in game_states
 
-        # Return
+        # Return, copying the contact events out of the reused simulator buffer
         info = {}
+        if self.stall_ticks is not None:
+            info["quiescent_ticks"] = self.sim.quiescent_ticks
+            if self.stall_mode == "skip_render":
+                info["renders_skipped"] = self.renders_skipped
+            elif stalled and not terminated:
+                # Cut the stalled episode short
+                truncated = True
+                info["stall_truncated"] = True
+                info["stall_steps_saved"] = (
+                    None
+                    if self.max_episode_steps is None
+                    else max(self.max_episode_steps - self.episode_steps, 0)
+                )
+        if self.record_contacts:
+            info["contact_events"] = self.sim.get_contact_events().copy()
         return observation, reward, terminated, truncated, info
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
 
-        # Reset simulator
-        frame, game_states, agent_states = self.sim.reset(seed=seed)
+        # Reseed the scripted opponent from the environment, so seeded episodes repeat
+        if seed is not None and self.opponent is not None:
+            self.opponent.rng = np.random.default_rng(self.np_random.integers(2**63))
 
-        # Process observation
-        observation = np.moveaxis(frame, -1, 0)
+        # Reset simulator, options={"physics": KlaskPhysicsParams(...)} changes the
+        # physical parameters from this episode on, and options={"start_state": ...}
+        # starts from a KlaskSimulator.start_state_dtype record
+        options = {} if options is None else options
+        start_state = options.get("start_state")
+        if (
+            start_state is None
+            and self.start_states is not None
+            and self.np_random.random() < self.start_state_probability
+        ):
+            start_state = self.start_states.sample(1, self.np_random)[0]
+
+        self.frame, game_states, self.agent_states = self.sim.reset(
+            seed=seed,
+            outputs=self.outputs,
+            physics=options.get("physics"),
+            start_state=start_state,
+        )
+
+        self.episode_steps = 0
+        self.renders_skipped = 0
+        self.stale_ticks = 0
+
+        # Process observation, reset frames are shared by the simulator so copy them
+        # (keeping their memory layout, which is much faster)
+        if self.frame is not None:
+            self.frame = self.frame.copy(order="K")
+        observation = self.__process_observation(self.frame, self.agent_states)
 
         # Return
         info = {}
         return observation, info
+
+    def render(self):
+        # Human render modes display while stepping, rgb_array frames are produced on demand
+        if self.render_mode != "rgb_array":
+            return None
+
+        if self.frame is None:
+            self.frame = self.sim.render()
+        return self.frame
+
+    def close(self):
+        self.sim.close()
+
+    def __skips_render(self):
+        # Stalled frames are only reused when frames are not displayed
+        return (
+            self.stall_ticks is not None
+            and self.stall_mode == "skip_render"
+            and "frame" in self.outputs
+            and self.render_mode not in ["human", "human_unclocked"]
+        )
+
+    def __stalled_frame(self, stalled):
+        # Reuse the last frame while the game stays stalled and no body can have drifted
+        # by STALL_MAX_DRIFT pixels since it was rendered, otherwise render it now
+        drift = (
+            (self.stale_ticks + 1)
+            * self.sim.stall_velocity
+            * self.sim.time_step
+            * self.sim.pixels_per_meter
+        )
+        if stalled and self.frame is not None and drift < self.STALL_MAX_DRIFT:
+            self.stale_ticks += 1
+            self.renders_skipped += 1
+            return self.frame
+
+        self.stale_ticks = 0
+        return self.sim.render()
+
+    def __opponent_action(self):
+        if self.opponent is None:
+            return 0.0, 0.0
+
+        states = np.fromiter(
+            self.agent_states.values(), dtype=np.float64, count=len(self.agent_states)
+        )
+        action = self.opponent(states[None], player=2)[0]
+        return float(action[0]) * MAX_FORCE, float(action[1]) * MAX_FORCE
+
+    def __process_observation(self, frame, agent_states):
+        if self.observation_type == "frame":
+            return np.moveaxis(frame, -1, 0)
+
+        states = np.fromiter(
+            agent_states.values(), dtype=np.float32, count=len(agent_states)
+        )
+        if self.observation_type == "half_frame":
+            # Only the agent's half is rendered, player 1 is never mirrored
+            return {
+                "frame": np.moveaxis(self.sim.render_half(player=1), -1, 0),
+                "state": states,
+            }
+        return states
@@ -0,0 +1,181 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..augmentation.augmentation import MirrorAugmenter
+from ..environment.environment import MAX_FORCE
+from ..opponents.opponents import mirror_states, opponents
+
+from gymnasium import spaces
+
+import numpy as np
+
+
+class StationaryPlayer:
+    """Baseline that never moves its puck."""
+
+    needs_frame = False
+
+    def reset(self, seed=None):
+        pass
+
+    def act(self, observation, agent_states, player):
+        return 0.0, 0.0
+
+
+class RandomPlayer:
+    """Baseline that applies uniformly random actions."""
+
+    needs_frame = False
+
+    def __init__(self):
+        self.rng = np.random.default_rng()
+
+    def reset(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, observation, agent_states, player):
+        action = self.rng.uniform(-1.0, 1.0, size=2)
+        return float(action[0]), float(action[1])
+
+
+class ChaserPlayer:
+    """Baseline that pushes its puck towards the ball."""
+
+    needs_frame = False
+
+    def __init__(self, gain=0.05, damping=0.02):
+        self.gain = gain
+        self.damping = damping
+
+    def reset(self, seed=None):
+        pass
+
+    def act(self, observation, agent_states, player):
+        puck = f"puck{player}"
+        action = np.array(
+            [
+                self.gain * (agent_states["ball_pos_x"] - agent_states[f"{puck}_pos_x"])
+                - self.damping * agent_states[f"{puck}_vel_x"],
+                self.gain * (agent_states["ball_pos_y"] - agent_states[f"{puck}_pos_y"])
+                - self.damping * agent_states[f"{puck}_vel_y"],
+            ]
+        )
+        action = np.clip(action, -1.0, 1.0)
+        return float(action[0]), float(action[1])
+
+
+class ScriptedPlayer:
+    """Baseline driven by a vectorized scripted opponent, one board at a time."""
+
+    needs_frame = False
+
+    def __init__(self, name):
+        self.name = name
+        self.opponent = opponents[name]()
+
+    def reset(self, seed=None):
+        self.opponent = opponents[self.name](seed=seed)
+
+    def act(self, observation, agent_states, player):
+        states = np.fromiter(agent_states.values(), dtype=np.float64)
+        action = self.opponent(states[None], player=player)[0]
+        return float(action[0]), float(action[1])
+
+
+class CheckpointPlayer:
+    """Trained stable-baselines3 agent, playing player 2 through a mirrored board."""
+
+    def __init__(self, path, algorithm="A2C"):
+        import stable_baselines3
+
+        self.model = getattr(stable_baselines3, algorithm).load(path, device="cpu")
+
+        # Agents observe frames, agent state vectors, or their own half of the board
+        # with the agent state vector
+        space = self.model.observation_space
+        self.half_width = None
+        if isinstance(space, spaces.Dict):
+            self.half_width = space["frame"].shape[-1]
+        self.needs_frame = self.half_width is not None or len(space.shape) == 3
+        self.augmenter = None
+
+    def reset(self, seed=None):
+        pass
+
+    def act(self, observation, agent_states, player):
+        # Agents are trained as player 1, so player 2 sees the board mirrored left-right
+        if self.half_width is not None:
+            observation = self.__half_observation(observation, agent_states, player)
+        elif self.needs_frame:
+            if player == 2:
+                observation = self.__mirror_frame(observation)
+            observation = np.ascontiguousarray(np.moveaxis(observation, -1, 0))
+        else:
+            observation = np.fromiter(agent_states.values(), dtype=np.float64)
+            if player == 2:
+                observation = mirror_states(observation)
+            observation = observation.astype(np.float32)
+
+        action, _ = self.model.predict(observation, deterministic=True)
+        if player == 2:
+            return -float(action[0]), float(action[1])
+        return float(action[0]), float(action[1])
+
+    def __mirror_frame(self, frame):
+        # Mirror the board left-right with the board logos restored
+        if self.augmenter is None:
+            self.augmenter = MirrorAugmenter()
+        return self.augmenter.flip_frames(frame[None], "left_right")[0]
+
+    def __half_observation(self, frame, agent_states, player):
+        # Crop the player's own half, mirroring player 2's half with the board logos
+        # restored, as KlaskSimulator.render_half() renders it
+        states = np.fromiter(agent_states.values(), dtype=np.float64)
+        if player == 2:
+            frame = self.__mirror_frame(frame)
+            states = mirror_states(states)
+
+        return {
+            "frame": np.ascontiguousarray(
+                np.moveaxis(frame[:, : self.half_width], -1, 0)
+            ),
+            "state": states.astype(np.float32),
+        }
+
+
+baseline_players = {
+    "stationary": StationaryPlayer,
+    "random": RandomPlayer,
+    "chaser": ChaserPlayer,
+}
+
+
+def make_player(spec):
+    # Create a player from "baseline:<name>", "scripted:<name>", "<path>" or
+    # "<algorithm>:<path>"
+    if spec.startswith("baseline:"):
+        name = spec.split(":", 1)[1]
+        if name not in baseline_players:
+            raise ValueError(f"Unknown baseline {name}")
+        return baseline_players[name]()
+    if spec.startswith("scripted:"):
+        name = spec.split(":", 1)[1]
+        if name not in opponents:
+            raise ValueError(f"Unknown scripted opponent {name}")
+        return ScriptedPlayer(name)
+
+    algorithm, path = parse_checkpoint_spec(spec)
+    return CheckpointPlayer(path, algorithm)
+
+
+def parse_checkpoint_spec(spec):
+    # Split "<algorithm>:<path>" into its parts, the algorithm defaults to A2C
+    algorithm, _, path = spec.rpartition(":")
+    if not algorithm.isupper():
+        return "A2C", spec
+    return algorithm, path
+
+
+def to_impulse(action):
+    # Scale a normalized action into a simulator impulse
+    return action[0] * MAX_FORCE, action[1] * MAX_FORCE
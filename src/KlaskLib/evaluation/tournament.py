@@ -0,0 +1,282 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ..simulator.simulator import KlaskSimulator
+from .players import make_player, parse_checkpoint_spec, to_impulse
+
+# Game outcomes from the perspective of the first player of a pair
+OUTCOMES = [
+    "win_score",  # Scored a goal
+    "win_klask",  # Opponent entered its own goal
+    "win_two_biscuit",  # Opponent contacted two biscuits
+    "loss_score",
+    "loss_klask",
+    "loss_two_biscuit",
+    "draw",  # Time limit reached, or both players won on the same step
+]
+
+# Win reasons per player, in order of precedence
+WIN_REASONS = {
+    1: [
+        ("score", KlaskSimulator.GameStates.P1_SCORE),
+        ("klask", KlaskSimulator.GameStates.P2_KLASK),
+        ("two_biscuit", KlaskSimulator.GameStates.P2_TWO_BISCUIT),
+    ],
+    2: [
+        ("score", KlaskSimulator.GameStates.P2_SCORE),
+        ("klask", KlaskSimulator.GameStates.P1_KLASK),
+        ("two_biscuit", KlaskSimulator.GameStates.P1_TWO_BISCUIT),
+    ],
+}
+
+# Players loaded by this worker process, keyed by spec
+_players = {}
+
+
+def _init_worker():
+    # Keep each worker on a single thread, the pool already fills every core
+    import torch
+
+    torch.set_num_threads(1)
+
+
+def _get_player(spec):
+    if spec not in _players:
+        _players[spec] = make_player(spec)
+    return _players[spec]
+
+
+def game_outcome(game_states, player):
+    # Classify the final game states from the perspective of player 1 or 2
+    winners = [
+        winner
+        for winner, win_state in [
+            (1, KlaskSimulator.GameStates.P1_WIN),
+            (2, KlaskSimulator.GameStates.P2_WIN),
+        ]
+        if win_state in game_states
+    ]
+    if len(winners) != 1:
+        return "draw"
+
+    winner = winners[0]
+    reason = next(
+        reason for reason, state in WIN_REASONS[winner] if state in game_states
+    )
+    return f"win_{reason}" if winner == player else f"loss_{reason}"
+
+
+def flip_counts(counts):
+    # Swap the perspective of outcome counts to the other player
+    return {
+        outcome.replace("win_", "tmp_")
+        .replace("loss_", "win_")
+        .replace("tmp_", "loss_"): count
+        for outcome, count in counts.items()
+    }
+
+
+def play_games(spec_a, spec_b, game_seeds, max_steps, first_game=0):
+    # Play headless games between two players, one per seed, alternating who plays
+    # player 1. first_game numbers the games of a chunk within its pairing.
+    players = {spec_a: _get_player(spec_a), spec_b: _get_player(spec_b)}
+    needs_frame = any(player.needs_frame for player in players.values())
+    sim = KlaskSimulator(render_mode="rgb_array" if needs_frame else None)
+
+    counts = dict.fromkeys(OUTCOMES, 0)
+    for game, game_seed in enumerate(game_seeds, start=first_game):
+        roles = [spec_a, spec_b] if game % 2 == 0 else [spec_b, spec_a]
+        for role, spec in enumerate(roles, start=1):
+            players[spec].reset(seed=[game_seed, role])
+
+        frame, game_states, agent_states = sim.reset(seed=game_seed)
+        for _ in range(max_steps):
+            if KlaskSimulator.GameStates.PLAYING not in game_states:
+                break
+            actions = [
+                to_impulse(players[spec].act(frame, agent_states, role))
+                for role, spec in enumerate(roles, start=1)
+            ]
+            frame, game_states, agent_states = sim.step(*actions)
+
+        counts[game_outcome(game_states, roles.index(spec_a) + 1)] += 1
+
+    sim.close()
+    return counts
+
+
+def player_identity(spec):
+    # Identify checkpoints by content, so renamed or retrained files are handled
+    if spec.startswith(("baseline:", "scripted:")):
+        return spec
+    _, path = parse_checkpoint_spec(spec)
+    with open(path, "rb") as f:
+        return f"{spec}@{hashlib.sha1(f.read()).hexdigest()}"
+
+
+def pair_key(identity_a, identity_b, games, max_steps, seed):
+    # Cache key of a pairing, independent of the order of the two players
+    payload = json.dumps([sorted([identity_a, identity_b]), games, max_steps, seed])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def run_tournament(
+    specs,
+    games=20,
+    max_steps=1000,
+    seed=0,
+    workers=None,
+    cache_dir=None,
+    progress=None,
+    chunk_games=4,
+):
+    # Play a round robin between all players, returns outcome counts per pair.
+    # Pairings are split into chunks of chunk_games games that spread over the pool,
+    # the game seeds derive from the pairing so the chunking never changes the counts.
+    # Finished pairs are cached, so an interrupted tournament resumes where it stopped.
+    if workers is None:
+        workers = len(os.sched_getaffinity(0))
+
+    identities = {spec: player_identity(spec) for spec in specs}
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    results = {}
+    pending = {}
+    for spec_a, spec_b in combinations(specs, 2):
+        key = pair_key(identities[spec_a], identities[spec_b], games, max_steps, seed)
+        path = None if cache_dir is None else os.path.join(cache_dir, f"{key}.json")
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                cached = json.load(f)
+            counts = cached["counts"]
+            if cached["first"] != identities[spec_a]:
+                counts = flip_counts(counts)
+            results[spec_a, spec_b] = counts
+        else:
+            pending[spec_a, spec_b] = (key, path)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        futures = {}
+        chunks = {}
+        for (spec_a, spec_b), (key, _) in pending.items():
+            game_seeds = np.random.SeedSequence(int(key[:8], 16)).generate_state(games)
+            game_seeds = [int(game_seed) for game_seed in game_seeds]
+            for start in range(0, games, chunk_games):
+                future = pool.submit(
+                    play_games,
+                    spec_a,
+                    spec_b,
+                    game_seeds[start : start + chunk_games],
+                    max_steps,
+                    start,
+                )
+                futures[future] = spec_a, spec_b
+            chunks[spec_a, spec_b] = len(range(0, games, chunk_games))
+            results[spec_a, spec_b] = dict.fromkeys(OUTCOMES, 0)
+
+        for future in as_completed(futures):
+            spec_a, spec_b = futures[future]
+            counts = results[spec_a, spec_b]
+            for outcome, count in future.result().items():
+                counts[outcome] += count
+
+            # Cache the pair once all of its chunks are in
+            chunks[spec_a, spec_b] -= 1
+            if chunks[spec_a, spec_b] > 0:
+                continue
+
+            # Write atomically, a partial file must never look like a finished pair
+            path = pending[spec_a, spec_b][1]
+            if path is not None:
+                with open(path + ".tmp", "w") as f:
+                    json.dump(
+                        {
+                            "first": identities[spec_a],
+                            "second": identities[spec_b],
+                            "counts": counts,
+                        },
+                        f,
+                    )
+                os.replace(path + ".tmp", path)
+
+            if progress is not None:
+                progress(spec_a, spec_b, counts)
+
+    return results
+
+
+def fit_elo(scores, iterations=500, prior=1.0):
+    # Fit Bradley-Terry strengths by minorization-maximization and express them as
+    # Elo ratings with a mean of 1000. scores[..., i, j] holds the points player i
+    # took from player j (wins plus half of the draws). A virtual draw per pairing
+    # keeps the ratings of unbeaten or winless players finite.
+    scores = scores + prior / 2 * (1 - np.eye(scores.shape[-1]))
+    games = scores + np.swapaxes(scores, -1, -2)
+    points = scores.sum(-1)
+
+    strengths = np.ones(points.shape)
+    for _ in range(iterations):
+        denominator = (games / (strengths[..., :, None] + strengths[..., None, :])).sum(
+            -1
+        )
+        strengths = points / denominator
+        strengths /= np.exp(np.log(strengths).mean(-1, keepdims=True))
+
+    return 1000 + 400 * np.log10(strengths)
+
+
+def summarize(specs, results, bootstrap=1000, confidence=0.95, seed=0):
+    # Elo ratings with bootstrapped confidence intervals, resampling the games of every pair
+    index = {spec: i for i, spec in enumerate(specs)}
+    rng = np.random.default_rng(seed)
+
+    scores = np.zeros((len(specs), len(specs)))
+    samples = np.zeros((bootstrap, len(specs), len(specs)))
+    for (spec_a, spec_b), counts in results.items():
+        i, j = index[spec_a], index[spec_b]
+        wins = sum(
+            counts[f"win_{reason}"] for reason in ["score", "klask", "two_biscuit"]
+        )
+        losses = sum(
+            counts[f"loss_{reason}"] for reason in ["score", "klask", "two_biscuit"]
+        )
+        draws = counts["draw"]
+        total = wins + losses + draws
+        if total == 0:
+            continue
+
+        scores[i, j] = wins + draws / 2
+        scores[j, i] = losses + draws / 2
+
+        resampled = rng.multinomial(
+            total, [wins / total, losses / total, draws / total], bootstrap
+        )
+        samples[:, i, j] = resampled[:, 0] + resampled[:, 2] / 2
+        samples[:, j, i] = resampled[:, 1] + resampled[:, 2] / 2
+
+    ratings = fit_elo(scores)
+    bootstrap_ratings = fit_elo(samples)
+    low, high = np.quantile(
+        bootstrap_ratings, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0
+    )
+
+    return [
+        {
+            "player": spec,
+            "elo": float(ratings[i]),
+            "elo_low": float(low[i]),
+            "elo_high": float(high[i]),
+        }
+        for i, spec in sorted(enumerate(specs), key=lambda item: -ratings[item[0]])
+    ]
@@ -0,0 +1,256 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from concurrent.futures import Future
+from io import BytesIO
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import torch
+
+
+class TorchPolicyBackend:
+    """Runs batched forward passes of a stable-baselines3 policy with PyTorch."""
+
+    def __init__(self, model, num_threads=1):
+        self.model = model
+        self.num_threads = num_threads
+
+    def setup(self):
+        # Called from the inference thread before the first batch
+        torch.set_num_threads(self.num_threads)
+
+    def __call__(self, observations):
+        actions, _ = self.model.policy.predict(observations, deterministic=True)
+        return actions
+
+
+class OnnxablePolicy(torch.nn.Module):
+    """Maps observations to deterministic actions so the policy can be exported."""
+
+    def __init__(self, policy):
+        super().__init__()
+        self.policy = policy
+
+    def forward(self, observations):
+        return self.policy(observations, deterministic=True)[0]
+
+
+class OnnxPolicyBackend:
+    """Runs batched forward passes of a stable-baselines3 policy with ONNX Runtime."""
+
+    def __init__(self, model, num_threads=1):
+        import onnxruntime
+
+        self.model = model
+        self.num_threads = num_threads
+
+        # Export the policy with a dynamic batch dimension
+        policy = OnnxablePolicy(model.policy.to("cpu")).eval()
+        dummy = torch.as_tensor(
+            model.observation_space.sample()[None], dtype=torch.float32
+        )
+        buffer = BytesIO()
+        torch.onnx.export(
+            policy,
+            dummy,
+            buffer,
+            input_names=["observations"],
+            output_names=["actions"],
+            dynamic_axes={"observations": {0: "batch"}, "actions": {0: "batch"}},
+            dynamo=False,
+        )
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            buffer.getvalue(), options, providers=["CPUExecutionProvider"]
+        )
+
+        self.low = model.action_space.low
+        self.high = model.action_space.high
+
+    def setup(self):
+        pass
+
+    def __call__(self, observations):
+        actions = self.session.run(
+            None, {"observations": observations.astype(np.float32)}
+        )[0]
+        return np.clip(actions, self.low, self.high)
+
+
+class KlaskInferenceService:
+    """Serves actions for many live games with one batched forward pass per deadline window."""
+
+    # Upper bucket edges of the latency histogram, in seconds
+    latency_buckets = [
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        float("inf"),
+    ]
+
+    def __init__(self, backend, max_batch_size=64, max_wait=0.002, cpu_affinity=None):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait  # Seconds to wait for more requests after the first
+        self.cpu_affinity = cpu_affinity  # Cores the inference thread is pinned to
+
+        self.requests = queue.SimpleQueue()
+        self.thread = None
+        self.running = False
+
+        # Statistics
+        self.lock = threading.Lock()
+        self.batch_size_counts = np.zeros(max_batch_size + 1, dtype=np.int64)
+        self.latency_counts = np.zeros(len(self.latency_buckets), dtype=np.int64)
+
+    @classmethod
+    def from_checkpoint(
+        cls, path, algorithm="A2C", backend="auto", num_threads=1, **kwargs
+    ):
+        # Load a stable-baselines3 checkpoint, e.g. from weights/, for CPU inference
+        import stable_baselines3
+
+        model = getattr(stable_baselines3, algorithm).load(path, device="cpu")
+
+        if backend == "auto":
+            try:
+                import onnxruntime
+
+                backend = "onnx"
+            except ImportError:
+                backend = "torch"
+
+        if backend == "onnx":
+            policy_backend = OnnxPolicyBackend(model, num_threads)
+        elif backend == "torch":
+            policy_backend = TorchPolicyBackend(model, num_threads)
+        else:
+            raise ValueError(f"Unknown inference backend {backend}")
+
+        return cls(policy_backend, **kwargs)
+
+    def start(self):
+        assert self.thread is None
+        self.running = True
+        self.thread = threading.Thread(target=self.__serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.thread is not None:
+            self.running = False
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, observation):
+        # Queue one observation, the returned future resolves to its action
+        future = Future()
+        self.requests.put((time.perf_counter(), observation, future))
+        return future
+
+    def predict(self, observation):
+        # Blocking variant of submit()
+        return self.submit(observation).result()
+
+    def __serve(self):
+        # Pin the inference thread (and the intra-op threads it spawns) to its cores
+        if self.cpu_affinity is not None:
+            os.sched_setaffinity(0, self.cpu_affinity)
+        self.backend.setup()
+
+        while self.running:
+            # Wait for the first request, then gather more until the deadline
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = request[0] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Requests already queued join the batch even after the deadline
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout > 0:
+                        request = self.requests.get(timeout=timeout)
+                    else:
+                        request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.running = False
+                    break
+                batch.append(request)
+
+            # Run one forward pass for the whole batch
+            try:
+                actions = self.backend(np.stack([obs for _, obs, _ in batch]))
+            except Exception as error:
+                for _, _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            done = time.perf_counter()
+            for (_, _, future), action in zip(batch, actions):
+                future.set_result(action)
+
+            # Record statistics
+            latencies = [done - submitted for submitted, _, _ in batch]
+            with self.lock:
+                self.batch_size_counts[len(batch)] += 1
+                self.latency_counts += np.bincount(
+                    np.searchsorted(self.latency_buckets, latencies),
+                    minlength=len(self.latency_buckets),
+                )
+
+        # Fail any requests left behind after closing
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request[2].set_exception(RuntimeError("Inference service closed"))
+
+    def histograms(self):
+        # Returns copies of the batch size counts (indexed by size) and latency counts
+        with self.lock:
+            return self.batch_size_counts.copy(), self.latency_counts.copy()
+
+    def report(self):
+        # Human readable batch size and latency histograms
+        batch_size_counts, latency_counts = self.histograms()
+
+        lines = ["batch size    batches"]
+        for size in np.nonzero(batch_size_counts)[0]:
+            lines.append(f"{size:>10} {batch_size_counts[size]:>10}")
+
+        lines.append("latency <=   requests")
+        for edge, count in zip(self.latency_buckets, latency_counts):
+            label = "inf" if edge == float("inf") else f"{edge * 1e3:g} ms"
+            lines.append(f"{label:>10} {count:>10}")
+
+        return "\n".join(lines)
@@ -0,0 +1,236 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import json
+import time
+
+import numpy as np
+
+# Frame time histogram bin edges (ms)
+FRAME_TIME_BINS = [0.0, 4.0, 8.0, 12.0, 16.7, 20.0, 25.0, 33.3, 50.0, 100.0, np.inf]
+
+
+class LatencyTracer:
+    """
+    Timestamps inputs, physics ticks, rendering, frame rate waits and presented frames
+    during interactive play.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.polls = []
+        self.inputs = []
+        self.input_names = []
+        self.tick_begins = []
+        self.tick_ends = []
+        self.render_begins = []
+        self.render_ends = []
+        self.wait_begins = []
+        self.wait_ends = []
+        self.presents = []
+
+    def poll(self):
+        # Event queue polled, events wait in the queue for at most the gap between polls
+        self.polls.append(time.perf_counter())
+
+    def input(self, name):
+        # Input event dequeued, SDL events carry no timestamp the application can read
+        self.inputs.append(time.perf_counter())
+        self.input_names.append(name)
+
+    def tick_begin(self):
+        self.tick_begins.append(time.perf_counter())
+
+    def tick_end(self):
+        self.tick_ends.append(time.perf_counter())
+
+    def render_begin(self):
+        self.render_begins.append(time.perf_counter())
+
+    def render_end(self):
+        # Rendering includes drawing and the display flip
+        self.render_ends.append(time.perf_counter())
+
+    def wait_begin(self):
+        self.wait_begins.append(time.perf_counter())
+
+    def wait_end(self):
+        # Frame rate wait, time spent sleeping in clock.tick()
+        self.wait_ends.append(time.perf_counter())
+
+    def present(self, present_time):
+        # Frame presented (after the display flip), repeated times are ignored
+        if present_time is None or (
+            self.presents and self.presents[-1] == present_time
+        ):
+            return
+        self.presents.append(present_time)
+
+    def latencies(self):
+        # Match every input to the first physics tick beginning after it, and that tick
+        # to the first frame presented after it began. Inputs still in flight are dropped.
+        inputs = np.array(self.inputs)
+        tick_begins = np.array(self.tick_begins[: len(self.tick_ends)])
+        tick_ends = np.array(self.tick_ends)
+        presents = np.array(self.presents)
+
+        ticks = np.searchsorted(tick_begins, inputs, side="right")
+        valid = ticks < len(tick_begins)
+        frames = np.full(len(inputs), len(presents))
+        frames[valid] = np.searchsorted(
+            presents, tick_begins[ticks[valid]], side="right"
+        )
+        valid &= frames < len(presents)
+
+        inputs, ticks, frames = inputs[valid], ticks[valid], frames[valid]
+        return {
+            "input": inputs,
+            "names": [name for name, ok in zip(self.input_names, valid) if ok],
+            "tick_begin": tick_begins[ticks],
+            "tick_end": tick_ends[ticks],
+            "present": presents[frames],
+        }
+
+    def summary(self):
+        # Latency percentiles per stage and frame time histogram, in milliseconds
+        latencies = self.latencies()
+        stages = {
+            "input_to_tick": latencies["tick_begin"] - latencies["input"],
+            "tick": self.__durations(self.tick_begins, self.tick_ends),
+            "render": self.__durations(self.render_begins, self.render_ends),
+            "wait": self.__durations(self.wait_begins, self.wait_ends),
+            "input_to_present": latencies["present"] - latencies["input"],
+            "poll_gap": np.diff(self.polls),
+        }
+
+        summary = {"inputs": len(latencies["input"]), "frames": len(self.presents)}
+        for name, values in stages.items():
+            values = np.asarray(values) * 1e3
+            summary[name] = {
+                f"p{q}": float(np.percentile(values, q)) if len(values) else None
+                for q in (50, 95, 99)
+            }
+
+        frame_times = np.diff(self.presents) * 1e3
+        counts, _ = np.histogram(frame_times, bins=FRAME_TIME_BINS)
+        summary["frame_time"] = {
+            "p50": float(np.percentile(frame_times, 50)) if len(frame_times) else None,
+            "p99": float(np.percentile(frame_times, 99)) if len(frame_times) else None,
+            "histogram": [int(count) for count in counts],
+        }
+        return summary
+
+    def export_chrome_trace(self, path):
+        # Write the session in the Chrome trace event format, viewable with
+        # chrome://tracing or https://ui.perfetto.dev
+        def us(timestamp):
+            return (timestamp - self.start) * 1e6
+
+        events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 0,
+                "tid": tid,
+                "args": {"name": n},
+            }
+            for tid, n in enumerate(["input", "physics", "display", "latency"])
+        ]
+        events += [
+            {"name": "poll", "ph": "i", "s": "t", "ts": us(poll), "pid": 0, "tid": 0}
+            for poll in self.polls
+        ]
+        events += [
+            {"name": name, "ph": "i", "s": "t", "ts": us(timestamp), "pid": 0, "tid": 0}
+            for timestamp, name in zip(self.inputs, self.input_names)
+        ]
+        events += [
+            {
+                "name": "tick",
+                "ph": "X",
+                "ts": us(begin),
+                "dur": (end - begin) * 1e6,
+                "pid": 0,
+                "tid": 1,
+            }
+            for begin, end in zip(self.tick_begins, self.tick_ends)
+        ]
+        events += [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": us(begin),
+                "dur": (end - begin) * 1e6,
+                "pid": 0,
+                "tid": 2,
+            }
+            for name, begins, ends in [
+                ("render", self.render_begins, self.render_ends),
+                ("wait", self.wait_begins, self.wait_ends),
+            ]
+            for begin, end in zip(begins, ends)
+        ]
+        events += [
+            {
+                "name": "present",
+                "ph": "i",
+                "s": "t",
+                "ts": us(present),
+                "pid": 0,
+                "tid": 2,
+            }
+            for present in self.presents
+        ]
+
+        # Input to display spans, one per matched input
+        latencies = self.latencies()
+        for i, (name, begin, end) in enumerate(
+            zip(latencies["names"], latencies["input"], latencies["present"])
+        ):
+            for phase, timestamp in [("b", begin), ("e", end)]:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "latency",
+                        "ph": phase,
+                        "id": i,
+                        "ts": us(timestamp),
+                        "pid": 0,
+                        "tid": 3,
+                    }
+                )
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    @staticmethod
+    def __durations(begins, ends):
+        # Durations of the completed spans of a stage
+        return np.array(ends) - np.array(begins[: len(ends)])
+
+
+def format_summary(summary):
+    # Render a summary as a text report
+    lines = [f"{summary['inputs']} inputs, {summary['frames']} frames presented"]
+    lines.append(f"{'stage (ms)':<18} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage in [
+        "poll_gap",
+        "input_to_tick",
+        "tick",
+        "render",
+        "wait",
+        "input_to_present",
+    ]:
+        values = [summary[stage][f"p{q}"] for q in (50, 95, 99)]
+        lines.append(
+            f"{stage:<18} "
+            + " ".join("       -" if v is None else f"{v:8.2f}" for v in values)
+        )
+
+    lines.append("frame time (ms)")
+    histogram = summary["frame_time"]["histogram"]
+    total = max(sum(histogram), 1)
+    for low, high, count in zip(FRAME_TIME_BINS, FRAME_TIME_BINS[1:], histogram):
+        label = f"{low:g}-{high:g}" if np.isfinite(high) else f">{low:g}"
+        lines.append(f"{label:>10} {count:7d} {'#' * round(40 * count / total)}")
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..simulator.constants import *
+from ..simulator.simulator import KlaskSimulator
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Column indices into agent state arrays, in KlaskSimulator.agent_state_keys order
+_KEYS = KlaskSimulator.agent_state_keys
+PUCK1_POS = [_KEYS.index("puck1_pos_x"), _KEYS.index("puck1_pos_y")]
+PUCK1_VEL = [_KEYS.index("puck1_vel_x"), _KEYS.index("puck1_vel_y")]
+PUCK2_POS = [_KEYS.index("puck2_pos_x"), _KEYS.index("puck2_pos_y")]
+PUCK2_VEL = [_KEYS.index("puck2_vel_x"), _KEYS.index("puck2_vel_y")]
+BALL_POS = [_KEYS.index("ball_pos_x"), _KEYS.index("ball_pos_y")]
+BALL_VEL = [_KEYS.index("ball_vel_x"), _KEYS.index("ball_vel_y")]
+BISCUIT_POS = [
+    [_KEYS.index(f"biscuit{i}_pos_x"), _KEYS.index(f"biscuit{i}_pos_y")]
+    for i in range(1, 4)
+]
+
+# Columns holding x positions and x velocities, negated or reflected when mirroring
+_X_POSITIONS = [i for i, key in enumerate(_KEYS) if key.endswith("pos_x")]
+_X_VELOCITIES = [i for i, key in enumerate(_KEYS) if key.endswith("vel_x")]
+_PUCK_SWAP = PUCK1_POS + PUCK1_VEL + PUCK2_POS + PUCK2_VEL
+_PUCK_SWAPPED = PUCK2_POS + PUCK2_VEL + PUCK1_POS + PUCK1_VEL
+
+# Pixels per constants.py meter, for the default simulator configuration
+DEFAULT_SCALE = 100 * 20
+
+
+def mirror_states(states, scale=DEFAULT_SCALE):
+    # Mirror agent state arrays left-right and swap the pucks, so player 2 sees the
+    # board as player 1 does
+    mirrored = np.array(states, dtype=np.float64, copy=True)
+    mirrored[..., _X_POSITIONS] = KG_BOARD_WIDTH * scale - mirrored[..., _X_POSITIONS]
+    mirrored[..., _X_VELOCITIES] = -mirrored[..., _X_VELOCITIES]
+    mirrored[..., _PUCK_SWAP] = mirrored[..., _PUCK_SWAPPED]
+    return mirrored
+
+
+class ScriptedOpponent(ABC):
+    """
+    Heuristic controller computing actions for a batch of boards at once.
+
+    Subclasses choose a target position for their puck on the player 1 side of the
+    board, and a PD law drives the puck towards it. Player 2 is handled by mirroring.
+    difficulty in [0, 1] (a scalar or one value per board) scales the action
+    magnitude up and the action noise down, for cheap curricula.
+    """
+
+    def __init__(
+        self,
+        difficulty=1.0,
+        gain=0.02,
+        damping=0.004,
+        noise=0.5,
+        scale=DEFAULT_SCALE,
+        seed=None,
+    ):
+        self.difficulty = difficulty
+        self.gain = gain
+        self.damping = damping
+        self.noise = noise
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+
+        # Board geometry in pixels
+        self.board_width = KG_BOARD_WIDTH * scale
+        self.board_height = KG_BOARD_HEIGHT * scale
+        self.puck_radius = KG_PUCK_RADIUS * scale
+        self.ball_radius = KG_BALL_RADIUS * scale
+        self.own_goal = np.array([KG_GOAL_OFFSET_X, KG_BOARD_HEIGHT / 2]) * scale
+        self.opponent_goal = (
+            np.array([KG_BOARD_WIDTH - KG_GOAL_OFFSET_X, KG_BOARD_HEIGHT / 2]) * scale
+        )
+        self.goal_clearance = (KG_GOAL_RADIUS + KG_PUCK_RADIUS) * scale
+        self.half_limit = (KG_BOARD_WIDTH / 2 - KG_DIVIDER_WIDTH / 2) * scale
+
+    def __call__(self, states, player=2):
+        # Actions in [-1, 1] for an (N, 24) array of agent states
+        states = np.atleast_2d(states)
+        if player == 2:
+            states = mirror_states(states, self.scale)
+
+        position = states[:, PUCK1_POS]
+        target = self._keep_legal(self.target(states))
+        action = self.gain * (target - position) - self.damping * states[:, PUCK1_VEL]
+
+        # Scale saturated actions down as a whole, so they keep their direction
+        action /= np.maximum(np.abs(action).max(axis=1, keepdims=True), 1.0)
+
+        # Weaker opponents push softer and noisier
+        difficulty = np.reshape(self.difficulty, (-1, 1))
+        action *= 0.25 + 0.75 * difficulty
+        action += self.rng.normal(scale=self.noise, size=action.shape) * (
+            1 - difficulty
+        )
+        action = np.clip(action, -1.0, 1.0)
+
+        if player == 2:
+            action[:, 0] = -action[:, 0]
+        return action.astype(np.float32)
+
+    @abstractmethod
+    def target(self, states):
+        # Target puck positions, on the player 1 side of the board
+        pass
+
+    def _keep_legal(self, target):
+        # Keep targets on the own half, on the board, and out of the own goal
+        target = np.stack(
+            [
+                np.clip(
+                    target[:, 0], self.puck_radius, self.half_limit - self.puck_radius
+                ),
+                np.clip(
+                    target[:, 1],
+                    self.puck_radius,
+                    self.board_height - self.puck_radius,
+                ),
+            ],
+            axis=1,
+        )
+
+        offset = target - self.own_goal
+        distance = np.linalg.norm(offset, axis=1, keepdims=True)
+        inside = distance < self.goal_clearance
+        direction = np.where(distance > 0, offset / np.maximum(distance, 1e-9), [1, 0])
+        return np.where(inside, self.own_goal + direction * self.goal_clearance, target)
+
+
+class Goalkeeper(ScriptedOpponent):
+    """Guards the own goal, staying between it and the ball."""
+
+    def __init__(self, guard_distance=1.6, **kwargs):
+        super().__init__(**kwargs)
+        self.guard_distance = guard_distance * self.goal_clearance
+
+    def target(self, states):
+        offset = states[:, BALL_POS] - self.own_goal
+        distance = np.maximum(np.linalg.norm(offset, axis=1, keepdims=True), 1e-9)
+        return self.own_goal + offset / distance * self.guard_distance
+
+
+class BallChaser(ScriptedOpponent):
+    """Drives its puck straight at the ball."""
+
+    def target(self, states):
+        return states[:, BALL_POS]
+
+
+class ShotTaker(ScriptedOpponent):
+    """Lines up behind the ball and strikes it towards the opponent goal."""
+
+    def __init__(self, lineup_distance=2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.lineup_distance = lineup_distance * (self.puck_radius + self.ball_radius)
+
+    def target(self, states):
+        ball = states[:, BALL_POS]
+        position = states[:, PUCK1_POS]
+        shot = self.opponent_goal - ball
+        shot /= np.maximum(np.linalg.norm(shot, axis=1, keepdims=True), 1e-9)
+
+        # Move behind the ball, going around it when in front of it, then strike
+        # through it at full power once lined up
+        behind = ball - shot * self.lineup_distance
+        approach = position - ball
+        approach /= np.maximum(np.linalg.norm(approach, axis=1, keepdims=True), 1e-9)
+        alignment = (approach * -shot).sum(axis=1, keepdims=True)
+
+        side = np.sign((approach * shot[:, ::-1] * [1, -1]).sum(axis=1, keepdims=True))
+        around = ball + shot[:, ::-1] * [-1, 1] * -np.where(side == 0, 1, side)
+        around = ball + (around - ball) * self.lineup_distance
+
+        target = np.where(alignment < -0.5, around, behind)
+        strike = ball + shot * 2 * self.lineup_distance
+        return np.where(alignment > 0.98, strike, target)
+
+
+class BiscuitAvoider(ScriptedOpponent):
+    """Follows another controller while steering clear of the biscuits."""
+
+    def __init__(self, base=None, avoid_distance=4.0, **kwargs):
+        super().__init__(**kwargs)
+        self.base = Goalkeeper(scale=self.scale) if base is None else base
+        self.avoid_distance = avoid_distance * (
+            (KG_PUCK_RADIUS + KG_BISCUIT_RADIUS) * self.scale
+        )
+
+    def target(self, states):
+        target = self.base.target(states)
+        position = states[:, PUCK1_POS]
+
+        # Push the target away from every nearby biscuit
+        for biscuit_pos in BISCUIT_POS:
+            offset = position - states[:, biscuit_pos]
+            distance = np.maximum(np.linalg.norm(offset, axis=1, keepdims=True), 1e-9)
+            strength = np.clip(1 - distance / self.avoid_distance, 0, 1)
+            target = target + offset / distance * strength * self.avoid_distance
+        return target
+
+
+opponents = {
+    "goalkeeper": Goalkeeper,
+    "ball_chaser": BallChaser,
+    "shot_taker": ShotTaker,
+    "biscuit_avoider": BiscuitAvoider,
+}
@@ -0,0 +1,336 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import json
+import math
+import os
+import shutil
+
+import numpy as np
+
+from ..environment.environment import KlaskEnv
+from ..evaluation.tournament import run_tournament, summarize
+
+# Tuned hyperparameters per algorithm, as (low, high). Initial values are sampled
+# log-uniformly, gamma is sampled and perturbed through 1 - gamma.
+HYPERPARAMETERS = {
+    "A2C": {
+        "learning_rate": (1e-5, 1e-2),
+        "gamma": (0.9, 0.9999),
+        "ent_coef": (1e-5, 1e-1),
+        "vf_coef": (0.1, 1.0),
+    },
+    "PPO": {
+        "learning_rate": (1e-5, 1e-2),
+        "gamma": (0.9, 0.9999),
+        "ent_coef": (1e-5, 1e-1),
+        "clip_range": (0.05, 0.4),
+    },
+}
+
+# Hyperparameters handled through their complement, close to their upper bound
+_COMPLEMENTED = ["gamma"]
+
+
+def _complement(name, value):
+    return 1 - value if name in _COMPLEMENTED else value
+
+
+def sample_hyperparameters(algorithm, rng):
+    # Sample initial hyperparameters log-uniformly within their bounds
+    hyperparameters = {}
+    for name, (low, high) in HYPERPARAMETERS[algorithm].items():
+        low, high = sorted([_complement(name, low), _complement(name, high)])
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        hyperparameters[name] = _complement(name, value)
+    return hyperparameters
+
+
+def perturb_hyperparameters(algorithm, hyperparameters, rng, factors=(0.8, 1.25)):
+    # Scale every hyperparameter up or down at random, staying within bounds
+    perturbed = {}
+    for name, (low, high) in HYPERPARAMETERS[algorithm].items():
+        value = _complement(name, hyperparameters[name]) * rng.choice(factors)
+        value = _complement(name, value)
+        perturbed[name] = float(np.clip(value, low, high))
+    return perturbed
+
+
+def member_name(member):
+    return f"member_{member:03d}.zip"
+
+
+def generation_directory(directory, generation):
+    return os.path.join(directory, "checkpoints", f"generation_{generation:04d}")
+
+
+def promote_checkpoints(staged_paths, paths, sources):
+    # Copy a finished generation's checkpoints over the weights, member i continues
+    # from the checkpoint of member sources[i]. Every copy is atomic, so promoting
+    # again after an interruption finishes the job.
+    for path, source in zip(paths, sources):
+        shutil.copyfile(staged_paths[source], path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    # Rename before removing, the staged directory exists only until promoted
+    staged_directory = os.path.dirname(staged_paths[0])
+    shutil.rmtree(staged_directory + ".old", ignore_errors=True)
+    os.replace(staged_directory, staged_directory + ".old")
+    shutil.rmtree(staged_directory + ".old")
+
+
+def split_cores(cores, members):
+    # Divide cores into contiguous budgets, members share cores when they run short
+    if members > len(cores):
+        return [[cores[member % len(cores)]] for member in range(members)]
+    return [[int(core) for core in budget] for budget in np.array_split(cores, members)]
+
+
+def _make_env(config, seed):
+    def _init():
+        from gymnasium.wrappers import TimeLimit
+
+        from ..opponents.opponents import opponents
+
+        # Every environment gets its own scripted opponent, with its own noise
+        opponent = config["opponent"]
+        env = KlaskEnv(
+            render_mode=None,
+            observation_type=config["observation_type"],
+            opponent=None if opponent is None else opponents[opponent](seed=seed),
+        )
+        return TimeLimit(env, max_episode_steps=config["max_steps"])
+
+    return _init
+
+
+def train_member(
+    path, staged_path, hyperparameters, timesteps, cores, seed, opponent_seed, config
+):
+    # Train one member for a generation on its core budget, resuming from its
+    # checkpoint and saving to the generation's staged checkpoint. seed initializes
+    # a new model, opponent_seed the generation's scripted opponents.
+    import stable_baselines3
+    import torch
+    from stable_baselines3.common.vec_env import (
+        DummyVecEnv,
+        SubprocVecEnv,
+        VecMonitor,
+    )
+
+    os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    # The environments scale with the core budget, and inherit its affinity
+    env_seeds = np.random.SeedSequence(opponent_seed).generate_state(
+        config["envs_per_core"] * len(cores)
+    )
+    env_fns = [_make_env(config, int(env_seed)) for env_seed in env_seeds]
+    vec_env = SubprocVecEnv(env_fns) if len(env_fns) > 1 else DummyVecEnv(env_fns)
+    vec_env = VecMonitor(vec_env)
+
+    algorithm = getattr(stable_baselines3, config["algorithm"])
+    policy = "CnnPolicy" if config["observation_type"] == "frame" else "MlpPolicy"
+    if os.path.exists(path):
+        model = algorithm.load(path, env=vec_env, device="cpu", **hyperparameters)
+    else:
+        model = algorithm(policy, vec_env, seed=seed, device="cpu", **hyperparameters)
+
+    model.learn(total_timesteps=timesteps, reset_num_timesteps=False)
+    model.save(staged_path)
+    vec_env.close()
+
+    returns = [episode["r"] for episode in model.ep_info_buffer]
+    return {
+        "timesteps": model.num_timesteps,
+        "mean_return": float(np.mean(returns)) if returns else None,
+    }
+
+
+def run_pbt(
+    directory,
+    weights_directory,
+    members=4,
+    generations=10,
+    timesteps=20000,
+    algorithm="A2C",
+    observation_type="state",
+    opponent=None,
+    envs_per_core=1,
+    exploit_fraction=0.25,
+    games=20,
+    max_steps=1000,
+    seed=0,
+    cores=None,
+    progress=None,
+):
+    # Train a population in parallel, then every generation rate the members in a
+    # round robin tournament, copy the checkpoints of the best members over the worst
+    # and perturb the copied hyperparameters. Generations train into staged checkpoints,
+    # which replace the weights only once the state is written, so an interrupted run
+    # resumes at the start of its generation.
+    if algorithm not in HYPERPARAMETERS:
+        raise ValueError(f"Unknown algorithm {algorithm}")
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0))
+
+    config = {
+        "members": members,
+        "timesteps": timesteps,
+        "algorithm": algorithm,
+        "observation_type": observation_type,
+        "opponent": opponent,
+        "envs_per_core": envs_per_core,
+        "exploit_fraction": exploit_fraction,
+        "games": games,
+        "max_steps": max_steps,
+        "seed": seed,
+    }
+
+    # Resume from an existing state, which must describe the same run
+    os.makedirs(directory, exist_ok=True)
+    os.makedirs(weights_directory, exist_ok=True)
+    state_path = os.path.join(directory, "state.json")
+    log_path = os.path.join(directory, "log.jsonl")
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["config"] != config:
+            raise ValueError(f"{directory} holds a population with different settings")
+
+        # Drop log records of a generation interrupted before its state was written
+        if os.path.exists(log_path):
+            with open(log_path) as f:
+                records = [json.loads(line) for line in f]
+            with open(log_path, "w") as f:
+                for record in records:
+                    if record["generation"] < state["generation"]:
+                        f.write(json.dumps(record) + "\n")
+    else:
+        rng = np.random.default_rng(seed)
+        state = {
+            "config": config,
+            "generation": 0,
+            "hyperparameters": [
+                sample_hyperparameters(algorithm, rng) for _ in range(members)
+            ],
+            "sources": list(range(members)),
+        }
+
+    paths = [
+        os.path.join(weights_directory, member_name(member))
+        for member in range(members)
+    ]
+
+    # Finish promoting the last generation if it was interrupted after its state
+    staged_directory = generation_directory(directory, state["generation"] - 1)
+    if state["generation"] > 0 and os.path.isdir(staged_directory):
+        promote_checkpoints(
+            [
+                os.path.join(staged_directory, member_name(member))
+                for member in range(members)
+            ],
+            paths,
+            state["sources"],
+        )
+
+    budgets = split_cores(cores, members)
+    seeds = np.random.SeedSequence(seed).generate_state(members)
+
+    while state["generation"] < generations:
+        generation = state["generation"]
+        rng = np.random.default_rng([seed, generation])
+        opponent_seeds = np.random.SeedSequence([seed, generation]).generate_state(
+            members
+        )
+        staged_directory = generation_directory(directory, generation)
+        os.makedirs(staged_directory, exist_ok=True)
+        staged_paths = [
+            os.path.join(staged_directory, member_name(member))
+            for member in range(members)
+        ]
+
+        # Train every member on its own core budget
+        results = [None] * members
+        with ProcessPoolExecutor(members) as pool:
+            futures = {
+                pool.submit(
+                    train_member,
+                    paths[member],
+                    staged_paths[member],
+                    state["hyperparameters"][member],
+                    timesteps,
+                    budgets[member],
+                    int(seeds[member]),
+                    int(opponent_seeds[member]),
+                    config,
+                ): member
+                for member in range(members)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        # Rate the members head to head on headless simulators
+        specs = [f"{algorithm}:{path}" for path in staged_paths]
+        ratings = summarize(
+            specs,
+            run_tournament(
+                specs,
+                games=games,
+                max_steps=max_steps,
+                seed=int(rng.integers(2**31)),
+                workers=len(cores),
+                cache_dir=os.path.join(directory, "tournament"),
+            ),
+            bootstrap=100,
+        )
+        elo = {specs.index(rating["player"]): rating["elo"] for rating in ratings}
+        ranking = sorted(range(members), key=lambda member: -elo[member])
+
+        # The worst members continue from copies of the best, with perturbed settings
+        count = min(math.ceil(exploit_fraction * members), members // 2)
+        winners, losers = ranking[:count], ranking[members - count :]
+        exploits = {}
+        sources = list(range(members))
+        hyperparameters = list(state["hyperparameters"])
+        for loser in losers:
+            winner = int(rng.choice(winners))
+            sources[loser] = winner
+            hyperparameters[loser] = perturb_hyperparameters(
+                algorithm, state["hyperparameters"][winner], rng
+            )
+            exploits[loser] = winner
+
+        record = {
+            "generation": generation,
+            "members": [
+                {
+                    "member": member,
+                    "hyperparameters": state["hyperparameters"][member],
+                    "elo": elo[member],
+                    **results[member],
+                    "copied_from": exploits.get(member),
+                }
+                for member in range(members)
+            ],
+        }
+        with open(log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        # Write atomically, an interrupted generation is trained again on resume
+        state["generation"] = generation + 1
+        state["hyperparameters"] = hyperparameters
+        state["sources"] = sources
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(state_path + ".tmp", state_path)
+
+        # Only now replace the weights, with the worst members copying the best
+        promote_checkpoints(staged_paths, paths, sources)
+
+        if progress is not None:
+            progress(record)
+
+    return state
@@ -0,0 +1,226 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..simulator.constants import *
+from ..simulator.physics import KlaskPhysicsParams
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+# Columns of the ball in agent state arrays
+_KEYS = KlaskSimulator.agent_state_keys
+BALL_POS = [_KEYS.index("ball_pos_x"), _KEYS.index("ball_pos_y")]
+BALL_VEL = [_KEYS.index("ball_vel_x"), _KEYS.index("ball_vel_y")]
+
+# Box2D settings the simulator runs with: normal speeds below the restitution threshold
+# (m/s) bounce inelastically, and fixtures keep the default friction
+_VELOCITY_THRESHOLD = 1.0
+_WALL_FRICTION = 0.2
+
+# Goals entered by the ball
+NO_GOAL = 0
+LEFT_GOAL = 1  # Player 2 scores
+RIGHT_GOAL = 2  # Player 1 scores
+
+
+class BallPredictor:
+    """
+    Predicts the ball for a batch of boards without a Box2D world.
+
+    The ball slides in a straight line, slowed by the table friction, and bounces off
+    the walls. It passes through the dividers, and pucks and biscuits are ignored.
+    Positions and velocities are in agent state (pixel) units, times in seconds.
+    """
+
+    def __init__(
+        self,
+        length_scaler=100,
+        pixels_per_meter=20,
+        simulation_fps=120,
+        physics=None,
+        max_bounces=8,
+    ):
+        physics = KlaskPhysicsParams() if physics is None else physics
+        scale = length_scaler * pixels_per_meter
+        self.max_bounces = max_bounces
+
+        # Board geometry, as the range of ball centre positions between the walls
+        self.radius = radius = KG_BALL_RADIUS * scale
+        self.low = np.array([radius, radius])
+        self.high = np.array([KG_BOARD_WIDTH * scale, KG_BOARD_HEIGHT * scale]) - radius
+        self.goals = np.array(
+            [
+                [KG_GOAL_OFFSET_X * scale, KG_BOARD_HEIGHT * scale / 2],
+                [
+                    (KG_BOARD_WIDTH - KG_GOAL_OFFSET_X) * scale,
+                    KG_BOARD_HEIGHT * scale / 2,
+                ],
+            ]
+        )
+        self.goal_radius = KG_GOAL_RADIUS * scale
+
+        # The friction joint removes at most gravity * time_step of speed per tick.
+        # Positions integrate the slowed velocity, matching a continuous slide that
+        # starts half a tick of deceleration slower.
+        self.time_step = 1.0 / simulation_fps
+        self.deceleration = physics.gravity * pixels_per_meter
+        self.restitution = physics.restitution
+        self.velocity_threshold = _VELOCITY_THRESHOLD * pixels_per_meter
+
+    def predict_states(self, states, times):
+        # Predict from (N, 24) agent state arrays
+        states = np.asarray(states, dtype=np.float64)
+        return self.predict(states[:, BALL_POS], states[:, BALL_VEL], times)
+
+    def predict(self, positions, velocities, times):
+        # Predict (N, T, 2) positions and velocities at the given times, the (N, B)
+        # wall hit times (infinity padded), and the goal entered first with its time
+        positions = np.asarray(positions, dtype=np.float64)
+        velocities = np.asarray(velocities, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        segments = self.__segments(positions, velocities)
+
+        # Find the segment every time falls in, then slide along it
+        start_times, start_positions, directions, speeds = segments
+        index = (start_times[:, None, 1:] <= times[None, :, None]).sum(-1)
+        rows = np.arange(len(positions))[:, None]
+        elapsed = times[None, :] - start_times[rows, index]
+        speed = speeds[rows, index]
+        elapsed = np.minimum(elapsed, speed / self.deceleration)
+        distance = speed * elapsed - self.deceleration * elapsed**2 / 2
+        predicted_positions = (
+            start_positions[rows, index] + directions[rows, index] * distance[..., None]
+        )
+        # Velocities add back the half tick, as the simulator reports them after a tick
+        speed = speed - self.deceleration * elapsed
+        speed = np.where(speed > 0, speed + self.deceleration * self.time_step / 2, 0.0)
+        predicted_velocities = directions[rows, index] * speed[..., None]
+
+        goals, goal_times = self.__goal_entries(segments)
+        return {
+            "positions": predicted_positions,
+            "velocities": predicted_velocities,
+            "wall_hits": start_times[:, 1:],
+            "goals": goals,
+            "goal_times": goal_times,
+        }
+
+    def __segments(self, positions, velocities):
+        # Straight slides between wall hits, as start time, position, direction and
+        # (half a tick slower) speed, with unreached segments starting at infinity
+        count = len(positions)
+        start_times = np.full((count, self.max_bounces + 1), np.inf)
+        start_positions = np.zeros((count, self.max_bounces + 1, 2))
+        directions = np.zeros((count, self.max_bounces + 1, 2))
+        speeds = np.zeros((count, self.max_bounces + 1))
+
+        position = np.clip(positions, self.low, self.high)
+        velocity = velocities.copy()
+        spin = np.zeros(count)  # Angular velocity, agent states do not hold it
+        time = np.zeros(count)
+        rows = np.arange(count)
+        for segment in range(self.max_bounces + 1):
+            speed = np.hypot(velocity[:, 0], velocity[:, 1])
+            direction = np.divide(
+                velocity,
+                speed[:, None],
+                out=np.zeros_like(velocity),
+                where=speed[:, None] > 0,
+            )
+            speed = np.maximum(speed - self.deceleration * self.time_step / 2, 0.0)
+
+            moving = np.isfinite(time)
+            start_times[moving, segment] = time[moving]
+            start_positions[:, segment] = position
+            directions[:, segment] = direction
+            speeds[:, segment] = speed
+
+            # Distance to the wall ahead on each axis, and the first one reached
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distances = np.where(
+                    direction > 0,
+                    (self.high - position) / direction,
+                    np.where(direction < 0, (self.low - position) / direction, np.inf),
+                )
+            axis = np.argmin(distances, axis=1)
+            distance = np.where(moving, np.maximum(distances[rows, axis], 0.0), 0.0)
+
+            # Solve speed * t - deceleration * t^2 / 2 = distance, if the ball gets there
+            reach = speed**2 - 2 * self.deceleration * distance
+            hits = moving & (reach >= 0) & (speed > 0)
+            travel = np.where(
+                hits, (speed - np.sqrt(np.maximum(reach, 0.0))) / self.deceleration, 0.0
+            )
+            time = np.where(hits, time + travel, np.inf)
+            position = position + direction * np.where(hits, distance, 0.0)[:, None]
+            velocity = (
+                direction
+                * (speed - self.deceleration * (travel - self.time_step / 2))[:, None]
+                * hits[:, None]
+            )
+            spin = self.__bounce(velocity, spin, axis, direction[rows, axis] > 0)
+
+        return start_times, start_positions, directions, speeds
+
+    def __bounce(self, velocity, spin, axis, high):
+        # Bounce off the walls in place, the normal speed restituted and the contact
+        # point slowed by the wall friction, which also spins the ball. The ball is a
+        # disk of unit mass, with moment of inertia radius^2 / 2.
+        rows = np.arange(len(velocity))
+        normal = np.zeros_like(velocity)
+        normal[rows, axis] = np.where(high, -1.0, 1.0)
+        tangent = np.stack([-normal[:, 1], normal[:, 0]], axis=1)
+        arm = -normal * self.radius
+        inertia = self.radius**2 / 2
+
+        normal_speed = -(velocity * normal).sum(1)
+        restitution = np.where(
+            normal_speed > self.velocity_threshold, self.restitution, 0.0
+        )
+        normal_impulse = (1 + restitution) * np.maximum(normal_speed, 0.0)
+
+        contact = velocity + spin[:, None] * np.stack([-arm[:, 1], arm[:, 0]], axis=1)
+        lever = arm[:, 0] * tangent[:, 1] - arm[:, 1] * tangent[:, 0]
+        friction = -(contact * tangent).sum(1) / (1 + lever**2 / inertia)
+        friction = np.clip(
+            friction, -_WALL_FRICTION * normal_impulse, _WALL_FRICTION * normal_impulse
+        )
+
+        velocity += normal * normal_impulse[:, None] + tangent * friction[:, None]
+        return spin + lever * friction / inertia
+
+    def __goal_entries(self, segments):
+        # First time the ball centre enters a goal, along every reached segment
+        start_times, start_positions, directions, speeds = segments
+        count = len(start_times)
+        goals = np.full(count, NO_GOAL)
+        goal_times = np.full(count, np.nan)
+
+        end_times = np.concatenate([start_times[:, 1:], np.full((count, 1), np.inf)], 1)
+        for goal, centre in zip([LEFT_GOAL, RIGHT_GOAL], self.goals):
+            # Distance along each segment where the line enters the goal circle
+            offset = start_positions - centre
+            along = (offset * directions).sum(-1)
+            gap = (offset**2).sum(-1) - self.goal_radius**2
+            discriminant = along**2 - gap
+            with np.errstate(invalid="ignore"):
+                distance = np.where(gap <= 0, 0.0, -along - np.sqrt(discriminant))
+            possible = (discriminant >= 0) & (distance >= 0) & np.isfinite(start_times)
+
+            # Time to slide that far, which must come before the segment ends
+            reach = speeds**2 - 2 * self.deceleration * distance
+            possible &= reach >= 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                elapsed = np.where(
+                    gap <= 0,
+                    0.0,
+                    (speeds - np.sqrt(np.maximum(reach, 0.0))) / self.deceleration,
+                )
+            entry = np.where(possible, start_times + elapsed, np.inf)
+            entry = np.where(entry <= end_times, entry, np.inf).min(1)
+
+            earlier = np.isfinite(entry) & ~(goal_times <= entry)
+            goals[earlier] = goal
+            goal_times[earlier] = entry[earlier]
+
+        return goals, goal_times
@@ -0,0 +1,281 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import hashlib
+import json
+import multiprocessing
+import os
+import zipfile
+
+import numpy as np
+
+from ..environment.environment import MAX_FORCE
+from ..opponents.opponents import opponents
+from ..simulator.simulator import KlaskSimulator
+
+# Policies that can drive either player, besides the scripted opponents
+policies = ["random", "stationary"] + list(opponents)
+
+# Arrays stored in every shard, one row per transition
+SHARD_ARRAYS = [
+    "states",  # (T, 24) float32 agent states before the step
+    "actions",  # (T, 4) float32 normalized actions of player 1 then player 2
+    "next_states",  # (T, 24) float32 agent states after the step
+    "game_states",  # (T,) uint16 bitmask of the game states after the step
+    "terminals",  # (T,) bool, the game ended on this step
+    "timeouts",  # (T,) bool, the episode was cut by the step limit or shard end
+    "episodes",  # (T,) int32 episode index within the shard
+]
+
+# Fixed archive timestamp, so identical shards are identical files
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Simulators owned by this worker process, reused across shards
+_simulators = []
+
+
+def _init_worker(cores):
+    # Pin each worker to its own core
+    core = cores.get()
+    if core is not None:
+        os.sched_setaffinity(0, {core})
+
+
+def make_policy(name, seed):
+    # Create a batched policy, mapping (N, 24) states to (N, 2) normalized actions
+    if name == "random":
+        rng = np.random.default_rng(seed)
+        return lambda states, player: rng.uniform(
+            -1.0, 1.0, size=(len(states), 2)
+        ).astype(np.float32)
+    if name == "stationary":
+        return lambda states, player: np.zeros((len(states), 2), dtype=np.float32)
+    if name in opponents:
+        return opponents[name](seed=seed)
+    raise ValueError(f"Unknown policy {name}")
+
+
+def shard_name(index):
+    return f"shard_{index:06d}.npz"
+
+
+def write_shard(path, arrays):
+    # Write a compressed npz deterministically and atomically, returns its sha256
+    with zipfile.ZipFile(path + ".tmp", "w", compression=zipfile.ZIP_DEFLATED) as f:
+        for name, array in arrays.items():
+            info = zipfile.ZipInfo(f"{name}.npy", date_time=_ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with f.open(info, "w") as member:
+                np.lib.format.write_array(member, np.ascontiguousarray(array))
+    os.replace(path + ".tmp", path)
+
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def generate_shard(directory, index, transitions, config):
+    # Play games in lockstep until the shard holds the requested transitions. Seeds
+    # derive from the run seed and shard index only, so shards are reproducible no
+    # matter which worker generates them.
+    seeds = np.random.SeedSequence(config["seed"], spawn_key=(index,)).spawn(3)
+    game_rng = np.random.default_rng(seeds[0])
+    players = [
+        make_policy(config["player1"], seeds[1]),
+        make_policy(config["player2"], seeds[2]),
+    ]
+
+    games = config["games"]
+    while len(_simulators) < games:
+        _simulators.append(KlaskSimulator(render_mode=None))
+    simulators = _simulators[:games]
+
+    # Preallocate the shard, with room for the last lockstep step
+    capacity = transitions + games
+    arrays = {
+        "states": np.zeros((capacity, 24), dtype=np.float32),
+        "actions": np.zeros((capacity, 4), dtype=np.float32),
+        "next_states": np.zeros((capacity, 24), dtype=np.float32),
+        "game_states": np.zeros(capacity, dtype=np.uint16),
+        "terminals": np.zeros(capacity, dtype=bool),
+        "timeouts": np.zeros(capacity, dtype=bool),
+        "episodes": np.zeros(capacity, dtype=np.int32),
+    }
+
+    def reset(game):
+        seed = int(game_rng.integers(2**31))
+        _, _, agent_states = simulators[game].reset(seed=seed, outputs=["agent_state"])
+        states[game] = np.fromiter(agent_states.values(), dtype=np.float32)
+
+    states = np.zeros((games, 24), dtype=np.float32)
+    steps = np.zeros(games, dtype=np.int64)
+    episodes = np.arange(games, dtype=np.int32)
+    for game in range(games):
+        reset(game)
+    next_episode = games
+
+    count = 0
+    while count < transitions:
+        actions = np.concatenate(
+            [players[0](states, player=1), players[1](states, player=2)], axis=1
+        )
+        rows = slice(count, count + games)
+        arrays["states"][rows] = states
+        arrays["actions"][rows] = actions
+        arrays["episodes"][rows] = episodes
+        steps += 1
+
+        for game, sim in enumerate(simulators):
+            _, game_states, agent_states = sim.step(
+                (
+                    float(actions[game, 0]) * MAX_FORCE,
+                    float(actions[game, 1]) * MAX_FORCE,
+                ),
+                (
+                    float(actions[game, 2]) * MAX_FORCE,
+                    float(actions[game, 3]) * MAX_FORCE,
+                ),
+                outputs=["game_state", "agent_state"],
+            )
+            row = count + game
+            states[game] = np.fromiter(agent_states.values(), dtype=np.float32)
+            arrays["next_states"][row] = states[game]
+            arrays["game_states"][row] = sum(1 << state.value for state in game_states)
+
+            # Start a new episode once the game ends or runs out of steps
+            terminal = KlaskSimulator.GameStates.PLAYING not in game_states
+            timeout = not terminal and steps[game] >= config["max_steps"]
+            arrays["terminals"][row] = terminal
+            arrays["timeouts"][row] = timeout
+            if terminal or timeout:
+                reset(game)
+                steps[game] = 0
+                episodes[game] = next_episode
+                next_episode += 1
+
+        count += games
+
+    # Trim to size, episodes still running at the end of the shard are cut
+    arrays = {name: array[:transitions] for name, array in arrays.items()}
+    _, last = np.unique(arrays["episodes"][::-1], return_index=True)
+    last = transitions - 1 - last
+    arrays["timeouts"][last] |= ~arrays["terminals"][last]
+
+    path = os.path.join(directory, shard_name(index))
+    return {
+        "index": index,
+        "file": shard_name(index),
+        "transitions": transitions,
+        "episodes": len(last),
+        "sha256": write_shard(path, arrays),
+    }
+
+
+def run_rollouts(
+    directory,
+    transitions,
+    shard_size=100000,
+    games=32,
+    max_steps=1000,
+    player1="random",
+    player2="random",
+    seed=0,
+    workers=None,
+    progress=None,
+):
+    # Generate shards across a process pool and record them in a manifest. Finished
+    # shards are kept, so an interrupted run resumes where it stopped.
+    if workers is None:
+        workers = len(os.sched_getaffinity(0))
+    for player in [player1, player2]:
+        if player not in policies:
+            raise ValueError(f"Unknown policy {player}")
+
+    config = {
+        "transitions": transitions,
+        "shard_size": shard_size,
+        "games": games,
+        "max_steps": max_steps,
+        "player1": player1,
+        "player2": player2,
+        "seed": seed,
+        "arrays": SHARD_ARRAYS,
+        "state_keys": KlaskSimulator.agent_state_keys,
+    }
+
+    # Resume from an existing manifest, which must describe the same run
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+    shards = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["config"] != config:
+            raise ValueError(f"{directory} holds rollouts with different settings")
+        shards = {
+            shard["index"]: shard
+            for shard in manifest["shards"]
+            if os.path.exists(os.path.join(directory, shard["file"]))
+        }
+
+    sizes = [
+        min(shard_size, transitions - start)
+        for start in range(0, transitions, shard_size)
+    ]
+    pending = [index for index in range(len(sizes)) if index not in shards]
+
+    def write_manifest():
+        # Write atomically, shards are listed in order so reruns match byte for byte
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(
+                {
+                    "config": config,
+                    "shards": [shards[index] for index in sorted(shards)],
+                    "complete": len(shards) == len(sizes),
+                },
+                f,
+                indent=2,
+            )
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    # One core per worker, while cores last
+    cores = multiprocessing.Queue()
+    available = sorted(os.sched_getaffinity(0))
+    for worker in range(workers):
+        cores.put(available[worker] if workers <= len(available) else None)
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(cores,)
+    ) as pool:
+        futures = [
+            pool.submit(generate_shard, directory, index, sizes[index], config)
+            for index in pending
+        ]
+        for future in as_completed(futures):
+            shard = future.result()
+            shards[shard["index"]] = shard
+            write_manifest()
+
+            if progress is not None:
+                progress(shard, len(shards), len(sizes))
+
+    write_manifest()
+    return manifest_path
+
+
+def load_rollouts(directory):
+    # Load every shard of a finished run, concatenated in shard order
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    # Episode indices are offset to stay unique across shards
+    arrays = {name: [] for name in manifest["config"]["arrays"]}
+    episodes = 0
+    for shard in manifest["shards"]:
+        with np.load(os.path.join(directory, shard["file"])) as data:
+            for name in arrays:
+                arrays[name].append(data[name])
+        arrays["episodes"][-1] = arrays["episodes"][-1] + episodes
+        episodes += shard["episodes"]
+    return {name: np.concatenate(parts) for name, parts in arrays.items()}
@@ -0,0 +1,66 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import asyncio
+
+from .protocol import *
+
+
+class KlaskMatchClient:
+    """Connects to a KlaskMatchServer to play or spectate a match."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.decoder = StateDeltaDecoder()
+
+    @classmethod
+    async def connect_tcp(cls, host="127.0.0.1", port=0):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @classmethod
+    async def connect_unix(cls, path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    def join(self, match_id, player):
+        # Join a match as player 1 or 2, or as a spectator with player 0
+        self.decoder = StateDeltaDecoder()
+        self.writer.write(JOIN.pack(MSG_JOIN, match_id, player))
+
+    def send_action(self, action):
+        # Set the impulse applied to the controlled puck on every tick
+        self.writer.write(ACTION.pack(MSG_ACTION, action[0], action[1]))
+
+    def request_stats(self):
+        # Ask the server for its tick statistics, answered by a stats message
+        self.writer.write(STATS_REQUEST.pack(MSG_STATS_REQUEST))
+
+    async def receive(self):
+        # Wait for the next message, returns its type and decoded content.
+        # States decode to (tick, game_states, agent_states), stats decode to
+        # (ticks, duration, p50 tick time, p99 tick time, max tick time).
+        header = await self.reader.readexactly(HEADER.size)
+        (msg_type,) = HEADER.unpack(header)
+
+        if msg_type == MSG_STATE:
+            header += await self.reader.readexactly(STATE_HEADER.size - HEADER.size)
+            mask = STATE_HEADER.unpack(header)[3]
+            payload = await self.reader.readexactly(
+                StateDeltaDecoder.payload_size(mask)
+            )
+            return msg_type, self.decoder.decode(header, payload)
+
+        if msg_type == MSG_STATS:
+            header += await self.reader.readexactly(STATS.size - HEADER.size)
+            return msg_type, STATS.unpack(header)[1:]
+
+        raise ConnectionError(f"Unknown message type {msg_type}")
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -0,0 +1,114 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import struct
+
+from ..simulator.simulator import KlaskSimulator
+
+# Message types
+MSG_JOIN = 1  # Client joins a match as a player, client -> server
+MSG_ACTION = 2  # Client sets its puck impulse, client -> server
+MSG_STATE = 3  # State delta of a match after a tick, server -> client
+MSG_STATS_REQUEST = 4  # Client requests tick statistics, client -> server
+MSG_STATS = 5  # Tick statistics since the last request, server -> client
+
+# Message layouts (little endian, no padding)
+HEADER = struct.Struct("<B")
+JOIN = struct.Struct("<BIB")  # type, match id, player (1 or 2)
+ACTION = struct.Struct("<Bff")  # type, impulse x, impulse y
+STATE_HEADER = struct.Struct("<BIHI")  # type, tick, game state bits, field mask
+STATS_REQUEST = struct.Struct("<B")  # type
+STATS = struct.Struct("<BQdddd")  # type, ticks, duration, p50, p99, max tick time
+
+# Client message sizes, keyed by type
+CLIENT_MESSAGE_SIZES = {
+    MSG_JOIN: JOIN.size,
+    MSG_ACTION: ACTION.size,
+    MSG_STATS_REQUEST: STATS_REQUEST.size,
+}
+
+# Agent state fields, in the order returned by KlaskSimulator
+STATE_FIELDS = KlaskSimulator.agent_state_keys
+FULL_MASK = (1 << len(STATE_FIELDS)) - 1
+
+_FLOAT32 = struct.Struct("<f")
+
+
+def encode_game_states(game_states):
+    # Pack a list of game states into a bit field
+    bits = 0
+    for game_state in game_states:
+        bits |= 1 << game_state.value
+    return bits
+
+
+def decode_game_states(bits):
+    # Unpack a bit field into a list of game states
+    return [
+        game_state
+        for game_state in KlaskSimulator.GameStates
+        if bits & (1 << game_state.value)
+    ]
+
+
+class StateDeltaEncoder:
+    """Encodes agent states as deltas against the last state sent to one client."""
+
+    def __init__(self):
+        self.last_values = None
+
+    def encode(self, tick, game_states, agent_states):
+        # Round to the transmitted precision so unchanged fields compare equal
+        values = [
+            _FLOAT32.unpack(_FLOAT32.pack(agent_states[field]))[0]
+            for field in STATE_FIELDS
+        ]
+
+        # Determine which fields changed since the last message
+        if self.last_values is None:
+            mask = FULL_MASK
+        else:
+            mask = 0
+            for i, (value, last_value) in enumerate(zip(values, self.last_values)):
+                if value != last_value:
+                    mask |= 1 << i
+        self.last_values = values
+
+        # Pack the header followed by the changed fields
+        changed = [value for i, value in enumerate(values) if mask & (1 << i)]
+        return STATE_HEADER.pack(
+            MSG_STATE, tick, encode_game_states(game_states), mask
+        ) + struct.pack(f"<{len(changed)}f", *changed)
+
+    def invalidate(self):
+        # Force the next message to contain every field
+        self.last_values = None
+
+
+class StateDeltaDecoder:
+    """Rebuilds full agent states from a stream of state deltas."""
+
+    def __init__(self):
+        self.values = [0.0] * len(STATE_FIELDS)
+
+    @staticmethod
+    def payload_size(mask):
+        # Number of bytes following the header for a field mask
+        return bin(mask).count("1") * _FLOAT32.size
+
+    def decode(self, header, payload):
+        # Apply a state delta, returns the tick, game states and agent states
+        _, tick, game_state_bits, mask = STATE_HEADER.unpack(header)
+
+        changed = struct.unpack(f"<{len(payload) // _FLOAT32.size}f", payload)
+        j = 0
+        for i in range(len(STATE_FIELDS)):
+            if mask & (1 << i):
+                self.values[i] = changed[j]
+                j += 1
+
+        return (
+            tick,
+            decode_game_states(game_state_bits),
+            dict(zip(STATE_FIELDS, self.values)),
+        )
@@ -0,0 +1,214 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import asyncio
+import math
+import time
+
+from ..environment.environment import MAX_FORCE
+from ..simulator.simulator import KlaskSimulator
+from .protocol import *
+
+
+class KlaskMatchServer:
+    """Hosts many concurrent Klask matches, ticking them in fixed-rate batches."""
+
+    class Match:
+        def __init__(self, match_id, seed):
+            self.match_id = match_id
+            self.seed = seed
+
+            # Headless simulator, clients render locally from the streamed states
+            self.sim = KlaskSimulator(render_mode=None)
+            self.sim.reset(seed=seed)
+
+            self.tick = 0
+            self.actions = [(0.0, 0.0), (0.0, 0.0)]
+            self.clients = []
+            self.game_over = False
+
+    class Client:
+        def __init__(self, writer):
+            self.writer = writer
+            self.encoder = StateDeltaEncoder()
+            self.match = None
+            self.player = 0  # 0 spectates, 1 and 2 control a puck
+
+    def __init__(self, tick_rate=120, max_write_buffer=65536, seed=None):
+        self.tick_rate = tick_rate
+        self.max_write_buffer = max_write_buffer  # Skip clients that fall behind
+        self.seed = seed
+
+        self.matches = {}
+        self.servers = []
+        self.tick_task = None
+
+        # Tick statistics since the last stats request
+        self.stats_start = time.perf_counter()
+        self.tick_times = []
+
+    async def start_tcp(self, host="127.0.0.1", port=0):
+        # Listen on a TCP socket, returns the bound port
+        server = await asyncio.start_server(self.__handle_client, host, port)
+        self.servers.append(server)
+        self.__start_ticking()
+        return server.sockets[0].getsockname()[1]
+
+    async def start_unix(self, path):
+        # Listen on a Unix domain socket
+        server = await asyncio.start_unix_server(self.__handle_client, path)
+        self.servers.append(server)
+        self.__start_ticking()
+
+    async def close(self):
+        # Stop ticking and close all listening sockets and client connections
+        if self.tick_task is not None:
+            self.tick_task.cancel()
+            try:
+                await self.tick_task
+            except asyncio.CancelledError:
+                pass
+            self.tick_task = None
+
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+
+        for match in list(self.matches.values()):
+            for client in match.clients:
+                client.writer.close()
+        self.matches = {}
+
+    def tick(self):
+        # Advance every match by one physics step and stream the state deltas
+        for match in self.matches.values():
+            # Start a new point once the previous one ended
+            if match.game_over:
+                seed = None if match.seed is None else match.seed + match.tick
+                _, game_states, agent_states = match.sim.reset(seed=seed)
+                match.game_over = False
+            else:
+                _, game_states, agent_states = match.sim.step(
+                    match.actions[0],
+                    match.actions[1],
+                    outputs=["game_state", "agent_state"],
+                )
+                match.game_over = KlaskSimulator.GameStates.PLAYING not in game_states
+
+            match.tick += 1
+
+            for client in match.clients:
+                # Skip clients whose socket cannot keep up, the next delta covers the gap
+                transport = client.writer.transport
+                if transport.get_write_buffer_size() > self.max_write_buffer:
+                    continue
+                client.writer.write(
+                    client.encoder.encode(match.tick, game_states, agent_states)
+                )
+
+    def __start_ticking(self):
+        if self.tick_task is None:
+            self.tick_task = asyncio.get_running_loop().create_task(self.__tick_loop())
+
+    async def __tick_loop(self):
+        # Tick on a fixed schedule, without bursting to catch up when running behind
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            self.tick_times.append(time.perf_counter() - start)
+
+            next_tick += period
+            delay = next_tick - loop.time()
+            if delay < 0:
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def __stats_message(self):
+        # Summarize the tick times since the last request
+        now = time.perf_counter()
+        tick_times = sorted(self.tick_times)
+        p50 = p99 = maximum = 0.0
+        if tick_times:
+            p50 = tick_times[int(0.50 * (len(tick_times) - 1))]
+            p99 = tick_times[int(0.99 * (len(tick_times) - 1))]
+            maximum = tick_times[-1]
+        message = STATS.pack(
+            MSG_STATS, len(tick_times), now - self.stats_start, p50, p99, maximum
+        )
+
+        self.stats_start = now
+        self.tick_times = []
+        return message
+
+    def __join(self, client, match_id, player):
+        # Move a client into a match, creating the match if needed
+        self.__leave(client)
+
+        if match_id not in self.matches:
+            seed = None if self.seed is None else self.seed + match_id
+            self.matches[match_id] = self.Match(match_id, seed)
+
+        client.match = self.matches[match_id]
+        client.player = player
+        client.encoder.invalidate()
+        client.match.clients.append(client)
+
+    def __leave(self, client):
+        # Remove a client from its match, closing the match once empty
+        match = client.match
+        if match is None:
+            return
+
+        match.clients.remove(client)
+        if client.player:
+            match.actions[client.player - 1] = (0.0, 0.0)
+        if not match.clients:
+            del self.matches[match.match_id]
+
+        client.match = None
+
+    async def __handle_client(self, reader, writer):
+        client = self.Client(writer)
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                (msg_type,) = HEADER.unpack(header)
+
+                # Drop clients that speak an unknown protocol
+                if msg_type not in CLIENT_MESSAGE_SIZES:
+                    break
+                message = header + await reader.readexactly(
+                    CLIENT_MESSAGE_SIZES[msg_type] - HEADER.size
+                )
+
+                if msg_type == MSG_JOIN:
+                    _, match_id, player = JOIN.unpack(message)
+                    if player not in (0, 1, 2):
+                        break
+                    self.__join(client, match_id, player)
+
+                elif msg_type == MSG_ACTION:
+                    # Ignore non-finite impulses, and clamp the others to the
+                    # strongest push a player can make
+                    _, impulse_x, impulse_y = ACTION.unpack(message)
+                    if not (math.isfinite(impulse_x) and math.isfinite(impulse_y)):
+                        continue
+                    if client.match is not None and client.player:
+                        client.match.actions[client.player - 1] = (
+                            min(max(impulse_x, -MAX_FORCE), MAX_FORCE),
+                            min(max(impulse_y, -MAX_FORCE), MAX_FORCE),
+                        )
+
+                elif msg_type == MSG_STATS_REQUEST:
+                    writer.write(self.__stats_message())
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.__leave(client)
+            writer.close()
@@ -63,3 +63,10 @@ KG_GRAVITY = 9.80665
 
 # Restitution
 KG_RESTITUTION_COEF = 0.4
+
+# Collision Filtering
+KG_CATEGORY_WALL = 0x0001
+KG_CATEGORY_PUCK = 0x0002
+KG_CATEGORY_BALL = 0x0004
+KG_CATEGORY_BISCUIT = 0x0008
+KG_CATEGORY_DIVIDER = 0x0010
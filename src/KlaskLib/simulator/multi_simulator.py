@@ -0,0 +1,353 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from Box2D.b2 import world, pi
+from .constants import *
+from .simulator import KlaskSimulator
+
+import numpy as np
+
+# Bodies of a board in agent state order, biscuits then pucks then the ball
+BODY_KEYS = ["biscuit1", "biscuit2", "biscuit3", "puck1", "puck2", "ball"]
+BISCUITS = slice(0, 3)
+PUCK1, PUCK2, BALL = 3, 4, 5
+
+# Game state bits, in the bitmask layout of rollout shards
+_BITS = {state: np.uint16(1 << state.value) for state in KlaskSimulator.GameStates}
+
+
+class KlaskMultiSimulator:
+    """
+    Simulates many independent boards in one Box2D world, stepped by one world.Step.
+
+    Boards are laid out on a grid with a gap between them, so bodies of different
+    boards never share a broad-phase pair. States are batched arrays, and the game
+    rules are applied to every board at once.
+    """
+
+    def __init__(
+        self,
+        num_boards,
+        length_scaler=100,
+        pixels_per_meter=20,
+        simulation_fps=120,
+        velocity_iterations=10,
+        position_iterations=10,
+        physics=None,
+        board_gap=10.0,
+    ):
+        # Store user parameters
+        assert num_boards >= 1
+        self.num_boards = num_boards
+        self.length_scaler = length_scaler
+        self.pixels_per_meter = pixels_per_meter
+        self.time_step = 1.0 / simulation_fps
+        self.velocity_iterations = velocity_iterations
+        self.position_iterations = position_iterations
+
+        # Fixture definitions, physics and initial layouts come from one simulator
+        self.template = KlaskSimulator(
+            render_mode=None,
+            length_scaler=length_scaler,
+            pixels_per_meter=pixels_per_meter,
+            physics=physics,
+        )
+        self.fixture_defs = self.template.fixture_defs
+        self.physics = self.template.physics
+        self.magnet_strength = self.template.magnet_strength
+        self.biscuit_contact_distance = self.template.biscuit_contact_distance
+        self.layouts = self.__create_layouts()
+
+        # Board origins on a grid centred on the world origin, keeping coordinates
+        # small as Box2D positions are single precision. A single board sits at the
+        # origin, like the board of a KlaskSimulator.
+        width = KG_BOARD_WIDTH * length_scaler + board_gap
+        height = KG_BOARD_HEIGHT * length_scaler + board_gap
+        columns = int(np.ceil(np.sqrt(num_boards)))
+        rows = int(np.ceil(num_boards / columns))
+        index = np.arange(num_boards)
+        self.offsets = np.stack(
+            [
+                (index % columns - (columns - 1) / 2) * width,
+                (index // columns - (rows - 1) / 2) * height,
+            ],
+            axis=1,
+        )
+
+        # Goal centres relative to the board origin
+        self.goal_radius = KG_GOAL_RADIUS * length_scaler
+        self.goals = (
+            np.array(
+                [
+                    [KG_GOAL_OFFSET_X, KG_BOARD_HEIGHT / 2],
+                    [KG_BOARD_WIDTH - KG_GOAL_OFFSET_X, KG_BOARD_HEIGHT / 2],
+                ]
+            )
+            * length_scaler
+        )
+
+        # Box2D world, with the walls and dividers of every board created once
+        self.world = world(gravity=(0, 0), doSleep=True)
+        self.ground = self.world.CreateStaticBody(position=(0, 0))
+        for offset in self.offsets:
+            for body_key in [
+                "wall_bottom",
+                "wall_left",
+                "wall_right",
+                "wall_top",
+                "divider_left",
+                "divider_right",
+            ]:
+                body = self.world.CreateStaticBody(position=tuple(offset))
+                body.CreateFixture(self.fixture_defs[body_key])
+
+        # Dynamic bodies of every board in BODY_KEYS order. Attached biscuits refer to
+        # the body of their puck, offset by the attached fixture position.
+        self.bodies = [None] * num_boards
+        self.attached = np.zeros((num_boards, 3), dtype=np.uint8)  # 0, or puck 1 or 2
+        self.attached_offsets = np.zeros((num_boards, 3, 2))
+        self.positions = np.zeros((num_boards, len(BODY_KEYS), 2))  # World positions
+        self.velocities = np.zeros((num_boards, len(BODY_KEYS), 2))
+        self.game_states = np.full(num_boards, _BITS[KlaskSimulator.GameStates.PLAYING])
+
+        # Random number generator of every board, reseeded by reset(seed=...)
+        self.rngs = [np.random.default_rng() for _ in range(num_boards)]
+
+        # Internal state variable
+        self.is_initialized = False
+
+    def reset(self, boards=None, seed=None, ball_start_position="random"):
+        # Reset the given boards (all by default) to their initial layout, and return
+        # the game states and agent states of every board. Seeds are described in
+        # __seed_boards.
+        assert ball_start_position in KlaskSimulator.ball_start_positions
+
+        boards = np.arange(self.num_boards) if boards is None else np.asarray(boards)
+        if seed is not None:
+            self.__seed_boards(boards, seed)
+
+        # Every board draws its start position from its own stream, as a KlaskSimulator
+        # seeded with the same seed would
+        start_positions = list(self.layouts)
+        draws = [self.rngs[board].integers(4) for board in boards]
+        for board, draw in zip(boards, draws):
+            start_position = start_positions[draw]
+            if ball_start_position != "random":
+                start_position = ball_start_position
+            self.__create_board(board, self.layouts[start_position])
+
+        self.is_initialized = True
+        return self.game_states.copy(), self.get_agent_states()
+
+    def step(self, actions1, actions2):
+        # Apply (K, 2) action impulses of both players to every board, step the world
+        # once, then apply the game rules. Boards that ended keep stepping until reset.
+        assert self.is_initialized
+        actions1 = np.asarray(actions1, dtype=np.float64).tolist()
+        actions2 = np.asarray(actions2, dtype=np.float64).tolist()
+        forces = self.__magnet_forces().tolist()
+
+        # Apply forces to pucks, and magnetic forces to biscuits
+        for board, bodies in enumerate(self.bodies):
+            puck1, puck2 = bodies[PUCK1], bodies[PUCK2]
+            puck1.ApplyLinearImpulse(actions1[board], puck1.position, wake=True)
+            puck2.ApplyLinearImpulse(actions2[board], puck2.position, wake=True)
+            for biscuit, force in enumerate(forces[board]):
+                if not self.attached[board, biscuit]:
+                    bodies[biscuit].ApplyForceToCenter(force=force, wake=True)
+
+        # Step the physics simulation of every board
+        self.world.Step(
+            self.time_step, self.velocity_iterations, self.position_iterations
+        )
+
+        self.__read_bodies()
+        self.__attach_biscuits()
+        self.game_states = self.__determine_game_states()
+        return self.game_states.copy(), self.get_agent_states()
+
+    def get_agent_states(self):
+        # (K, 24) agent states in KlaskSimulator.agent_state_keys order, in pixels
+        positions = self.positions - self.offsets[:, None]
+        states = np.concatenate([positions, self.velocities], axis=2)
+        return states.reshape(self.num_boards, -1) * self.pixels_per_meter
+
+    def close(self):
+        # Release fixture user data, which Box2D would otherwise keep alive
+        if self.world is None:
+            return
+
+        for body in self.world.bodies:
+            for fixture in body.fixtures:
+                fixture.userData = None
+        self.world = None
+        self.bodies = None
+        self.template.close()
+        self.is_initialized = False
+
+    def __create_layouts(self):
+        # Body positions of the four initial layouts, relative to the board origin
+        layouts = {}
+        for start_position in KlaskSimulator.ball_start_positions[:-1]:
+            _, _, agent_state = self.template.reset(
+                ball_start_position=start_position, outputs=["agent_state"]
+            )
+            layouts[start_position] = (
+                np.array(
+                    [
+                        [agent_state[f"{key}_pos_x"], agent_state[f"{key}_pos_y"]]
+                        for key in BODY_KEYS
+                    ]
+                )
+                / self.pixels_per_meter
+            )
+        return layouts
+
+    def __seed_boards(self, boards, seed):
+        # An int or SeedSequence seeds board b with its child b, the same as
+        # SeedSequence(seed).spawn(num_boards)[b]. A sequence holds one seed per board,
+        # so boards split across simulators or processes get the streams they would
+        # have in one simulator by passing a slice of the spawned children.
+        if isinstance(seed, (int, np.integer)):
+            seed = np.random.SeedSequence(int(seed))
+        if isinstance(seed, np.random.SeedSequence):
+            seeds = [
+                np.random.SeedSequence(
+                    seed.entropy,
+                    spawn_key=seed.spawn_key + (int(board),),
+                    pool_size=seed.pool_size,
+                )
+                for board in boards
+            ]
+        else:
+            seeds = list(seed)
+            assert len(seeds) == len(boards)
+
+        for board, board_seed in zip(boards, seeds):
+            self.rngs[board] = np.random.default_rng(board_seed)
+
+    def __create_board(self, board, layout):
+        # Replace the dynamic bodies of a board, destroying their joints with them
+        if self.bodies[board] is not None:
+            for body in set(self.bodies[board]):
+                for fixture in body.fixtures:
+                    fixture.userData = None
+                self.world.DestroyBody(body)
+
+        bodies = []
+        for body_key, position in zip(BODY_KEYS, layout + self.offsets[board]):
+            body = self.world.CreateDynamicBody(
+                position=tuple(position),
+                fixedRotation=body_key.startswith("puck"),
+                bullet=True,
+            )
+            body.CreateFixture(self.fixture_defs[body_key])
+            bodies.append(body)
+
+        # Table friction holds the ball and biscuits
+        for body in bodies[BISCUITS] + [bodies[BALL]]:
+            self.world.CreateFrictionJoint(
+                bodyA=self.ground,
+                bodyB=body,
+                maxForce=body.mass * self.physics.gravity,
+            )
+
+        self.bodies[board] = bodies
+        self.attached[board] = 0
+        self.positions[board] = layout + self.offsets[board]
+        self.velocities[board] = 0.0
+        self.game_states[board] = _BITS[KlaskSimulator.GameStates.PLAYING]
+
+    def __magnet_forces(self):
+        # (K, 3, 2) magnetic forces pulling the biscuits towards both pucks
+        biscuits = self.positions[:, BISCUITS, None]
+        pucks = self.positions[:, None, PUCK1 : PUCK2 + 1]
+        pull = pucks - biscuits
+        separation = np.linalg.norm(pull, axis=-1, keepdims=True)
+        force = pull * self.magnet_strength / (4 * pi * separation**3)
+        return force.sum(axis=2)
+
+    def __read_bodies(self):
+        # Copy the positions and velocities of every body after the step, gathered in
+        # one list as element-wise array assignment from Box2D vectors is slow.
+        # Attached biscuits follow their puck.
+        values = []
+        for bodies in self.bodies:
+            for body in bodies:
+                position, velocity = body.position, body.linearVelocity
+                values.append((position.x, position.y, velocity.x, velocity.y))
+        values = np.array(values).reshape(self.num_boards, len(BODY_KEYS), 4)
+        self.positions = values[..., :2]
+        self.velocities = values[..., 2:]
+        self.positions[:, BISCUITS] += (
+            self.attached_offsets * (self.attached > 0)[..., None]
+        )
+
+    def __attach_biscuits(self):
+        # Attach free biscuits touching a puck (puck 1 first), as KlaskSimulator does
+        separation = np.linalg.norm(
+            self.positions[:, BISCUITS, None]
+            - self.positions[:, None, PUCK1 : PUCK2 + 1],
+            axis=-1,
+        )
+        touching = (separation <= self.biscuit_contact_distance) & (self.attached == 0)[
+            ..., None
+        ]
+
+        for board, biscuit in zip(*np.nonzero(touching.any(axis=2))):
+            puck_index = PUCK1 if touching[board, biscuit, 0] else PUCK2
+            bodies = self.bodies[board]
+            puck = bodies[puck_index]
+            biscuit_body = bodies[biscuit]
+
+            # Create the attached biscuit fixture, filtered out of all further contacts
+            position = biscuit_body.position - puck.position
+            attached_def = self.fixture_defs[f"{BODY_KEYS[biscuit]}_attached"]
+            attached_def.shape.pos = position
+            puck.CreateFixture(attached_def)
+
+            # Remove the biscuit body, releasing its user data first
+            for fixture in biscuit_body.fixtures:
+                fixture.userData = None
+            self.world.DestroyBody(biscuit_body)
+            bodies[biscuit] = puck
+
+            self.attached[board, biscuit] = puck_index - PUCK1 + 1
+            self.attached_offsets[board, biscuit] = tuple(position)
+            self.positions[board, biscuit] = self.positions[board, puck_index] + tuple(
+                position
+            )
+            self.velocities[board, biscuit] = self.velocities[board, puck_index]
+
+    def __determine_game_states(self):
+        # (K,) bitmasks of KlaskSimulator.GameStates, as KlaskSimulator determines them
+        states = KlaskSimulator.GameStates
+        positions = self.positions - self.offsets[:, None]
+
+        def in_goal(body, goal):
+            distance = np.linalg.norm(positions[:, body] - self.goals[goal], axis=-1)
+            return distance <= self.goal_radius
+
+        p1_score = in_goal(BALL, 1)
+        p2_klask = in_goal(PUCK2, 1)
+        p2_two_biscuit = (self.attached == 2).sum(axis=1) >= 2
+        p2_score = in_goal(BALL, 0)
+        p1_klask = in_goal(PUCK1, 0)
+        p1_two_biscuit = (self.attached == 1).sum(axis=1) >= 2
+        p1_win = p1_score | p2_klask | p2_two_biscuit
+        p2_win = p2_score | p1_klask | p1_two_biscuit
+
+        game_states = np.zeros(self.num_boards, dtype=np.uint16)
+        for condition, state in [
+            (p1_score, states.P1_SCORE),
+            (p2_klask, states.P2_KLASK),
+            (p2_two_biscuit, states.P2_TWO_BISCUIT),
+            (p1_win, states.P1_WIN),
+            (p2_score, states.P2_SCORE),
+            (p1_klask, states.P1_KLASK),
+            (p1_two_biscuit, states.P1_TWO_BISCUIT),
+            (p2_win, states.P2_WIN),
+            (~(p1_win | p2_win), states.PLAYING),
+        ]:
+            game_states[condition] |= _BITS[state]
+        return game_states
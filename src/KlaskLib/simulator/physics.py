@@ -0,0 +1,48 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from .constants import *
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+
+@dataclass
+class KlaskPhysicsParams:
+    """Physical parameters of one board, defaulting to the constants.py values."""
+
+    puck_mass: float = KG_PUCK_MASS  # (kg)
+    ball_mass: float = KG_BALL_MASS  # (kg)
+    biscuit_mass: float = KG_BISCUIT_MASS  # (kg)
+    restitution: float = KG_RESTITUTION_COEF  # Of the ball and biscuits
+    magnetic_charge: float = KG_MAGNETIC_CHARGE  # (A/m)
+    gravity: float = KG_GRAVITY  # (m/s^2), sets the table friction on ball and biscuits
+
+
+# Default randomization, as (low, high) factors of the default value of every field
+DEFAULT_RANGES = {
+    "puck_mass": (0.8, 1.2),
+    "ball_mass": (0.8, 1.2),
+    "biscuit_mass": (0.8, 1.2),
+    "restitution": (0.75, 1.25),
+    "magnetic_charge": (0.8, 1.2),
+    "gravity": (0.8, 1.2),
+}
+
+
+def sample_physics(count, rng=None, ranges=None):
+    # Sample parameters for a batch of boards at once, each field drawn uniformly
+    # between the factors of its default value. Fields missing from ranges keep
+    # their default.
+    rng = np.random.default_rng(rng)
+    ranges = DEFAULT_RANGES if ranges is None else ranges
+    default = KlaskPhysicsParams()
+
+    names = [field.name for field in fields(KlaskPhysicsParams)]
+    low = np.array([ranges.get(name, (1.0, 1.0))[0] for name in names])
+    high = np.array([ranges.get(name, (1.0, 1.0))[1] for name in names])
+    values = rng.uniform(low, high, size=(count, len(names))) * np.array(
+        [getattr(default, name) for name in names]
+    )
+
+    return [KlaskPhysicsParams(**dict(zip(names, map(float, row)))) for row in values]
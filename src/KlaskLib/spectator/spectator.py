@@ -0,0 +1,251 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..simulator.constants import *
+from ..simulator.simulator import KlaskSimulator
+
+from contextlib import redirect_stdout
+
+import math
+import socket
+import struct
+import time
+
+import gymnasium as gym
+
+with redirect_stdout(None):
+    import pygame
+
+DEFAULT_PORT = 5600
+
+# Snapshot datagram (little endian, no padding): board, episode, step, episode
+# return, then the agent states in KlaskSimulator.agent_state_keys order
+SNAPSHOT = struct.Struct(f"<HIIf{len(KlaskSimulator.agent_state_keys)}f")
+
+# Agent state pixels per constants.py meter, for the default simulator configuration
+STATE_SCALE = 100 * 20
+
+# Bodies drawn on each board, as (x key index, radius, color)
+_KEYS = KlaskSimulator.agent_state_keys
+_BODIES = [
+    (_KEYS.index(f"biscuit{i}_pos_x"), KG_BISCUIT_RADIUS, KG_BISCUIT_COLOR)
+    for i in range(1, 4)
+] + [
+    (_KEYS.index("puck1_pos_x"), KG_PUCK_RADIUS, KG_PUCK_COLOR),
+    (_KEYS.index("puck2_pos_x"), KG_PUCK_RADIUS, KG_PUCK_COLOR),
+    (_KEYS.index("ball_pos_x"), KG_BALL_RADIUS, KG_BALL_COLOR),
+]
+
+
+class SpectatorPublisher(gym.Wrapper):
+    """
+    Publishes snapshots of a KlaskEnv board to a spectator over UDP.
+
+    Snapshots are sent on reset and at most rate times per second while stepping.
+    Sending never blocks and lost datagrams are ignored, so the environment can stay
+    headless and pays almost nothing for being watched.
+    """
+
+    def __init__(self, env, board, host="127.0.0.1", port=DEFAULT_PORT, rate=10.0):
+        super().__init__(env)
+        self.board = board
+        self.address = (host, port)
+        self.interval = 1.0 / rate
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.last_publish = -math.inf
+        self.episode = 0
+        self.steps = 0
+        self.episode_return = 0.0
+
+    def reset(self, **kwargs):
+        observation, info = self.env.reset(**kwargs)
+        self.episode += 1
+        self.steps = 0
+        self.episode_return = 0.0
+        self.__publish()
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self.steps += 1
+        self.episode_return += reward
+        if time.perf_counter() - self.last_publish >= self.interval:
+            self.__publish()
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self.sock.close()
+        super().close()
+
+    def __publish(self):
+        self.last_publish = time.perf_counter()
+
+        # Agent states are determined on demand when the environment skipped them
+        agent_states = self.env.unwrapped.agent_states
+        if agent_states is None:
+            agent_states = self.env.unwrapped.sim.get_agent_state()
+
+        try:
+            self.sock.sendto(
+                SNAPSHOT.pack(
+                    self.board,
+                    self.episode,
+                    self.steps,
+                    self.episode_return,
+                    *agent_states.values(),
+                ),
+                self.address,
+            )
+        except OSError:
+            pass
+
+
+class KlaskSpectator:
+    """
+    Draws the latest snapshot of every publishing board in one tiled window.
+
+    Boards are tiled in order of their board number, and the grid grows as new
+    boards start publishing. Boards that stop publishing are dimmed.
+    """
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=DEFAULT_PORT,
+        tile_width=160,
+        columns=None,
+        fps=30,
+        stale_after=5.0,
+    ):
+        self.tile_width = tile_width
+        self.tile_height = int(tile_width * KG_BOARD_HEIGHT / KG_BOARD_WIDTH)
+        self.columns = columns
+        self.fps = fps
+        self.stale_after = stale_after
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+
+        # Latest snapshot and arrival time, keyed by board
+        self.boards = {}
+
+        self.screen = None
+        self.grid = None
+        self.font = None
+        self.board_surface = self.__render_board()
+
+    def poll(self):
+        # Keep the latest snapshot of every board, returns the snapshots received
+        received = 0
+        while True:
+            try:
+                data = self.sock.recv(SNAPSHOT.size)
+            except BlockingIOError:
+                return received
+            if len(data) != SNAPSHOT.size:
+                continue
+
+            board, episode, steps, episode_return, *states = SNAPSHOT.unpack(data)
+            self.boards[board] = (episode, steps, episode_return, states, time.time())
+            received += 1
+
+    def draw(self):
+        # Draw every board into one surface
+        boards = sorted(self.boards)
+        columns = self.columns or max(1, math.ceil(math.sqrt(len(boards))))
+        rows = max(1, math.ceil(len(boards) / columns))
+        surface = pygame.Surface(
+            (columns * self.tile_width, rows * self.tile_height), 0, 32
+        )
+
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 16)
+
+        now = time.time()
+        for tile, board in enumerate(boards):
+            episode, steps, episode_return, states, arrival = self.boards[board]
+            origin = (
+                (tile % columns) * self.tile_width,
+                (tile // columns) * self.tile_height,
+            )
+            surface.blit(self.board_surface, origin)
+
+            for index, radius, color in _BODIES:
+                pygame.draw.circle(
+                    surface,
+                    color,
+                    (
+                        origin[0] + self.__to_tile(states[index]),
+                        origin[1]
+                        + self.tile_height
+                        - self.__to_tile(states[index + 1]),
+                    ),
+                    max(1, int(radius / KG_BOARD_WIDTH * self.tile_width)),
+                )
+
+            label = f"{board}  ep {episode}  step {steps}  R {episode_return:.0f}"
+            surface.blit(self.font.render(label, True, (255, 255, 255)), origin)
+
+            # Dim boards that stopped publishing
+            if now - arrival > self.stale_after:
+                shade = pygame.Surface((self.tile_width, self.tile_height))
+                shade.set_alpha(160)
+                surface.blit(shade, origin)
+
+        return surface
+
+    def run(self, duration=None):
+        # Poll and redraw until the window is closed, or for duration seconds
+        pygame.display.init()
+        clock = pygame.time.Clock()
+        start = time.perf_counter()
+        while duration is None or time.perf_counter() - start < duration:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (
+                    event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+                ):
+                    return
+
+            self.poll()
+            surface = self.draw()
+
+            # Resize the window as boards start publishing
+            if self.screen is None or surface.get_size() != self.grid:
+                self.grid = surface.get_size()
+                self.screen = pygame.display.set_mode(self.grid)
+                pygame.display.set_caption("Klask Spectator")
+            self.screen.blit(surface, (0, 0))
+            pygame.display.flip()
+            clock.tick(self.fps)
+
+    def close(self):
+        self.sock.close()
+        if self.screen is not None:
+            pygame.quit()
+            self.screen = None
+
+    def __to_tile(self, pixels):
+        # Convert agent state pixels to tile pixels
+        return int(pixels / (KG_BOARD_WIDTH * STATE_SCALE) * self.tile_width)
+
+    def __render_board(self):
+        # Board background with goals, shared by every tile
+        surface = pygame.Surface((self.tile_width, self.tile_height), 0, 32)
+        surface.fill(KG_BOARD_COLOR)
+        goal_radius = int(KG_GOAL_RADIUS / KG_BOARD_WIDTH * self.tile_width)
+        for goal_x in [KG_GOAL_OFFSET_X, KG_BOARD_WIDTH - KG_GOAL_OFFSET_X]:
+            pygame.draw.circle(
+                surface,
+                KG_GOAL_COLOR,
+                (
+                    int(goal_x / KG_BOARD_WIDTH * self.tile_width),
+                    self.tile_height // 2,
+                ),
+                goal_radius,
+            )
+        return surface
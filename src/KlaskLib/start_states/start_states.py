@@ -0,0 +1,125 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import MAX_FORCE
+from ..opponents.opponents import DEFAULT_SCALE
+from ..simulator.constants import *
+from ..simulator.multi_simulator import KlaskMultiSimulator
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+start_state_dtype = KlaskSimulator.start_state_dtype
+
+# Columns of the bodies in agent state arrays
+_KEYS = KlaskSimulator.agent_state_keys
+_POSITIONS = {
+    body: [_KEYS.index(f"{body}_pos_x"), _KEYS.index(f"{body}_pos_y")]
+    for body in ["biscuit1", "biscuit2", "biscuit3", "puck1", "puck2"]
+}
+
+# Game state bit of playing boards, in the bitmask layout of rollout shards
+_PLAYING_BIT = 1 << KlaskSimulator.GameStates.PLAYING.value
+
+
+def make_start_states(agent_states, attached=None):
+    # Build start state records from (N, 24) agent states and (N, 3) attachments,
+    # inferred from the biscuit positions when not given
+    agent_states = np.asarray(agent_states, dtype=np.float64).reshape(-1, 24)
+    start_states = np.zeros(len(agent_states), dtype=start_state_dtype)
+    start_states["agent_state"] = agent_states
+    start_states["attached"] = (
+        infer_attached(agent_states) if attached is None else attached
+    )
+    return start_states
+
+
+def infer_attached(agent_states, scale=DEFAULT_SCALE):
+    # The simulator attaches a biscuit to the first puck it touches at the end of a
+    # step, so biscuits within touching distance of a puck are attached to it
+    agent_states = np.asarray(agent_states, dtype=np.float64)
+    distance = (KG_PUCK_RADIUS + KG_BISCUIT_RADIUS) * scale
+    attached = np.zeros(agent_states.shape[:-1] + (3,), dtype=np.uint8)
+    for biscuit in range(3):
+        position = agent_states[..., _POSITIONS[f"biscuit{biscuit + 1}"]]
+        for puck in [2, 1]:
+            separation = position - agent_states[..., _POSITIONS[f"puck{puck}"]]
+            touching = np.linalg.norm(separation, axis=-1) <= distance
+            attached[..., biscuit] = np.where(touching, puck, attached[..., biscuit])
+    return attached
+
+
+class StartStateBank:
+    """Samples recorded or generated mid-game start states in vectorized batches."""
+
+    def __init__(self, start_states, seed=None):
+        self.start_states = np.asarray(start_states, dtype=start_state_dtype)
+        assert len(self.start_states)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.start_states)
+
+    def sample(self, count, rng=None):
+        # Draw (count,) start states with replacement, from the bank's own stream
+        # unless a generator is given
+        rng = self.rng if rng is None else rng
+        return self.start_states[rng.integers(len(self.start_states), size=count)]
+
+    def save(self, path):
+        np.save(path, self.start_states)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        return cls(np.load(path), seed=seed)
+
+    @classmethod
+    def from_rollouts(cls, arrays, seed=None):
+        # Bank the states that rollout shards acted on, with inferred attachments
+        return cls(make_start_states(arrays["states"]), seed=seed)
+
+    @classmethod
+    def generate(
+        cls, count, min_steps=60, max_steps=600, num_boards=64, policy=None, seed=None
+    ):
+        # Play boards in one multi-board world, banking one state per game at a random
+        # step in [min_steps, max_steps) if the game is still going. The policy maps
+        # (K, 24) agent states to (K, 4) normalized actions of both players, random
+        # by default.
+        seeds = np.random.SeedSequence(seed).spawn(2)
+        rng = np.random.default_rng(seeds[0])
+        if policy is None:
+            policy = lambda states: rng.uniform(-1.0, 1.0, (len(states), 4))
+
+        multi = KlaskMultiSimulator(num_boards)
+        _, agent_states = multi.reset(seed=seeds[1])
+        steps = np.zeros(num_boards, dtype=np.int64)
+        targets = rng.integers(min_steps, max_steps, num_boards)
+
+        start_states = np.zeros(count, dtype=start_state_dtype)
+        banked = 0
+        while banked < count:
+            actions = np.asarray(policy(agent_states)) * MAX_FORCE
+            game_states, agent_states = multi.step(actions[:, :2], actions[:, 2:])
+            steps += 1
+
+            # Bank the boards reaching their target step, and restart them with the
+            # boards that ended
+            playing = (game_states & _PLAYING_BIT) > 0
+            chosen = np.flatnonzero(playing & (steps == targets))[: count - banked]
+            start_states["agent_state"][banked : banked + len(chosen)] = agent_states[
+                chosen
+            ]
+            start_states["attached"][banked : banked + len(chosen)] = multi.attached[
+                chosen
+            ]
+            banked += len(chosen)
+
+            restart = np.flatnonzero(~playing | (steps == targets))
+            if len(restart):
+                _, agent_states = multi.reset(boards=restart)
+                steps[restart] = 0
+                targets[restart] = rng.integers(min_steps, max_steps, len(restart))
+
+        multi.close()
+        return cls(start_states, seed=seed)
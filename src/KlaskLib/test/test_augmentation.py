@@ -0,0 +1,83 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..augmentation.augmentation import MirrorAugmenter, flip_actions, flip_states
+from ..environment.environment import MAX_FORCE
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+
+def test_mirrored_states_follow_the_physics():
+    """
+    Determine if mirrored states and actions match simulating the mirrored board
+    """
+    rng = np.random.default_rng(0)
+    for symmetry, ball_start_position in [
+        ("left_right", "top_left"),
+        ("top_bottom", "bottom_right"),
+        ("both", "bottom_left"),
+    ]:
+        sim = KlaskSimulator(render_mode=None)
+        mirrored = KlaskSimulator(render_mode=None)
+        _, _, states = sim.reset(
+            seed=1, ball_start_position="top_right", outputs=["agent_state"]
+        )
+        _, _, mirrored_states = mirrored.reset(
+            seed=1, ball_start_position=ball_start_position, outputs=["agent_state"]
+        )
+
+        for _ in range(30):
+            states = np.array(list(states.values()))
+            mirrored_states = np.array(list(mirrored_states.values()))
+            assert np.abs(flip_states(states, symmetry) - mirrored_states).max() < 1e-2
+
+            actions = rng.uniform(-1, 1, 4)
+            flipped = flip_actions(actions, symmetry)
+            _, _, states = sim.step(
+                tuple(actions[:2] * MAX_FORCE),
+                tuple(actions[2:] * MAX_FORCE),
+                outputs=["agent_state"],
+            )
+            _, _, mirrored_states = mirrored.step(
+                tuple(flipped[:2] * MAX_FORCE),
+                tuple(flipped[2:] * MAX_FORCE),
+                outputs=["agent_state"],
+            )
+
+
+def test_mirror_augmenter_batches():
+    """
+    Determine if batches gain their mirrored counterparts, with roles and outcomes swapped
+    """
+    sim = KlaskSimulator(render_mode="rgb_array")
+    frame, _, states = sim.reset(seed=1, ball_start_position="top_right")
+    expected, _, _ = sim.reset(seed=1, ball_start_position="top_left")
+
+    p1_win = 1 << KlaskSimulator.GameStates.P1_WIN.value
+    p2_win = 1 << KlaskSimulator.GameStates.P2_WIN.value
+    batch = {
+        "observations": np.moveaxis(frame, -1, 0)[None].repeat(2, axis=0),
+        "states": np.array([list(states.values())] * 2, dtype=np.float32),
+        "actions": np.array([[0.5, 0.25], [-1.0, 1.0]], dtype=np.float32),
+        "game_states": np.array([p1_win, 0], dtype=np.uint16),
+        "rewards": np.array([1000.0, 0.1]),
+        "terminals": np.array([True, False]),
+        "episodes": np.array([0, 1]),
+    }
+    augmented = MirrorAugmenter()(batch)
+
+    assert len(augmented["actions"]) == 8
+    assert list(augmented["symmetry"]) == [0, 0, 1, 1, 2, 2, 3, 3]
+    assert list(augmented["players"]) == [1, 1, 2, 2, 1, 1, 2, 2]
+    assert list(augmented["episodes"]) == [0, 1, 2, 3, 4, 5, 6, 7]
+    assert list(augmented["actions"][6]) == [-0.5, -0.25]
+    assert list(augmented["game_states"][::2]) == [p1_win, p2_win, p1_win, p2_win]
+    assert list(augmented["rewards"][::2]) == [1000.0, -1000.0, 1000.0, -1000.0]
+    assert augmented["states"].dtype == np.float32
+
+    # Flipped frames keep the board logos, and only differ from rendering the mirrored
+    # board by bodies shifted up to a pixel
+    flipped = np.moveaxis(augmented["observations"][2], 0, -1)
+    assert (flipped != expected).any(-1).sum() < 500
+    assert (frame[:, ::-1] != expected).any(-1).sum() > 5000
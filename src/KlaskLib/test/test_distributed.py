@@ -0,0 +1,78 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..distributed.vec_env import KlaskDistributedVecEnv
+from ..distributed.worker import KlaskRolloutWorker
+
+import multiprocessing
+import time
+
+import numpy as np
+
+
+def run_worker(port):
+    worker = KlaskRolloutWorker(
+        2, observation_type="state", opponent="ball_chaser", max_episode_steps=10
+    )
+    worker.run("127.0.0.1", port, reconnect_delay=0.1, max_reconnects=50)
+    worker.close()
+
+
+def test_distributed_vec_env_replaces_workers():
+    """
+    Determine if localhost workers serve a vec env, and a failed worker's slot stays
+    vacant without stalling the other workers until a replacement connects
+    """
+
+    vec_env = KlaskDistributedVecEnv(
+        2, 2, host="127.0.0.1", observation_type="state", timeout=30.0
+    )
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(vec_env.port,))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+
+    vec_env.seed(3)
+    observations = vec_env.reset()
+    assert observations.shape == (4, 24)
+
+    actions = np.zeros((4, 2), dtype=np.float32)
+    for step in range(1, 11):
+        observations, rewards, dones, infos = vec_env.step(actions)
+        assert observations.shape == (4, 24)
+        assert rewards.shape == (4,)
+
+    # Every episode is cut by the step limit after 10 steps
+    assert dones.all()
+    assert all(info["TimeLimit.truncated"] for info in infos)
+    assert all(info["terminal_observation"].shape == (24,) for info in infos)
+
+    # Kill one worker, the other keeps stepping while no replacement arrives
+    workers[0].kill()
+    workers[0].join()
+    for _ in range(3):
+        start = time.perf_counter()
+        observations, rewards, dones, infos = vec_env.step(actions)
+        assert time.perf_counter() - start < 5.0
+        assert dones[:2].all() and (rewards[:2] == 0).all()
+        assert all(info["worker_failed"] for info in infos[:2])
+        assert not any(info.get("worker_failed", False) for info in infos[2:])
+
+    # A replacement fills the vacant slot once it connects
+    workers.append(multiprocessing.Process(target=run_worker, args=(vec_env.port,)))
+    workers[-1].start()
+    for _ in range(200):
+        observations, rewards, dones, infos = vec_env.step(actions)
+        if vec_env.workers[0] is not None:
+            break
+        time.sleep(0.05)
+    observations, rewards, dones, infos = vec_env.step(actions)
+    assert not any(info.get("worker_failed", False) for info in infos)
+    assert observations.shape == (4, 24)
+
+    vec_env.close()
+    for worker in workers[1:]:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
@@ -15,3 +15,69 @@ def test_sb3_env_checker():
 def test_gym_env_checker():
     env = KlaskEnv()
     gym_check_env(env)
+
+
+def test_gym_env_checker_state_observation():
+    env = KlaskEnv(render_mode=None, observation_type="state")
+    gym_check_env(env)
+
+
+def test_gym_env_checker_half_frame_observation():
+    env = KlaskEnv(render_mode=None, observation_type="half_frame")
+    gym_check_env(env)
+
+
+def test_env_render_on_demand():
+    """
+    Determine if state observations only render frames when requested
+    """
+
+    env = KlaskEnv(render_mode="rgb_array", observation_type="state")
+    observation, _ = env.reset(seed=10)
+
+    assert observation.shape == (24,)
+
+    assert env.frame is None
+
+    observation, _, _, _, _ = env.step(env.action_space.sample())
+
+    assert env.frame is None
+
+    assert env.render().shape == (609, 787, 3)
+
+
+def test_env_stalled_games():
+    """
+    Determine if stalled games are truncated, or stepped without rendering new frames
+    """
+    import numpy as np
+
+    idle = np.zeros(2, dtype=np.float32)
+
+    # Truncation reports the steps left before the step limit
+    env = KlaskEnv(
+        render_mode=None,
+        observation_type="state",
+        stall_ticks=30,
+        max_episode_steps=1000,
+    )
+    env.reset(seed=10)
+    for step in range(1, 100):
+        _, _, terminated, truncated, info = env.step(idle)
+        if truncated:
+            break
+    assert step == 30 and not terminated
+    assert info["stall_truncated"] and info["stall_steps_saved"] == 970
+
+    # Skipped frames match rendering, and moving again renders new frames
+    env = KlaskEnv(render_mode=None, stall_ticks=10, stall_mode="skip_render")
+    env.reset(seed=10)
+    for _ in range(50):
+        observation, _, _, truncated, info = env.step(idle)
+    assert not truncated and info["renders_skipped"] == 41
+    assert (np.moveaxis(observation, 0, -1) == env.sim.render()).all()
+
+    observation, _, _, _, info = env.step(np.ones(2, dtype=np.float32))
+    assert info["quiescent_ticks"] == 0 and info["renders_skipped"] == 41
+    assert (np.moveaxis(observation, 0, -1) == env.sim.render()).all()
+    gym_check_env(env)
@@ -0,0 +1,124 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..augmentation.augmentation import MirrorAugmenter
+from ..evaluation.players import CheckpointPlayer
+from ..evaluation.tournament import (
+    fit_elo,
+    flip_counts,
+    game_outcome,
+    run_tournament,
+    summarize,
+)
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+
+def test_evaluation_game_outcome():
+    """
+    Determine if final game states are classified from each player's perspective
+    """
+
+    game_states = [KlaskSimulator.GameStates.P2_KLASK, KlaskSimulator.GameStates.P1_WIN]
+
+    assert game_outcome(game_states, 1) == "win_klask"
+
+    assert game_outcome(game_states, 2) == "loss_klask"
+
+    assert game_outcome([KlaskSimulator.GameStates.PLAYING], 1) == "draw"
+
+    assert flip_counts({"win_score": 2, "loss_score": 1, "draw": 3}) == {
+        "win_score": 1,
+        "loss_score": 2,
+        "draw": 3,
+    }
+
+
+def test_evaluation_fit_elo_ordering():
+    """
+    Determine if stronger players receive higher Elo ratings
+    """
+
+    scores = np.array([[0, 8, 9], [2, 0, 7], [1, 3, 0]], dtype=float)
+    ratings = fit_elo(scores)
+
+    assert ratings[0] > ratings[1] > ratings[2]
+
+    assert abs(ratings.mean() - 1000) < 1e-6
+
+
+def test_evaluation_tournament_resumes(tmp_path):
+    """
+    Determine if finished pairings are served from the cache when rerun
+    """
+
+    specs = ["baseline:stationary", "baseline:random", "baseline:chaser"]
+    results = run_tournament(
+        specs, games=2, max_steps=50, workers=1, cache_dir=str(tmp_path)
+    )
+
+    assert len(results) == 3
+
+    assert all(sum(counts.values()) == 2 for counts in results.values())
+
+    finished = []
+    resumed = run_tournament(
+        specs,
+        games=2,
+        max_steps=50,
+        workers=1,
+        cache_dir=str(tmp_path),
+        progress=lambda *pair: finished.append(pair),
+    )
+
+    assert resumed == results
+
+    assert not finished
+
+    ratings = summarize(specs, results, bootstrap=50)
+
+    assert sorted(rating["player"] for rating in ratings) == sorted(specs)
+
+
+def test_evaluation_tournament_chunks():
+    """
+    Determine if splitting pairings into chunks of games leaves the outcome counts unchanged
+    """
+
+    specs = ["baseline:random", "baseline:chaser"]
+    whole = run_tournament(specs, games=6, max_steps=300, workers=1, chunk_games=6)
+    chunked = run_tournament(specs, games=6, max_steps=300, workers=2, chunk_games=4)
+
+    assert chunked == whole
+
+    assert sum(chunked[tuple(specs)].values()) == 6
+
+
+def test_evaluation_checkpoint_player_mirrors_frames():
+    """
+    Determine if a full frame checkpoint playing player 2 sees the mirrored board with its logos restored
+    """
+
+    class RecordingModel:
+        def predict(self, observation, deterministic):
+            self.observation = observation
+            return np.zeros(2, dtype=np.float32), None
+
+    sim = KlaskSimulator(render_mode="rgb_array")
+    frame, _, agent_states = sim.reset(seed=0)
+    sim.close()
+
+    player = CheckpointPlayer.__new__(CheckpointPlayer)
+    player.model = RecordingModel()
+    player.half_width = None
+    player.needs_frame = True
+    player.augmenter = None
+
+    player.act(frame, agent_states, 1)
+    assert np.array_equal(player.model.observation, np.moveaxis(frame, -1, 0))
+
+    player.act(frame, agent_states, 2)
+    mirrored = MirrorAugmenter().flip_frames(frame[None], "left_right")[0]
+    assert np.array_equal(player.model.observation, np.moveaxis(mirrored, -1, 0))
+    assert not np.array_equal(mirrored, frame[:, ::-1])
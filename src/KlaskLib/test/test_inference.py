@@ -0,0 +1,65 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..inference.inference import KlaskInferenceService
+
+import numpy as np
+
+
+class DoublingBackend:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def setup(self):
+        pass
+
+    def __call__(self, observations):
+        self.batch_sizes.append(len(observations))
+        return observations * 2
+
+
+def test_inference_service_batches_requests():
+    """
+    Determine if queued requests are served by batched forward passes in order
+    """
+
+    backend = DoublingBackend()
+    service = KlaskInferenceService(backend, max_batch_size=8, max_wait=0.05)
+
+    observations = np.arange(20, dtype=np.float32).reshape(10, 2)
+    with service:
+        futures = [service.submit(observation) for observation in observations]
+        actions = np.array([future.result(timeout=5) for future in futures])
+
+    assert np.array_equal(actions, observations * 2)
+
+    assert max(backend.batch_sizes) > 1
+
+    batch_size_counts, latency_counts = service.histograms()
+
+    assert sum(size * count for size, count in enumerate(batch_size_counts)) == 10
+
+    assert latency_counts.sum() == 10
+
+
+def test_inference_service_from_checkpoint(tmp_path):
+    """
+    Determine if a saved checkpoint serves the same actions as the loaded model
+    """
+    import gymnasium as gym
+    from stable_baselines3 import A2C
+
+    model = A2C("MlpPolicy", gym.make("Pendulum-v1"))
+    model.save(tmp_path / "checkpoint.zip")
+
+    observations = np.random.default_rng(0).normal(size=(6, 3)).astype(np.float32)
+    expected, _ = model.predict(observations, deterministic=True)
+
+    with KlaskInferenceService.from_checkpoint(
+        tmp_path / "checkpoint.zip", backend="torch"
+    ) as service:
+        actions = np.array(
+            [service.predict(observation) for observation in observations]
+        )
+
+    assert np.allclose(actions, expected, atol=1e-5)
@@ -0,0 +1,81 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..latency.latency import LatencyTracer, format_summary
+from ..simulator.simulator import KlaskSimulator
+
+import json
+
+import numpy as np
+
+
+def test_latency_tracer_matches_inputs_to_frames(tmp_path):
+    """
+    Determine if inputs are matched to the tick consuming them and the frame showing them
+    """
+
+    # Two 10 ms frames, each polling, ticking and presenting, then one input in flight
+    tracer = LatencyTracer()
+    tracer.start = 0.0
+    tracer.polls = [0.000, 0.010, 0.020]
+    tracer.inputs = [0.001, 0.011, 0.021]
+    tracer.input_names = ["d", "d", "a"]
+    tracer.tick_begins = [0.002, 0.012]
+    tracer.tick_ends = [0.003, 0.013]
+    for present in [0.004, 0.004, 0.014]:
+        tracer.present(present)
+    tracer.present(None)
+
+    latencies = tracer.latencies()
+    assert list(latencies["present"]) == [0.004, 0.014]
+    assert latencies["names"] == ["d", "d"]
+
+    summary = tracer.summary()
+    assert summary["inputs"] == 2 and summary["frames"] == 2
+    assert abs(summary["input_to_present"]["p50"] - 3.0) < 1e-6
+    assert abs(summary["poll_gap"]["p99"] - 10.0) < 1e-6
+    assert sum(summary["frame_time"]["histogram"]) == 1
+    assert "input_to_present" in format_summary(summary)
+
+    # Matched inputs are exported as latency spans
+    path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    assert len([event for event in events if event["name"] == "tick"]) == 2
+    assert len([event for event in events if event.get("cat") == "latency"]) == 4
+
+
+def test_latency_tracer_separates_tick_from_frame_wait():
+    """
+    Determine if the traced tick covers the physics only, not rendering or the frame
+    rate wait, when stepping like the demo loop
+    """
+    import pygame
+
+    sim = KlaskSimulator(render_mode="human_unclocked")
+    sim.reset(seed=1)
+    clock = pygame.time.Clock()
+    tracer = LatencyTracer()
+    for _ in range(10):
+        tracer.tick_begin()
+        sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+        tracer.tick_end()
+        tracer.render_begin()
+        sim.render()
+        tracer.render_end()
+        tracer.present(sim.present_time)
+        tracer.wait_begin()
+        clock.tick(20)
+        tracer.wait_end()
+    sim.close()
+
+    # Every frame waits out most of its 50 ms period, the ticks take a fraction of it
+    ticks = np.array(tracer.tick_ends) - np.array(tracer.tick_begins)
+    waits = np.array(tracer.wait_ends) - np.array(tracer.wait_begins)
+    assert ticks.max() < 0.01 and np.median(waits[1:]) > 0.03
+    for present, begin, end in zip(
+        tracer.presents, tracer.render_begins, tracer.render_ends
+    ):
+        assert begin <= present <= end
+    assert "wait" in format_summary(tracer.summary())
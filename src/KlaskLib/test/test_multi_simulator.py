@@ -0,0 +1,96 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import MAX_FORCE
+from ..simulator.multi_simulator import KlaskMultiSimulator
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+
+def test_multi_simulator_matches_simulators():
+    """
+    Determine if boards sharing one world follow separate simulators, game rules included
+    """
+    rng = np.random.default_rng(0)
+    start_positions = ["top_right", "bottom_right", "top_left", "bottom_left"]
+    multi = KlaskMultiSimulator(4)
+    sims = [KlaskSimulator(render_mode=None) for _ in start_positions]
+    for board, start_position in enumerate(start_positions):
+        multi.reset(boards=[board], ball_start_position=start_position)
+        sims[board].reset(ball_start_position=start_position)
+
+    # Board 0 pushes puck 1 into its own goal, board 1 drives puck 1 into the biscuits
+    ended = set()
+    for step in range(100):
+        actions1 = rng.uniform(-MAX_FORCE, MAX_FORCE, (4, 2)) / 4
+        actions2 = rng.uniform(-MAX_FORCE, MAX_FORCE, (4, 2)) / 4
+        actions1[0] = (-MAX_FORCE, 0.0)
+        actions1[1] = (MAX_FORCE, 0.2 * MAX_FORCE)
+        game_states, agent_states = multi.step(actions1, actions2)
+
+        for board, sim in enumerate(sims):
+            _, expected_game_states, expected_agent_states = sim.step(
+                tuple(actions1[board]), tuple(actions2[board])
+            )
+            expected = [expected_agent_states[key] for key in sim.agent_state_keys]
+            assert np.allclose(agent_states[board], expected, atol=0.5)
+            assert game_states[board] == sum(
+                1 << state.value for state in expected_game_states
+            )
+
+            if KlaskSimulator.GameStates.PLAYING not in expected_game_states:
+                ended.add(board)
+                multi.reset(boards=[board], ball_start_position=start_positions[board])
+                sim.reset(ball_start_position=start_positions[board])
+
+    assert 0 in ended and multi.attached[1].any()
+    multi.close()
+
+
+def test_multi_simulator_board_reset():
+    """
+    Determine if resetting a board leaves the other boards untouched
+    """
+    multi = KlaskMultiSimulator(3)
+    initial_game_states, initial_states = multi.reset(
+        seed=1, ball_start_position="top_left"
+    )
+    for _ in range(20):
+        game_states, states = multi.step(
+            np.full((3, 2), MAX_FORCE), np.full((3, 2), -MAX_FORCE)
+        )
+
+    reset_game_states, reset_states = multi.reset(boards=[1])
+    assert (reset_states[[0, 2]] == states[[0, 2]]).all()
+    assert reset_game_states[1] == initial_game_states[1]
+    assert (reset_states[1, :20] == initial_states[1, :20]).all()
+    multi.close()
+
+
+def test_multi_simulator_seeded_reset():
+    """
+    Determine if seeded boards start the same however they are split across simulators
+    """
+    children = np.random.SeedSequence(7).spawn(8)
+
+    def starts(multi, seed, count=5):
+        # Agent states of a seeded reset followed by unseeded ones
+        states = [multi.reset(seed=seed)[1]]
+        states += [multi.reset()[1] for _ in range(count - 1)]
+        return np.stack(states, axis=1)
+
+    whole = starts(KlaskMultiSimulator(8), 7)
+    split = np.concatenate(
+        [
+            starts(KlaskMultiSimulator(4), children[:4]),
+            starts(KlaskMultiSimulator(4), children[4:]),
+        ]
+    )
+    assert np.allclose(whole, split)
+    assert len(np.unique(whole[:, :, -4:], axis=0)) > 1
+
+    # A board starts as a simulator seeded with its child seed
+    sim = KlaskSimulator(render_mode=None)
+    _, _, agent_states = sim.reset(seed=children[5])
+    assert np.allclose(whole[5, 0], [agent_states[key] for key in sim.agent_state_keys])
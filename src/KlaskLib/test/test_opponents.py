@@ -0,0 +1,100 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import KlaskEnv
+from ..opponents.opponents import *
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+import pytest
+
+
+def test_opponents_batched_actions():
+    """
+    Determine if opponents act for a batch of boards like for each board on its own
+    """
+
+    sim = KlaskSimulator(render_mode=None)
+    states = []
+    for seed in range(8):
+        _, _, agent_states = sim.reset(seed=seed, outputs=["agent_state"])
+        states.append(list(agent_states.values()))
+    states = np.array(states)
+
+    for opponent_type in opponents.values():
+        opponent = opponent_type()
+        actions = opponent(states, player=2)
+
+        assert actions.shape == (8, 2)
+        assert actions.dtype == np.float32
+        assert np.all(np.abs(actions) <= 1.0)
+        for state, action in zip(states, actions):
+            assert np.allclose(opponent(state[None], player=2)[0], action)
+
+    # Opponents without a target can not be constructed
+    with pytest.raises(TypeError):
+        ScriptedOpponent()
+
+
+def test_opponents_mirrored_players():
+    """
+    Determine if player 2 acts as the left-right mirror image of player 1
+    """
+
+    sim = KlaskSimulator(render_mode=None)
+    _, _, agent_states = sim.reset(seed=3, outputs=["agent_state"])
+    states = np.array([list(agent_states.values())])
+
+    assert np.allclose(mirror_states(mirror_states(states)), states)
+
+    for opponent_type in opponents.values():
+        opponent = opponent_type()
+        action1 = opponent(mirror_states(states), player=1)
+        action2 = opponent(states, player=2)
+
+        assert np.allclose(action1[:, 0], -action2[:, 0])
+        assert np.allclose(action1[:, 1], action2[:, 1])
+
+
+def test_environment_opponent():
+    """
+    Determine if a scripted opponent moves player 2 in the environment
+    """
+
+    env = KlaskEnv(render_mode=None, observation_type="state", opponent=BallChaser())
+    observation, _ = env.reset(seed=5)
+    puck2 = PUCK2_POS
+
+    start = observation[puck2].copy()
+    for _ in range(20):
+        observation, _, terminated, truncated, _ = env.step(
+            np.zeros(2, dtype=np.float32)
+        )
+        assert not (terminated or truncated)
+
+    assert np.linalg.norm(observation[puck2] - start) > 1.0
+    env.close()
+
+
+def test_environment_opponent_seeded():
+    """
+    Determine if seeded resets repeat a noisy scripted opponent's moves
+    """
+
+    env = KlaskEnv(
+        render_mode=None,
+        observation_type="state",
+        opponent=BallChaser(difficulty=0.0, seed=1),
+    )
+
+    trajectories = []
+    for _ in range(2):
+        observation, _ = env.reset(seed=5)
+        trajectory = [observation]
+        for _ in range(20):
+            observation, _, _, _, _ = env.step(np.zeros(2, dtype=np.float32))
+            trajectory.append(observation)
+        trajectories.append(np.array(trajectory))
+
+    assert np.array_equal(trajectories[0], trajectories[1])
+    env.close()
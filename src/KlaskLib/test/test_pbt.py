@@ -0,0 +1,123 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..pbt import pbt
+from ..pbt.pbt import (
+    HYPERPARAMETERS,
+    _make_env,
+    member_name,
+    perturb_hyperparameters,
+    run_pbt,
+    sample_hyperparameters,
+    split_cores,
+)
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+
+def test_pbt_hyperparameters_stay_in_bounds():
+    """
+    Determine if sampled and repeatedly perturbed hyperparameters stay within bounds
+    """
+
+    rng = np.random.default_rng(0)
+    for algorithm, bounds in HYPERPARAMETERS.items():
+        hyperparameters = sample_hyperparameters(algorithm, rng)
+        for _ in range(100):
+            hyperparameters = perturb_hyperparameters(algorithm, hyperparameters, rng)
+            for name, (low, high) in bounds.items():
+                assert low <= hyperparameters[name] <= high
+
+    assert split_cores([0, 1, 2, 3, 4], 2) == [[0, 1, 2], [3, 4]]
+    assert split_cores([0, 1], 3) == [[0], [1], [0]]
+
+
+def test_pbt_environments_own_their_opponents():
+    """
+    Determine if every training environment builds its own seeded scripted opponent
+    """
+
+    config = {"observation_type": "state", "opponent": "ball_chaser", "max_steps": 10}
+    envs = [_make_env(config, seed)() for seed in [0, 0, 1]]
+    opponents = [env.unwrapped.opponent for env in envs]
+    assert opponents[0] is not opponents[1]
+
+    draws = [opponent.rng.random() for opponent in opponents]
+    assert draws[0] == draws[1] != draws[2]
+    for env in envs:
+        env.close()
+
+
+def test_pbt_copies_winners_over_losers(tmp_path):
+    """
+    Determine if a small population trains, logs every generation and exploits its best member
+    """
+
+    directory = os.path.join(tmp_path, "runs")
+    weights = os.path.join(tmp_path, "weights")
+    arguments = dict(
+        members=2,
+        timesteps=20,
+        max_steps=20,
+        games=2,
+        exploit_fraction=0.5,
+    )
+    run_pbt(directory, weights, generations=1, **arguments)
+    state = run_pbt(directory, weights, generations=2, **arguments)
+    assert state["generation"] == 2
+
+    with open(os.path.join(directory, "log.jsonl")) as f:
+        records = [json.loads(line) for line in f]
+    assert [record["generation"] for record in records] == [0, 1]
+
+    # The loser of the last generation continues from the winner's checkpoint
+    members = records[-1]["members"]
+    loser = next(member for member in members if member["copied_from"] is not None)
+    with open(os.path.join(weights, member_name(loser["member"])), "rb") as f:
+        copied = f.read()
+    with open(os.path.join(weights, member_name(loser["copied_from"])), "rb") as f:
+        assert copied == f.read()
+    assert loser["elo"] <= members[loser["copied_from"]]["elo"]
+
+
+def test_pbt_resumes_interrupted_generation(tmp_path, monkeypatch):
+    """
+    Determine if a generation interrupted after training leaves the weights untouched and trains again on resume
+    """
+
+    from stable_baselines3 import A2C
+
+    directory = os.path.join(tmp_path, "runs")
+    weights = os.path.join(tmp_path, "weights")
+    arguments = dict(members=2, timesteps=20, max_steps=20, games=2)
+    run_pbt(directory, weights, generations=1, **arguments)
+
+    paths = [os.path.join(weights, member_name(member)) for member in range(2)]
+    checkpoints = []
+    for path in paths:
+        with open(path, "rb") as f:
+            checkpoints.append(f.read())
+
+    # Interrupt the second generation between training and the tournament
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pbt, "run_tournament", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            run_pbt(directory, weights, generations=2, **arguments)
+
+    for path, checkpoint in zip(paths, checkpoints):
+        with open(path, "rb") as f:
+            assert f.read() == checkpoint
+
+    # The resumed generation trains from the first generation's weights, once
+    state = run_pbt(directory, weights, generations=2, **arguments)
+    assert state["generation"] == 2
+    for path in paths:
+        assert A2C.load(path, device="cpu").num_timesteps == 40
+    assert not os.path.exists(os.path.join(directory, "checkpoints", "generation_0001"))
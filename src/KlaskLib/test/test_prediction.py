@@ -0,0 +1,70 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..prediction.prediction import BallPredictor, NO_GOAL, RIGHT_GOAL
+from ..simulator.simulator import KlaskSimulator
+
+import numpy as np
+
+
+def simulate_ball(position, velocity, steps):
+    # Ball positions after every tick, alone on the board
+    sim = KlaskSimulator(render_mode=None)
+    sim.reset(seed=1)
+    for key in ["puck1", "puck2", "biscuit1", "biscuit2", "biscuit3"]:
+        for fixture in sim.bodies[key].fixtures:
+            filter_data = fixture.filterData
+            filter_data.maskBits = 0
+            fixture.filterData = filter_data
+    sim.bodies["ball"].position = tuple(np.asarray(position) / sim.pixels_per_meter)
+    sim.bodies["ball"].linearVelocity = tuple(
+        np.asarray(velocity) / sim.pixels_per_meter
+    )
+
+    positions = []
+    for _ in range(steps):
+        _, _, agent_state = sim.step((0, 0), (0, 0), outputs=["agent_state"])
+        positions.append((agent_state["ball_pos_x"], agent_state["ball_pos_y"]))
+    return np.array(positions)
+
+
+def test_prediction_matches_simulator():
+    """
+    Determine if predicted ball positions follow the simulator through wall bounces
+    """
+    predictor = BallPredictor()
+    positions = np.array([[240.0, 400.0], [400.0, 100.0], [600.0, 300.0]])
+    velocities = np.array([[-960.0, 890.0], [300.0, -800.0], [40.0, 0.0]])
+    times = np.arange(1, 121) / 120
+
+    prediction = predictor.predict(positions, velocities, times)
+    for i in range(len(positions)):
+        truth = simulate_ball(positions[i], velocities[i], len(times))
+        error = np.linalg.norm(prediction["positions"][i] - truth, axis=-1)
+        assert error.max() < 2.0
+
+    # The corner shot bounces twice, the slow ball stops before any wall
+    assert np.isfinite(prediction["wall_hits"][0]).sum() >= 2
+    assert not np.isfinite(prediction["wall_hits"][2]).any()
+    assert (prediction["velocities"][2, -1] == 0).all()
+
+
+def test_prediction_goal_entry():
+    """
+    Determine if the predicted goal entry matches the ball reaching the goal
+    """
+    predictor = BallPredictor()
+    centre = predictor.goals[1]
+    positions = np.array([[400.0, centre[1] - 100.0], [400.0, 100.0]])
+    velocities = np.array([[600.0, 150.0], [0.0, 50.0]])
+    prediction = predictor.predict(positions, velocities, [0.0])
+
+    assert prediction["goals"][0] == RIGHT_GOAL
+    assert prediction["goals"][1] == NO_GOAL and np.isnan(prediction["goal_times"][1])
+
+    # The simulated ball is at the goal edge when predicted to enter
+    step = int(np.ceil(prediction["goal_times"][0] * 120))
+    truth = simulate_ball(positions[0], velocities[0], step)
+    distances = np.linalg.norm(truth[-2:] - centre, axis=-1)
+    assert distances[0] > predictor.goal_radius - 1
+    assert distances[1] <= predictor.goal_radius + 1
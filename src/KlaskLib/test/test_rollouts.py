@@ -0,0 +1,47 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..rollouts.rollouts import load_rollouts, run_rollouts
+
+import json
+import os
+
+import numpy as np
+
+
+def test_rollouts_reproducible_and_resumable(tmp_path):
+    """
+    Determine if rollouts are byte-identical for a seed, and resume missing shards
+    """
+
+    def run(directory):
+        manifest_path = run_rollouts(
+            directory,
+            600,
+            shard_size=250,
+            games=4,
+            max_steps=50,
+            player2="shot_taker",
+            seed=7,
+            workers=1,
+        )
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    manifest = run(str(tmp_path / "a"))
+    assert manifest["complete"]
+    assert [shard["transitions"] for shard in manifest["shards"]] == [250, 250, 100]
+    assert run(str(tmp_path / "b")) == manifest
+
+    # Losing a shard regenerates exactly that shard
+    os.remove(tmp_path / "a" / manifest["shards"][1]["file"])
+    assert run(str(tmp_path / "a")) == manifest
+
+    data = load_rollouts(str(tmp_path / "a"))
+    assert data["states"].shape == (600, 24)
+    assert data["actions"].shape == (600, 4)
+    assert np.all(np.abs(data["actions"]) <= 1.0)
+
+    # Every episode ends exactly once, by the game ending or being cut
+    ends = data["terminals"] | data["timeouts"]
+    assert ends.sum() == len(np.unique(data["episodes"]))
@@ -0,0 +1,98 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import MAX_FORCE
+from ..server.server import KlaskMatchServer
+from ..server.client import KlaskMatchClient
+from ..server.protocol import *
+from ..simulator.simulator import KlaskSimulator
+
+import asyncio
+
+
+def test_protocol_state_delta_round_trip():
+    """
+    Determine if decoding state deltas reproduces the encoded agent states
+    """
+
+    sim = KlaskSimulator(render_mode=None)
+    encoder = StateDeltaEncoder()
+    decoder = StateDeltaDecoder()
+
+    _, game_states, agent_states = sim.reset(seed=10)
+    for tick in range(20):
+        message = encoder.encode(tick, game_states, agent_states)
+        header = message[: STATE_HEADER.size]
+        payload = message[STATE_HEADER.size :]
+
+        decoded_tick, decoded_game_states, decoded_agent_states = decoder.decode(
+            header, payload
+        )
+
+        assert decoded_tick == tick
+        assert decoded_game_states == game_states
+        for field in STATE_FIELDS:
+            assert abs(decoded_agent_states[field] - agent_states[field]) < 1e-4
+
+        _, game_states, agent_states = sim.step((0.001, 0.0), (0.0, 0.0))
+
+
+def test_protocol_state_delta_unchanged():
+    """
+    Determine if unchanged agent states are sent without any fields
+    """
+
+    sim = KlaskSimulator(render_mode=None)
+    encoder = StateDeltaEncoder()
+
+    _, game_states, agent_states = sim.reset(seed=10)
+
+    full = encoder.encode(0, game_states, agent_states)
+    delta = encoder.encode(1, game_states, agent_states)
+
+    assert len(full) == STATE_HEADER.size + 4 * len(STATE_FIELDS)
+    assert len(delta) == STATE_HEADER.size
+
+
+def test_server_streams_states():
+    """
+    Determine if a client joining a match receives ticking states and statistics
+    """
+
+    async def run():
+        server = KlaskMatchServer(tick_rate=240, seed=10)
+        port = await server.start_tcp("127.0.0.1", 0)
+
+        client = await KlaskMatchClient.connect_tcp("127.0.0.1", port)
+        client.join(3, 1)
+        client.send_action((0.001, 0.0))
+
+        ticks = []
+        while len(ticks) < 10:
+            msg_type, content = await client.receive()
+            if msg_type == MSG_STATE:
+                ticks.append(content[0])
+
+        # Oversized impulses are clamped, non-finite ones ignored. The statistics
+        # reply follows the handling of both.
+        client.send_action((1e9, -1e9))
+        client.send_action((float("nan"), 0.0))
+        client.request_stats()
+        msg_type, content = await client.receive()
+        while msg_type != MSG_STATS:
+            msg_type, content = await client.receive()
+        actions = server.matches[3].actions[0]
+
+        match_ids = list(server.matches.keys())
+
+        await client.close()
+        await server.close()
+
+        return match_ids, ticks, content, actions
+
+    match_ids, ticks, stats, actions = asyncio.run(run())
+
+    assert match_ids == [3]
+    assert ticks == sorted(ticks)
+    assert stats[0] > 0
+    assert actions == (MAX_FORCE, -MAX_FORCE)
@@ -38,6 +38,34 @@ def test_simulator_random_no_seed():
     assert len(set(prev_states)) > 1
 
 
+def test_simulator_independent_random_streams():
+    """
+    Determine if simulators draw from their own random streams, and seed 0 is applied
+    """
+
+    def start_positions(sim, seed):
+        # Ball start positions of a seeded sequence of resets
+        positions = []
+        for i in range(10):
+            _, _, agent_states = sim.reset(seed=seed if i == 0 else None)
+            positions.append((agent_states["ball_pos_x"], agent_states["ball_pos_y"]))
+        return positions
+
+    sim = KlaskSimulator(render_mode=None)
+    other = KlaskSimulator(render_mode=None)
+    expected = start_positions(sim, 0)
+
+    # Interleaved resets of another simulator do not change the stream
+    positions = []
+    for i in range(10):
+        _, _, agent_states = sim.reset(seed=0 if i == 0 else None)
+        other.reset(seed=i)
+        positions.append((agent_states["ball_pos_x"], agent_states["ball_pos_y"]))
+
+    assert positions == expected
+    assert start_positions(sim, 1) != expected
+
+
 def test_simulator_render_mode_metadata():
     """
     Determine if render_modes exists as class metadata
@@ -145,3 +173,248 @@ def test_simulator_ball_start_position_metadata():
     """
 
     assert hasattr(KlaskSimulator, "ball_start_positions")
+
+
+def test_simulator_render_half():
+    """
+    Determine if half board renders crop the frame, with player 2's half mirrored
+    """
+    import numpy as np
+    from ..opponents.opponents import mirror_states
+
+    sim = KlaskSimulator(render_mode="rgb_array")
+    sim.reset(seed=1, ball_start_position="top_right")
+    for _ in range(80):
+        sim.step((0.01, 0.002), (-0.01, 0.003), outputs=[])
+
+    half = sim.render_half(player=1)
+    assert half.shape == (609, 394, 3)
+    assert (half == sim.render()[:, :394]).all()
+
+    # Player 2's half looks like player 1's half of the mirrored board
+    _, _, agent_states = sim.reset(seed=1, ball_start_position="top_right")
+    for _ in range(80):
+        _, _, agent_states = sim.step((0.01, 0.002), (-0.01, 0.003))
+    start_state = np.zeros((), dtype=sim.start_state_dtype)
+    start_state["agent_state"] = mirror_states(list(agent_states.values()))
+    mirrored = KlaskSimulator(render_mode="rgb_array")
+    mirrored.reset(start_state=start_state)
+
+    difference = sim.render_half(player=2) != mirrored.render_half(player=1)
+    assert difference.any(-1).mean() < 0.005
+
+
+def test_simulator_render_interpolation():
+    """
+    Determine if interpolated rendering spans the previous and current physics states
+    """
+    from numpy import array_equal
+
+    sim = KlaskSimulator(render_mode="rgb_array")
+
+    reset_frame, _, _ = sim.reset(seed=10)
+
+    step_frame, _, _ = sim.step((0.005, 0.005), (-0.005, 0.005))
+
+    assert array_equal(sim.render(alpha=0.0), reset_frame)
+
+    assert array_equal(sim.render(alpha=1.0), step_frame)
+
+
+def test_simulator_biscuit_attaches_to_puck():
+    """
+    Determine if a biscuit touching a puck is attached to it without a collision response
+    """
+
+    sim = KlaskSimulator(render_mode=None)
+
+    sim.reset(seed=10)
+
+    sim.bodies["biscuit1"].position = (10.0, 10.0)
+    sim.bodies["puck1"].position = (9.0, 10.0)
+
+    _, _, agent_states = sim.step((0.0, 0.0), (0.0, 0.0))
+
+    assert "biscuit1" not in sim.bodies
+
+    assert len(sim.bodies["puck1"].fixtures) == 2
+
+    assert agent_states["biscuit1_pos_x"] > agent_states["puck1_pos_x"]
+
+
+def test_simulator_selected_outputs():
+    """
+    Determine if only the requested outputs are computed
+    """
+    from numpy import ndarray
+
+    sim = KlaskSimulator(render_mode="rgb_array")
+
+    frame, game_states, agent_states = sim.reset(outputs=["game_state"])
+
+    assert frame is None and agent_states is None
+
+    assert game_states == [KlaskSimulator.GameStates.PLAYING]
+
+    frame, game_states, agent_states = sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+
+    assert frame is None and game_states is None and agent_states is None
+
+    assert isinstance(sim.render(), ndarray)
+
+
+def test_simulator_reset_releases_objects():
+    """
+    Determine if repeated resets with attached biscuits keep a steady number of objects
+    """
+    import gc
+
+    sim = KlaskSimulator(render_mode=None)
+
+    def play():
+        sim.reset(seed=10, outputs=[])
+        sim.bodies["biscuit1"].position = (10.0, 10.0)
+        sim.bodies["puck1"].position = (9.0, 10.0)
+        sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+
+    for _ in range(10):
+        play()
+    gc.collect()
+    objects = len(gc.get_objects())
+
+    for _ in range(200):
+        play()
+    gc.collect()
+
+    assert len(gc.get_objects()) - objects < 50
+
+
+def test_simulator_reset_outputs_cached():
+    """
+    Determine if cached reset outputs match the initial layout and are protected from changes
+    """
+    from numpy import array_equal
+
+    sim = KlaskSimulator(render_mode="rgb_array")
+
+    for ball_start_position in KlaskSimulator.ball_start_positions[:-1]:
+        for _ in range(2):
+            frame, game_states, agent_states = sim.reset(
+                ball_start_position=ball_start_position
+            )
+
+            assert array_equal(frame, sim.render())
+            assert agent_states == sim.get_agent_state()
+            assert game_states == [KlaskSimulator.GameStates.PLAYING]
+            assert not frame.flags.writeable
+
+            # Changing returned outputs leaves the cache untouched
+            agent_states["ball_pos_x"] = -1.0
+            game_states.clear()
+
+
+def test_simulator_physics_updates_in_place():
+    """
+    Determine if physical parameters apply per reset and update the current world in place
+    """
+    from ..simulator.physics import KlaskPhysicsParams, sample_physics
+    from pytest import approx
+
+    sim = KlaskSimulator(render_mode=None)
+    other = KlaskSimulator(render_mode=None)
+    sim.reset(seed=1, outputs=[], physics=KlaskPhysicsParams(ball_mass=0.002))
+    other.reset(seed=1, outputs=[])
+    assert abs(sim.bodies["ball"].mass - 2 * other.bodies["ball"].mass) < 1e-6
+
+    # Attach a biscuit, then change every parameter without rebuilding the world
+    sim.bodies["biscuit1"].position = (10.0, 10.0)
+    sim.bodies["puck1"].position = (9.0, 10.0)
+    sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+    world = sim.world
+    sim.set_physics(KlaskPhysicsParams(puck_mass=0.016, restitution=0.8, gravity=1.0))
+    assert sim.world is world
+    assert abs(sim.bodies["puck1"].mass - 2 * other.bodies["puck1"].mass) < 1e-6
+    assert sim.bodies["ball"].fixtures[0].restitution == approx(0.8)
+    for joint in sim.world.joints:
+        assert joint.maxForce == approx(joint.bodyB.mass)
+
+    # Batches of parameters are sampled at once, within their ranges
+    physics = sample_physics(64, rng=0, ranges={"ball_mass": (0.5, 2.0)})
+    assert len(physics) == 64
+    assert all(0.0005 <= params.ball_mass <= 0.002 for params in physics)
+    assert all(params.puck_mass == KlaskPhysicsParams().puck_mass for params in physics)
+    assert physics == sample_physics(64, rng=0, ranges={"ball_mass": (0.5, 2.0)})
+
+
+def test_simulator_contact_events():
+    """
+    Determine if contact events are recorded per step without changing the simulation
+    """
+    import numpy as np
+
+    sim = KlaskSimulator(render_mode=None, record_contacts=True)
+    other = KlaskSimulator(render_mode=None)
+    sim.reset(seed=1, ball_start_position="bottom_left", outputs=[])
+    other.reset(seed=1, ball_start_position="bottom_left", outputs=[])
+    assert len(sim.get_contact_events()) == 0
+
+    # Throw the ball into the left wall, and record every step's events
+    sim.bodies["ball"].linearVelocity = (-30.0, 0.0)
+    other.bodies["ball"].linearVelocity = (-30.0, 0.0)
+    events = []
+    for _ in range(30):
+        _, _, agent_states = sim.step((0.0, 0.0), (0.0, 0.0), outputs=["agent_state"])
+        _, _, other_states = other.step((0.0, 0.0), (0.0, 0.0), outputs=["agent_state"])
+        assert agent_states == other_states
+        events.append(sim.get_contact_events().copy())
+    events = np.concatenate(events)
+
+    # The ball begins and ends touching the wall once, with the impulse of its bounce
+    wall = KlaskSimulator.contact_body_keys.index("wall_left")
+    ball = KlaskSimulator.contact_body_keys.index("ball")
+    assert events.dtype == KlaskSimulator.contact_event_dtype
+    assert list(events["type"]) == [
+        KlaskSimulator.ContactEvents.BEGIN,
+        KlaskSimulator.ContactEvents.END,
+    ]
+    assert (events["body_a"] == wall).all() and (events["body_b"] == ball).all()
+    assert events["impulse"][0] > 30.0 * sim.bodies["ball"].mass
+    assert events["position"][0][0] < 1.0
+
+    # Events that do not fit the buffer are counted
+    sim = KlaskSimulator(render_mode=None, record_contacts=True, contact_capacity=0)
+    sim.reset(seed=1, ball_start_position="bottom_left", outputs=[])
+    sim.bodies["ball"].linearVelocity = (-30.0, 0.0)
+    for _ in range(30):
+        sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+    assert sim.contact_events_dropped == 2
+
+
+def test_simulator_contact_impulses():
+    """
+    Determine if contact impulses match the momentum change of known wall bounces
+    """
+    sim = KlaskSimulator(render_mode=None, record_contacts=True)
+    wall = KlaskSimulator.contact_body_keys.index("wall_left")
+
+    # A fast ball begins touching in a time of impact sub-step, a slow ball placed
+    # next to the wall in the regular solver step
+    for speed, gap in [(30.0, None), (5.0, 0.03), (2.0, 0.01)]:
+        sim.reset(seed=1, ball_start_position="bottom_left", outputs=[])
+        ball = sim.bodies["ball"]
+        if gap is not None:
+            ball.position = (ball.fixtures[0].shape.radius + gap, ball.position.y)
+        ball.linearVelocity = (-speed, 0.0)
+
+        for _ in range(30):
+            speed_in = -ball.linearVelocity.x
+            sim.step((0.0, 0.0), (0.0, 0.0), outputs=[])
+            events = sim.get_contact_events()
+            if len(events):
+                break
+        assert events["type"][0] == KlaskSimulator.ContactEvents.BEGIN
+        assert events["body_a"][0] == wall
+
+        # The normal impulse reverses the ball with the restitution of the bounce
+        expected = ball.mass * (1.0 + sim.physics.restitution) * speed_in
+        assert abs(events["impulse"][0] - expected) < 0.05 * expected
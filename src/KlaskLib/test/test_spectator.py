@@ -0,0 +1,44 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import KlaskEnv
+from ..spectator.spectator import KlaskSpectator, SpectatorPublisher
+
+import time
+
+import numpy as np
+
+
+def test_spectator_tiles_published_boards():
+    """
+    Determine if headless boards publish throttled snapshots that the spectator tiles
+    """
+
+    spectator = KlaskSpectator(host="127.0.0.1", port=0, tile_width=100)
+    envs = [
+        SpectatorPublisher(
+            KlaskEnv(render_mode=None, observation_type="state"),
+            board,
+            port=spectator.port,
+            rate=0.01,
+        )
+        for board in range(5)
+    ]
+
+    # Only the reset snapshots are sent at this rate
+    for env in envs:
+        env.reset(seed=1)
+        for _ in range(20):
+            env.step(np.zeros(2, dtype=np.float32))
+    time.sleep(0.1)
+    assert spectator.poll() == 5
+    assert sorted(spectator.boards) == list(range(5))
+    assert spectator.boards[3][:2] == (1, 0)
+
+    # Five boards are tiled on a 3 by 2 grid
+    surface = spectator.draw()
+    assert surface.get_size() == (3 * 100, 2 * spectator.tile_height)
+
+    for env in envs:
+        env.close()
+    spectator.close()
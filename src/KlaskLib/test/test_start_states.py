@@ -0,0 +1,60 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import KlaskEnv
+from ..simulator.simulator import KlaskSimulator
+from ..start_states.start_states import (
+    StartStateBank,
+    infer_attached,
+    make_start_states,
+)
+
+import numpy as np
+
+
+def test_simulator_start_state():
+    """
+    Determine if resetting into a mid-game state continues the game it was taken from
+    """
+    sim = KlaskSimulator(render_mode=None)
+    sim.reset(seed=3, ball_start_position="top_left")
+    for _ in range(60):
+        _, _, agent_states = sim.step((0.015, 0.003), (-0.004, 0.0))
+    states = [agent_states[key] for key in sim.agent_state_keys]
+    start_state = make_start_states(states)[0]
+    assert list(start_state["attached"]) == [1, 0, 0]
+
+    other = KlaskSimulator(render_mode=None)
+    _, game_states, other_states = other.reset(start_state=start_state)
+    assert game_states == [KlaskSimulator.GameStates.PLAYING]
+    assert [other_states[key] for key in sim.agent_state_keys] == states
+
+    for _ in range(30):
+        _, _, agent_states = sim.step((0.01, -0.01), (-0.004, 0.0))
+        _, _, other_states = other.step((0.01, -0.01), (-0.004, 0.0))
+    assert agent_states == other_states
+
+
+def test_start_state_bank():
+    """
+    Determine if generated start states are mid-game states that environments reset into
+    """
+    bank = StartStateBank.generate(40, min_steps=30, max_steps=90, seed=1)
+    start_states = bank.start_states
+    assert len(bank) == 40
+    assert (
+        infer_attached(start_states["agent_state"]) == start_states["attached"]
+    ).all()
+
+    batch = bank.sample(16)
+    assert batch.shape == (16,) and batch.dtype == KlaskSimulator.start_state_dtype
+
+    # Explicit start states, and start states drawn from the bank
+    env = KlaskEnv(render_mode=None, observation_type="state", start_states=bank)
+    observation, _ = env.reset(options={"start_state": batch[0]})
+    assert np.allclose(observation, batch[0]["agent_state"])
+
+    observations = [env.reset(seed=seed)[0] for seed in [0, 1, 0]]
+    assert (observations[0] == observations[2]).all()
+    for observation in observations:
+        assert np.isclose(observation, start_states["agent_state"]).all(1).any()
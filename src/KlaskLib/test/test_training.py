@@ -0,0 +1,93 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from ..environment.environment import KlaskEnv
+from ..training.async_vec_env import KlaskAsyncVecEnv
+from ..training.double_buffered import DoubleBufferedA2C, KlaskDoubleBufferedVecEnv
+
+from gymnasium.wrappers import TimeLimit
+
+import time
+
+import numpy as np
+
+
+def make_env():
+    env = KlaskEnv(render_mode=None, observation_type="state")
+    return TimeLimit(env, max_episode_steps=100)
+
+
+def test_double_buffered_rollouts_match_environments():
+    """
+    Determine if double buffered rollout collection stores the transitions the
+    environments actually made
+    """
+
+    vec_env = KlaskDoubleBufferedVecEnv([make_env for _ in range(3)])
+    model = DoubleBufferedA2C("MlpPolicy", vec_env, n_steps=8, seed=5)
+    model.learn(total_timesteps=24)
+    statistics = vec_env.statistics()
+    vec_env.close()
+
+    assert model.num_timesteps == 24
+    assert statistics["samples"] == 24
+    assert 0.0 < statistics["env_busy_fraction"] <= 1.0
+
+    # Replay each environment's actions from the same seed, training leaves the
+    # buffer flattened environment by environment
+    observations = model.rollout_buffer.observations.reshape(3, 8, -1)
+    actions = model.rollout_buffer.actions.reshape(3, 8, -1)
+    for i in range(3):
+        env = make_env()
+        observation, _ = env.reset(seed=5 + i)
+        for t in range(8):
+            assert np.allclose(observations[i, t], observation)
+            action = np.clip(actions[i, t], -1.0, 1.0).astype(np.float32)
+            observation, _, _, _, _ = env.step(action)
+        env.close()
+
+
+def make_slow_env():
+    env = make_env()
+    step = env.step
+
+    def slow_step(action):
+        time.sleep(0.02)
+        return step(action)
+
+    env.step = slow_step
+    return env
+
+
+def test_async_vec_env_partial_batches():
+    """
+    Determine if partial batches route actions back to the environments that made
+    them, without waiting for a straggler
+    """
+
+    vec_env = KlaskAsyncVecEnv([make_slow_env] + [make_env for _ in range(3)], 2)
+    rng = np.random.default_rng(0)
+    history = {env_id: [] for env_id in range(4)}
+
+    observations, _, dones, _, env_ids = vec_env.reset(seed=3)
+    assert len(env_ids) == 2 and len(set(env_ids)) == 2
+    for _ in range(40):
+        actions = rng.uniform(-1, 1, (len(env_ids), 2)).astype(np.float32)
+        for env_id, observation, action in zip(env_ids, observations, actions):
+            history[env_id].append((observation, action))
+        observations, _, dones, _, env_ids = vec_env.step(actions, env_ids)
+    statistics = vec_env.statistics()
+    vec_env.close()
+    assert statistics["samples"] == 80
+
+    # The straggler falls behind, every environment follows its own seeded replay
+    assert len(history[0]) < min(len(history[i]) for i in range(1, 4))
+    for env_id, transitions in history.items():
+        env = make_env()
+        observation, _ = env.reset(seed=3 + env_id)
+        for expected, action in transitions:
+            assert np.allclose(expected, observation)
+            observation, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                observation, _ = env.reset()
+        env.close()
@@ -0,0 +1,184 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+import multiprocessing as mp
+import time
+from multiprocessing.connection import wait
+
+import numpy as np
+
+
+def _worker(remote, parent_remote, env_fn_wrapper):
+    # Serve one environment over a pipe until closed. Results are (observation,
+    # reward, done, info), and episodes that end are reset with the final observation
+    # in info["terminal_observation"].
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    while True:
+        try:
+            command, data = remote.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if command == "step":
+            observation, reward, terminated, truncated, info = env.step(data)
+            done = terminated or truncated
+            info["TimeLimit.truncated"] = truncated and not terminated
+            if done:
+                info["terminal_observation"] = observation
+                observation, _ = env.reset()
+            remote.send((observation, reward, done, info))
+        elif command == "reset":
+            observation, info = env.reset(seed=data)
+            remote.send((observation, 0.0, False, info))
+        elif command == "get_spaces":
+            remote.send((env.observation_space, env.action_space))
+        elif command == "close":
+            env.close()
+            remote.close()
+            break
+        else:
+            raise NotImplementedError(f"Unknown command {command}")
+
+
+class KlaskAsyncVecEnv:
+    """
+    Subprocess environments stepped in partial batches, returning the first
+    batch_size environments to finish instead of waiting for all of them.
+
+    recv() returns the results of a batch tagged with env ids, and send() routes
+    actions back to exactly those environments, while the others keep stepping.
+    With batch_size equal to the number of environments it steps synchronously like
+    SubprocVecEnv. Environments reset themselves when their episodes end, with the
+    final observation in info["terminal_observation"].
+    """
+
+    def __init__(self, env_fns, batch_size, start_method=None):
+        assert 0 < batch_size <= len(env_fns), "Invalid batch size"
+        self.num_envs = len(env_fns)
+        self.batch_size = batch_size
+
+        if start_method is None:
+            start_method = (
+                "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            )
+        ctx = mp.get_context(start_method)
+
+        # One worker process per environment
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in env_fns])
+        self.processes = []
+        for work_remote, remote, env_fn in zip(work_remotes, self.remotes, env_fns):
+            process = ctx.Process(
+                target=_worker,
+                args=(work_remote, remote, CloudpickleWrapper(env_fn)),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        # Wait for every worker to start, so the first batches are not only the
+        # workers that started quickest
+        for remote in self.remotes:
+            remote.send(("get_spaces", None))
+        spaces = [remote.recv() for remote in self.remotes]
+        self.observation_space, self.action_space = spaces[0]
+
+        # Environments with a command in flight, and finished results not yet returned
+        self.pending = set()
+        self.ready = []
+        self.closed = False
+        self.reset_statistics()
+
+    def reset(self, seed=None):
+        # The first batch after a reset is not counted towards the statistics
+        self.async_reset(seed)
+        return self.__collate(self.__wait_batch())
+
+    def async_reset(self, seed=None):
+        # Reset every environment, environment i is seeded with seed + i
+        self.__drain()
+        self.ready = []
+        for env_id, remote in enumerate(self.remotes):
+            remote.send(("reset", None if seed is None else seed + env_id))
+            self.pending.add(env_id)
+
+    def send(self, actions, env_ids):
+        # Step the environments of the last batch, actions[i] goes to env_ids[i]
+        for action, env_id in zip(actions, env_ids):
+            assert env_id not in self.pending, "Environment is still stepping"
+            self.remotes[env_id].send(("step", action))
+            self.pending.add(env_id)
+
+    def recv(self):
+        # Wait for the next batch, its latency and samples count towards the
+        # statistics
+        start = time.perf_counter()
+        batch = self.__wait_batch()
+        self.latencies.append(time.perf_counter() - start)
+        self.samples += len(batch)
+        return self.__collate(batch)
+
+    def step(self, actions, env_ids):
+        self.send(actions, env_ids)
+        return self.recv()
+
+    def reset_statistics(self):
+        self.start_time = time.perf_counter()
+        self.samples = 0
+        self.latencies = []
+
+    def statistics(self):
+        # Throughput and batch latency since the last reset_statistics()
+        duration = time.perf_counter() - self.start_time
+        latencies = np.array(self.latencies or [0.0])
+        return {
+            "samples": self.samples,
+            "duration": duration,
+            "samples_per_second": self.samples / duration,
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p99": float(np.percentile(latencies, 99)),
+            "latency_max": float(latencies.max()),
+        }
+
+    def close(self):
+        if self.closed:
+            return
+        self.__drain()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __wait_batch(self):
+        # Wait until batch_size environments are ready, and take their results
+        while len(self.ready) < self.batch_size:
+            remotes = [self.remotes[env_id] for env_id in self.pending]
+            for remote in wait(remotes):
+                env_id = self.remotes.index(remote)
+                self.pending.remove(env_id)
+                self.ready.append((env_id, remote.recv()))
+        batch, self.ready = self.ready[: self.batch_size], self.ready[self.batch_size :]
+        return batch
+
+    @staticmethod
+    def __collate(batch):
+        # Stack the results of a batch, tagged with their env ids
+        env_ids, results = zip(*batch)
+        observations, rewards, dones, infos = zip(*results)
+        return (
+            np.stack(observations),
+            np.array(rewards, dtype=np.float32),
+            np.array(dones, dtype=bool),
+            list(infos),
+            np.array(env_ids, dtype=np.int64),
+        )
+
+    def __drain(self):
+        # Receive the results still in flight, so every worker is idle
+        for env_id in self.pending:
+            self.remotes[env_id].recv()
+        self.pending.clear()
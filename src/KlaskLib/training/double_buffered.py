@@ -0,0 +1,284 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from stable_baselines3.a2c import A2C
+from stable_baselines3.common.utils import obs_as_tensor
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+import time
+
+import gymnasium as gym
+import numpy as np
+import torch as th
+from gymnasium import spaces
+
+
+class StepTimer(gym.Wrapper):
+    """Reports the time spent inside the wrapped environment's step in info."""
+
+    def step(self, action):
+        start = time.perf_counter()
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        info["step_time"] = time.perf_counter() - start
+        return observation, reward, terminated, truncated, info
+
+
+class KlaskDoubleBufferedVecEnv(VecEnv):
+    """
+    Vectorized environment split into two groups of subprocess environments, which
+    can be stepped independently.
+
+    step() steps both groups together like SubprocVecEnv. step_group_async() and
+    step_group_wait() step one group at a time, so a learner can compute the actions
+    of one group while the other group's physics and rendering run. statistics()
+    reports throughput and how busy the learner and the environments were.
+    """
+
+    def __init__(self, env_fns, start_method=None):
+        assert len(env_fns) >= 2, "Need at least two environments"
+
+        # First half of the environments in group 0, the rest in group 1
+        self.split = len(env_fns) // 2
+        self.groups = [
+            SubprocVecEnv([self.__timed(env_fn) for env_fn in group_fns], start_method)
+            for group_fns in (env_fns[: self.split], env_fns[self.split :])
+        ]
+        super().__init__(
+            len(env_fns),
+            self.groups[0].observation_space,
+            self.groups[0].action_space,
+        )
+        self.reset_statistics()
+
+    def reset(self):
+        for group, group_slice in zip(self.groups, self.__slices()):
+            group._seeds = self._seeds[group_slice]
+            group._options = self._options[group_slice]
+        observations = np.concatenate([group.reset() for group in self.groups])
+
+        self._reset_seeds()
+        self._reset_options()
+        return observations
+
+    def step_async(self, actions):
+        for group in range(2):
+            self.step_group_async(group, actions[self.__slices()[group]])
+
+    def step_wait(self):
+        results = [self.step_group_wait(group) for group in range(2)]
+        observations, rewards, dones, infos = zip(*results)
+        return (
+            np.concatenate(observations),
+            np.concatenate(rewards),
+            np.concatenate(dones),
+            infos[0] + infos[1],
+        )
+
+    def step_group_async(self, group, actions):
+        # Start stepping one group, actions only cover the environments of the group
+        self.groups[group].step_async(actions)
+
+    def step_group_wait(self, group):
+        # Wait for one group, the learner is idle while blocked here
+        start = time.perf_counter()
+        observations, rewards, dones, infos = self.groups[group].step_wait()
+        self.wait_time += time.perf_counter() - start
+
+        self.samples += len(infos)
+        self.env_time += sum(info.pop("step_time", 0.0) for info in infos)
+        return observations, rewards, dones, list(infos)
+
+    def reset_statistics(self):
+        self.start_time = time.perf_counter()
+        self.samples = 0
+        self.wait_time = 0.0
+        self.env_time = 0.0
+
+    def statistics(self):
+        # Throughput and utilisation since the last reset_statistics()
+        duration = time.perf_counter() - self.start_time
+        return {
+            "samples": self.samples,
+            "duration": duration,
+            "samples_per_second": self.samples / duration,
+            "learner_busy_fraction": 1.0 - self.wait_time / duration,
+            "env_busy_fraction": self.env_time / (self.num_envs * duration),
+        }
+
+    def close(self):
+        for group in self.groups:
+            group.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return self.__gather("get_attr", indices, attr_name)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self.__gather("set_attr", indices, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self.__gather(
+            "env_method", indices, method_name, *method_args, **method_kwargs
+        )
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self.__gather("env_is_wrapped", indices, wrapper_class)
+
+    def __slices(self):
+        return [slice(0, self.split), slice(self.split, self.num_envs)]
+
+    def __gather(self, method, indices, *args, **kwargs):
+        # Call a VecEnv method on the groups holding the indexed environments
+        results = []
+        for group, group_slice in zip(self.groups, self.__slices()):
+            group_indices = [
+                i - group_slice.start
+                for i in self._get_indices(indices)
+                if group_slice.start <= i < group_slice.stop
+            ]
+            if group_indices:
+                result = getattr(group, method)(*args, indices=group_indices, **kwargs)
+                results.extend(result or [])
+        return results
+
+    @staticmethod
+    def __timed(env_fn):
+        def _init():
+            return StepTimer(env_fn())
+
+        return _init
+
+
+class DoubleBufferedA2C(A2C):
+    """
+    A2C collecting rollouts from a KlaskDoubleBufferedVecEnv with the policy and the
+    environments working at the same time.
+
+    While one group of environments steps, the policy computes the actions of the
+    other group. The rollout buffer receives the same transitions as synchronous
+    collection. Other vec envs, and gSDE, fall back to synchronous collection.
+    """
+
+    def collect_rollouts(self, env, callback, rollout_buffer, n_rollout_steps):
+        if not isinstance(env, KlaskDoubleBufferedVecEnv) or self.use_sde:
+            return super().collect_rollouts(
+                env, callback, rollout_buffer, n_rollout_steps
+            )
+
+        assert self._last_obs is not None, "No previous observation was provided"
+        self.policy.set_training_mode(False)
+        rollout_buffer.reset()
+        callback.on_rollout_start()
+
+        # Per group observations, episode starts, pending policy outputs and results
+        slices = [slice(0, env.split), slice(env.split, env.num_envs)]
+        observations = [self._last_obs[group_slice] for group_slice in slices]
+        episode_starts = [
+            self._last_episode_starts[group_slice] for group_slice in slices
+        ]
+        pending = [None, None]
+        results = [None, None]
+
+        def act(group):
+            # Compute the actions of one group and start stepping it
+            with th.no_grad():
+                obs_tensor = obs_as_tensor(observations[group], self.device)
+                actions, values, log_probs = self.policy(obs_tensor)
+            actions = actions.cpu().numpy()
+
+            clipped_actions = actions
+            if isinstance(self.action_space, spaces.Box):
+                if self.policy.squash_output:
+                    clipped_actions = self.policy.unscale_action(clipped_actions)
+                else:
+                    clipped_actions = np.clip(
+                        actions, self.action_space.low, self.action_space.high
+                    )
+
+            env.step_group_async(group, clipped_actions)
+            pending[group] = (
+                observations[group],
+                actions,
+                episode_starts[group],
+                values,
+                log_probs,
+            )
+
+        def collect(group):
+            # Wait for one group, bootstrap timeouts and keep its transitions
+            new_obs, rewards, dones, infos = env.step_group_wait(group)
+            for idx, done in enumerate(dones):
+                if (
+                    done
+                    and infos[idx].get("terminal_observation") is not None
+                    and infos[idx].get("TimeLimit.truncated", False)
+                ):
+                    terminal_obs = self.policy.obs_to_tensor(
+                        infos[idx]["terminal_observation"]
+                    )[0]
+                    with th.no_grad():
+                        terminal_value = self.policy.predict_values(terminal_obs)[0]
+                    rewards[idx] += self.gamma * terminal_value
+
+            results[group] = (pending[group], rewards, dones, infos)
+            observations[group] = new_obs
+            episode_starts[group] = dones
+
+        # Group 1's actions are computed while group 0 steps, and group 0's next
+        # actions while group 1 steps
+        act(0)
+        for n_steps in range(n_rollout_steps):
+            act(1)
+            collect(0)
+            if n_steps < n_rollout_steps - 1:
+                act(0)
+            collect(1)
+
+            # Both halves of this step are complete
+            (
+                last_obs,
+                actions,
+                last_episode_starts,
+                values,
+                log_probs,
+                rewards,
+                dones,
+                infos,
+            ) = self.__merge(results)
+
+            self.num_timesteps += env.num_envs
+            callback.update_locals(locals())
+            if not callback.on_step():
+                return False
+            self._update_info_buffer(infos, dones)
+
+            if isinstance(self.action_space, spaces.Discrete):
+                actions = actions.reshape(-1, 1)
+
+            rollout_buffer.add(
+                last_obs, actions, rewards, last_episode_starts, values, log_probs
+            )
+
+        self._last_obs = np.concatenate(observations)
+        self._last_episode_starts = np.concatenate(episode_starts)
+        with th.no_grad():
+            values = self.policy.predict_values(
+                obs_as_tensor(self._last_obs, self.device)
+            )
+        rollout_buffer.compute_returns_and_advantage(
+            last_values=values, dones=self._last_episode_starts
+        )
+
+        callback.update_locals(locals())
+        callback.on_rollout_end()
+        return True
+
+    @staticmethod
+    def __merge(results):
+        # Join the transitions of both groups, in environment order
+        parts = [(*pending, rewards, dones) for pending, rewards, dones, _ in results]
+        merged = [
+            th.cat(part) if isinstance(part[0], th.Tensor) else np.concatenate(part)
+            for part in zip(*parts)
+        ]
+        return (*merged, results[0][3] + results[1][3])
@@ -0,0 +1,667 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+import argparse
+import threading
+import time
+
+
+def benchmark_inference(args):
+    # Drive many concurrent games with one batched inference service
+    from KlaskLib.environment.environment import KlaskEnv
+    from KlaskLib.inference.inference import KlaskInferenceService
+
+    service = KlaskInferenceService.from_checkpoint(
+        args.checkpoint,
+        algorithm=args.algorithm,
+        backend=args.backend,
+        num_threads=args.threads,
+        max_batch_size=args.games,
+        max_wait=args.max_wait,
+    )
+
+    def play(env, observation):
+        for _ in range(args.steps):
+            action = service.predict(observation)
+            observation, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                observation, _ = env.reset()
+        env.close()
+
+    envs = [KlaskEnv(render_mode="rgb_array") for _ in range(args.games)]
+    observations = [env.reset(seed=seed)[0] for seed, env in enumerate(envs)]
+
+    with service:
+        games = [
+            threading.Thread(target=play, args=(env, observation))
+            for env, observation in zip(envs, observations)
+        ]
+        start = time.perf_counter()
+        for game in games:
+            game.start()
+        for game in games:
+            game.join()
+        duration = time.perf_counter() - start
+
+    print(f"{args.games * args.steps / duration:.1f} actions/s over {args.games} games")
+    print(service.report())
+
+
+def benchmark_contacts(args):
+    # Step time under heavy contact, with the ball pressed into a wall and both
+    # pucks pressed into the dividers
+    from KlaskLib.simulator.simulator import KlaskSimulator
+
+    import numpy as np
+
+    sim = KlaskSimulator(render_mode=None, record_contacts=args.record_contacts)
+    sim.reset(seed=args.seed, ball_start_position="top_right")
+
+    step_times = np.zeros(args.steps)
+    events = 0
+    for i in range(args.steps):
+        sim.bodies["ball"].ApplyLinearImpulse(
+            (0.002, 0.0), sim.bodies["ball"].position, wake=True
+        )
+        start = time.perf_counter()
+        sim.step((0.005, 0.0), (-0.005, 0.0), outputs=[])
+        step_times[i] = time.perf_counter() - start
+        if args.record_contacts:
+            events += len(sim.get_contact_events())
+
+    if args.record_contacts:
+        print(f"{events} contact events recorded")
+    print(
+        f"{args.steps} steps, {sim.world.contactCount} contacts at the end: "
+        f"mean {step_times.mean() * 1e6:.1f} us, "
+        f"p50 {np.percentile(step_times, 50) * 1e6:.1f} us, "
+        f"p99 {np.percentile(step_times, 99) * 1e6:.1f} us"
+    )
+
+
+def benchmark_opponents(args):
+    # Time scripted opponents acting for batches of boards at once
+    from KlaskLib.opponents.opponents import opponents
+    from KlaskLib.simulator.simulator import KlaskSimulator
+
+    import numpy as np
+
+    # Sample realistic agent states from one game
+    sim = KlaskSimulator(render_mode=None)
+    _, _, agent_states = sim.reset(seed=args.seed, outputs=["agent_state"])
+    rng = np.random.default_rng(args.seed)
+    samples = []
+    for _ in range(1000):
+        action1, action2 = rng.uniform(-0.01, 0.01, size=(2, 2))
+        _, game_states, agent_states = sim.step(
+            tuple(action1), tuple(action2), outputs=["game_state", "agent_state"]
+        )
+        samples.append(list(agent_states.values()))
+        if KlaskSimulator.GameStates.PLAYING not in game_states:
+            sim.reset(seed=args.seed, outputs=[])
+    samples = np.array(samples)
+
+    for name, opponent_type in opponents.items():
+        opponent = opponent_type(seed=args.seed)
+        for batch_size in args.batch_sizes:
+            states = samples[rng.integers(len(samples), size=batch_size)]
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                opponent(states, player=2)
+            duration = (time.perf_counter() - start) / args.repeats
+            print(
+                f"{name:16s} batch {batch_size:5d}: {duration * 1e6:9.1f} us, "
+                f"{duration * 1e6 / batch_size:7.2f} us/board"
+            )
+
+
+def benchmark_soak(args):
+    # Run many reset/step cycles per render mode while sampling the process footprint,
+    # and fail if it keeps growing after warm-up
+    from KlaskLib.simulator.simulator import KlaskSimulator
+
+    import gc
+    import os
+    import resource
+    import sys
+
+    import numpy as np
+
+    def rss_mb():
+        # Current resident set size, falling back to the peak where /proc is missing
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+    def box2d_counts(sim):
+        bodies = sim.world.bodies
+        return len(bodies), sum(len(body.fixtures) for body in bodies)
+
+    failed = False
+    for render_mode in args.render_modes:
+        render_mode = None if render_mode == "none" else render_mode
+        sim = KlaskSimulator(render_mode=render_mode)
+        outputs = ["game_state"] if render_mode is None else ["frame", "game_state"]
+        rng = np.random.default_rng(args.seed)
+
+        samples = []
+        start = time.perf_counter()
+        for cycle in range(args.cycles):
+            sim.reset(seed=cycle + 1, outputs=outputs)
+            for _ in range(args.steps):
+                action = rng.uniform(-0.015, 0.015, size=4)
+                _, game_states, _ = sim.step(
+                    (float(action[0]), float(action[1])),
+                    (float(action[2]), float(action[3])),
+                    outputs=outputs,
+                )
+                if KlaskSimulator.GameStates.PLAYING not in game_states:
+                    break
+
+            if cycle % args.sample_every == 0 or cycle == args.cycles - 1:
+                gc.collect()
+                bodies, fixtures = box2d_counts(sim)
+                samples.append(
+                    (cycle, rss_mb(), len(gc.get_objects()), bodies, fixtures)
+                )
+                print(
+                    f"{str(render_mode):15s} cycle {cycle:9d}: rss {samples[-1][1]:8.1f} MB, "
+                    f"{samples[-1][2]:8d} objects, {bodies} bodies, {fixtures} fixtures, "
+                    f"{cycle / (time.perf_counter() - start):7.1f} cycles/s",
+                    flush=True,
+                )
+        sim.close()
+
+        # Growth from the end of warm-up, the first tenth of the samples
+        baseline = samples[len(samples) // 10]
+        rss_growth = samples[-1][1] - baseline[1]
+        object_growth = samples[-1][2] - baseline[2]
+        print(
+            f"{str(render_mode):15s} growth after warm-up: rss {rss_growth:+.1f} MB, "
+            f"{object_growth:+d} objects"
+        )
+        if rss_growth > args.max_rss_growth or object_growth > args.max_object_growth:
+            print(f"{str(render_mode):15s} FAILED: footprint grows beyond threshold")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+def benchmark_distributed(args):
+    # Step a distributed vec env served by localhost rollout worker processes
+    from KlaskLib.distributed.vec_env import KlaskDistributedVecEnv
+    from KlaskLib.distributed.worker import KlaskRolloutWorker
+
+    import multiprocessing
+
+    import numpy as np
+
+    def run_worker(port):
+        worker = KlaskRolloutWorker(
+            args.envs,
+            observation_type=args.observation_type,
+            compress=not args.no_compress,
+        )
+        worker.run("127.0.0.1", port)
+        worker.close()
+
+    vec_env = KlaskDistributedVecEnv(
+        args.workers,
+        args.envs,
+        host="127.0.0.1",
+        observation_type=args.observation_type,
+    )
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(vec_env.port,))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    vec_env.reset()
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        vec_env.step(rng.uniform(-1.0, 1.0, size=(vec_env.num_envs, 2)))
+    duration = time.perf_counter() - start
+
+    vec_env.close()
+    for worker in workers:
+        worker.join()
+
+    print(
+        f"{args.workers} workers x {args.envs} envs ({args.observation_type}): "
+        f"{args.steps * vec_env.num_envs / duration:.1f} samples/s, "
+        f"{duration / args.steps * 1e3:.2f} ms per vec step"
+    )
+
+
+def benchmark_double_buffered(args):
+    # Train with both environment groups stepped together, then with the policy
+    # computing one group's actions while the other group steps
+    from KlaskLib.environment.environment import KlaskEnv
+    from KlaskLib.training.double_buffered import (
+        DoubleBufferedA2C,
+        KlaskDoubleBufferedVecEnv,
+    )
+
+    from gymnasium.wrappers import TimeLimit
+    from stable_baselines3.a2c import A2C
+
+    import gc
+
+    def make_env():
+        env = KlaskEnv(render_mode=None, observation_type=args.observation_type)
+        return TimeLimit(env, max_episode_steps=1000)
+
+    policy = "CnnPolicy" if args.observation_type == "frame" else "MlpPolicy"
+    for name, algorithm in [("sync", A2C), ("double-buffered", DoubleBufferedA2C)]:
+        vec_env = KlaskDoubleBufferedVecEnv([make_env for _ in range(args.envs)])
+        model = algorithm(policy, vec_env, seed=args.seed)
+
+        # Warm up, then time training
+        model.learn(total_timesteps=args.envs * model.n_steps)
+        vec_env.reset_statistics()
+        model.learn(total_timesteps=args.timesteps, reset_num_timesteps=False)
+        statistics = vec_env.statistics()
+        vec_env.close()
+
+        # Frame policies are large, free this one before building the next
+        del model
+        gc.collect()
+
+        print(
+            f"{name:16s} {args.envs} envs ({args.observation_type}): "
+            f"{statistics['samples_per_second']:8.1f} samples/s, "
+            f"learner busy {statistics['learner_busy_fraction'] * 100:5.1f}%, "
+            f"envs busy {statistics['env_busy_fraction'] * 100:5.1f}%"
+        )
+
+
+def benchmark_mirror(args):
+    # Samples per second from stepping environments, with and without the mirrored
+    # counterparts of every transition
+    from KlaskLib.augmentation.augmentation import MirrorAugmenter
+    from KlaskLib.environment.environment import KlaskEnv
+
+    import numpy as np
+
+    env = KlaskEnv(render_mode=None, observation_type=args.observation_type)
+    augmenter = MirrorAugmenter()
+    rng = np.random.default_rng(args.seed)
+
+    # Collect a batch of transitions, timing the environment
+    observation, _ = env.reset(seed=args.seed)
+    batch = {"observations": [], "actions": [], "rewards": [], "terminals": []}
+    start = time.perf_counter()
+    for _ in range(args.batch_size):
+        action = rng.uniform(-1, 1, 2).astype(np.float32)
+        next_observation, reward, terminated, truncated, _ = env.step(action)
+        batch["observations"].append(observation)
+        batch["actions"].append(action)
+        batch["rewards"].append(reward)
+        batch["terminals"].append(terminated)
+        observation = next_observation
+        if terminated or truncated:
+            observation, _ = env.reset()
+    step_time = time.perf_counter() - start
+    batch = {name: np.array(values) for name, values in batch.items()}
+
+    # Warm up (the empty board is rendered once), then time the augmentation
+    augmenter(batch)
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        augmented = augmenter(batch)
+    augment_time = (time.perf_counter() - start) / args.repeats
+
+    samples = len(augmented["actions"])
+    print(
+        f"{args.observation_type} observations, batches of {args.batch_size}: "
+        f"stepping {args.batch_size / step_time:.0f} samples/s, "
+        f"augmenting {(samples - args.batch_size) / augment_time:.0f} samples/s, "
+        f"combined {samples / (step_time + augment_time):.0f} samples/s"
+    )
+
+
+def benchmark_prediction(args):
+    # Error of the analytic ball predictor against the simulator, with the pucks and
+    # biscuits removed from collisions, and the time to predict the whole batch
+    from KlaskLib.prediction.prediction import BallPredictor
+    from KlaskLib.simulator.simulator import KlaskSimulator
+
+    import numpy as np
+
+    predictor = BallPredictor()
+    rng = np.random.default_rng(args.seed)
+    positions = rng.uniform(predictor.low, predictor.high, (args.balls, 2))
+    angles = rng.uniform(0, 2 * np.pi, args.balls)
+    speeds = rng.uniform(50, args.max_speed, args.balls)
+    velocities = np.stack([np.cos(angles), np.sin(angles)], 1) * speeds[:, None]
+
+    # Simulate every ball alone on the board
+    steps = round(max(args.horizons) * 120)
+    truth = np.zeros((args.balls, steps, 2))
+    sim = KlaskSimulator(render_mode=None)
+    start = time.perf_counter()
+    for i in range(args.balls):
+        sim.reset(seed=args.seed)
+        for key in ["puck1", "puck2", "biscuit1", "biscuit2", "biscuit3"]:
+            for fixture in sim.bodies[key].fixtures:
+                filter_data = fixture.filterData
+                filter_data.maskBits = 0
+                fixture.filterData = filter_data
+        sim.bodies["ball"].position = tuple(positions[i] / sim.pixels_per_meter)
+        sim.bodies["ball"].linearVelocity = tuple(velocities[i] / sim.pixels_per_meter)
+        for step in range(steps):
+            _, _, agent_state = sim.step((0, 0), (0, 0), outputs=["agent_state"])
+            truth[i, step] = agent_state["ball_pos_x"], agent_state["ball_pos_y"]
+    sim_time = time.perf_counter() - start
+
+    times = np.arange(1, steps + 1) / 120
+    start = time.perf_counter()
+    prediction = predictor.predict(positions, velocities, times)
+    predict_time = time.perf_counter() - start
+
+    errors = np.linalg.norm(prediction["positions"] - truth, axis=-1)
+    for horizon in args.horizons:
+        error = errors[:, round(horizon * 120) - 1]
+        print(
+            f"{horizon:5.2f}s: mean error {error.mean():6.2f}px, "
+            f"p95 {np.percentile(error, 95):6.2f}px, max {error.max():6.2f}px"
+        )
+    print(
+        f"{args.balls} balls, {steps} ticks: simulator {sim_time * 1e3:.1f}ms, "
+        f"predictor {predict_time * 1e3:.1f}ms, "
+        f"{np.isfinite(prediction['wall_hits']).sum()} wall hits, "
+        f"{(prediction['goals'] != 0).sum()} goals"
+    )
+
+
+def benchmark_multi_board(args):
+    # Board steps per second of K boards in one Box2D world, against K separate
+    # simulators stepped one after the other, with random actions and resets
+    from KlaskLib.environment.environment import MAX_FORCE
+    from KlaskLib.simulator.multi_simulator import KlaskMultiSimulator
+    from KlaskLib.simulator.simulator import KlaskSimulator
+
+    import numpy as np
+
+    playing = KlaskSimulator.GameStates.PLAYING
+    for boards in args.boards:
+        rng = np.random.default_rng(args.seed)
+        actions = rng.uniform(-MAX_FORCE, MAX_FORCE, (args.steps, 2, boards, 2))
+
+        sims = [KlaskSimulator(render_mode=None) for _ in range(boards)]
+        for sim in sims:
+            sim.reset(seed=args.seed)
+        start = time.perf_counter()
+        for step in range(args.steps):
+            for board, sim in enumerate(sims):
+                _, game_states, _ = sim.step(
+                    tuple(actions[step, 0, board]),
+                    tuple(actions[step, 1, board]),
+                    outputs=["game_state", "agent_state"],
+                )
+                if playing not in game_states:
+                    sim.reset()
+        separate_time = time.perf_counter() - start
+
+        multi = KlaskMultiSimulator(boards)
+        multi.reset(seed=args.seed)
+        start = time.perf_counter()
+        for step in range(args.steps):
+            game_states, _ = multi.step(actions[step, 0], actions[step, 1])
+            ended = np.flatnonzero(~game_states & (1 << playing.value))
+            if len(ended):
+                multi.reset(boards=ended)
+        multi_time = time.perf_counter() - start
+
+        board_steps = boards * args.steps
+        print(
+            f"{boards:4d} boards: separate simulators "
+            f"{board_steps / separate_time:8.0f} board steps/s, one world "
+            f"{board_steps / multi_time:8.0f} board steps/s "
+            f"({separate_time / multi_time:.1f}x)"
+        )
+
+
+def benchmark_observations(args):
+    # Environment steps per second and pixels per observation of every observation type
+    from KlaskLib.environment.environment import KlaskEnv
+
+    import numpy as np
+
+    for observation_type in args.observation_types:
+        env = KlaskEnv(render_mode=None, observation_type=observation_type)
+        rng = np.random.default_rng(args.seed)
+        observation, _ = env.reset(seed=args.seed)
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            action = rng.uniform(-1, 1, 2).astype(np.float32)
+            observation, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                observation, _ = env.reset()
+        elapsed = time.perf_counter() - start
+
+        frame = (
+            observation["frame"] if observation_type == "half_frame" else observation
+        )
+        pixels = frame.size // 3 if frame.ndim == 3 else 0
+        print(
+            f"{observation_type:10s}: {args.steps / elapsed:7.0f} steps/s, "
+            f"{pixels} pixels per observation"
+        )
+        env.close()
+
+
+def benchmark_async_vec_env(args):
+    # Samples per second and batch latency of partial batches, from synchronous
+    # stepping (batch size equal to the environments) down to small batches
+    from KlaskLib.environment.environment import KlaskEnv
+    from KlaskLib.training.async_vec_env import KlaskAsyncVecEnv
+
+    from gymnasium.wrappers import TimeLimit
+
+    import numpy as np
+
+    def make_env():
+        env = KlaskEnv(render_mode=None, observation_type=args.observation_type)
+        return TimeLimit(env, max_episode_steps=1000)
+
+    for batch_size in args.batch_sizes:
+        vec_env = KlaskAsyncVecEnv([make_env for _ in range(args.envs)], batch_size)
+        rng = np.random.default_rng(args.seed)
+        _, _, _, _, env_ids = vec_env.reset(seed=args.seed)
+
+        # Warm up, then time stepping, standing in for the policy with a delay per
+        # batch
+        for timed in [False, True]:
+            if timed:
+                vec_env.reset_statistics()
+            for _ in range(args.samples // batch_size if timed else 10):
+                time.sleep(args.inference_ms / 1000)
+                actions = rng.uniform(-1, 1, (batch_size, 2)).astype(np.float32)
+                _, _, _, _, env_ids = vec_env.step(actions, env_ids)
+        statistics = vec_env.statistics()
+        vec_env.close()
+
+        print(
+            f"M={args.envs} N={batch_size:<3d}: "
+            f"{statistics['samples_per_second']:8.1f} samples/s, "
+            f"batch latency p50 {statistics['latency_p50'] * 1000:6.2f}ms, "
+            f"p99 {statistics['latency_p99'] * 1000:6.2f}ms, "
+            f"max {statistics['latency_max'] * 1000:6.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Klask performance benchmarks")
+    subparsers = parser.add_subparsers(required=True)
+
+    inference = subparsers.add_parser(
+        "inference", help="batched inference serving many concurrent games"
+    )
+    inference.add_argument("checkpoint", help="checkpoint path, e.g. in weights/")
+    inference.add_argument("--algorithm", default="A2C", help="checkpoint algorithm")
+    inference.add_argument(
+        "--backend", default="auto", choices=["auto", "torch", "onnx"]
+    )
+    inference.add_argument("--threads", type=int, default=1, help="inference threads")
+    inference.add_argument("--games", type=int, default=24, help="concurrent games")
+    inference.add_argument("--steps", type=int, default=100, help="steps per game")
+    inference.add_argument(
+        "--max-wait", type=float, default=0.002, help="batching window in seconds"
+    )
+    inference.set_defaults(run=benchmark_inference)
+
+    contacts = subparsers.add_parser(
+        "contacts", help="simulator step time under heavy contact"
+    )
+    contacts.add_argument("--steps", type=int, default=20000, help="steps to time")
+    contacts.add_argument("--seed", type=int, default=1, help="reset seed")
+    contacts.add_argument(
+        "--record-contacts", action="store_true", help="record contact events"
+    )
+    contacts.set_defaults(run=benchmark_contacts)
+
+    opponents = subparsers.add_parser(
+        "opponents", help="scripted opponent actions for batches of boards"
+    )
+    opponents.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 64, 1024], help="boards"
+    )
+    opponents.add_argument("--repeats", type=int, default=200, help="calls to time")
+    opponents.add_argument("--seed", type=int, default=1, help="state sample seed")
+    opponents.set_defaults(run=benchmark_opponents)
+
+    soak = subparsers.add_parser(
+        "soak", help="process footprint over many reset/step cycles"
+    )
+    soak.add_argument(
+        "--render-modes",
+        nargs="+",
+        default=["none", "rgb_array", "human_unclocked"],
+        choices=["none", "rgb_array", "human", "human_unclocked"],
+    )
+    soak.add_argument(
+        "--cycles", type=int, default=1000000, help="resets per render mode"
+    )
+    soak.add_argument("--steps", type=int, default=20, help="max steps per cycle")
+    soak.add_argument(
+        "--sample-every", type=int, default=10000, help="cycles between samples"
+    )
+    soak.add_argument(
+        "--max-rss-growth", type=float, default=16.0, help="allowed growth in MB"
+    )
+    soak.add_argument(
+        "--max-object-growth", type=int, default=1000, help="allowed Python objects"
+    )
+    soak.add_argument("--seed", type=int, default=1, help="action seed")
+    soak.set_defaults(run=benchmark_soak)
+
+    distributed = subparsers.add_parser(
+        "distributed", help="distributed vec env with localhost rollout workers"
+    )
+    distributed.add_argument("--workers", type=int, default=2, help="worker processes")
+    distributed.add_argument("--envs", type=int, default=4, help="envs per worker")
+    distributed.add_argument("--steps", type=int, default=200, help="vec steps")
+    distributed.add_argument(
+        "--observation-type", default="frame", choices=["frame", "state"]
+    )
+    distributed.add_argument(
+        "--no-compress", action="store_true", help="send uncompressed results"
+    )
+    distributed.set_defaults(run=benchmark_distributed)
+
+    double_buffered = subparsers.add_parser(
+        "double-buffered", help="A2C training with overlapped physics and inference"
+    )
+    double_buffered.add_argument("--envs", type=int, default=6, help="environments")
+    double_buffered.add_argument(
+        "--timesteps", type=int, default=1200, help="timesteps to time"
+    )
+    double_buffered.add_argument(
+        "--observation-type", default="frame", choices=["frame", "state"]
+    )
+    double_buffered.add_argument("--seed", type=int, default=1, help="training seed")
+    double_buffered.set_defaults(run=benchmark_double_buffered)
+
+    mirror = subparsers.add_parser(
+        "mirror", help="mirrored transition augmentation throughput"
+    )
+    mirror.add_argument("--batch-size", type=int, default=64, help="transitions")
+    mirror.add_argument("--repeats", type=int, default=5, help="batches to time")
+    mirror.add_argument(
+        "--observation-type", default="frame", choices=["frame", "state"]
+    )
+    mirror.add_argument("--seed", type=int, default=1, help="reset and action seed")
+    mirror.set_defaults(run=benchmark_mirror)
+
+    prediction = subparsers.add_parser(
+        "prediction", help="analytic ball predictor against the simulator"
+    )
+    prediction.add_argument("--balls", type=int, default=256, help="initial states")
+    prediction.add_argument(
+        "--horizons", type=float, nargs="+", default=[0.25, 0.5, 1.0, 2.0]
+    )
+    prediction.add_argument(
+        "--max-speed", type=float, default=1500, help="initial speed in px/s"
+    )
+    prediction.add_argument("--seed", type=int, default=1, help="state sample seed")
+    prediction.set_defaults(run=benchmark_prediction)
+
+    multi_board = subparsers.add_parser(
+        "multi-board", help="many boards in one Box2D world against separate ones"
+    )
+    multi_board.add_argument(
+        "--boards", type=int, nargs="+", default=[1, 8, 64], help="boards"
+    )
+    multi_board.add_argument("--steps", type=int, default=1000, help="steps to time")
+    multi_board.add_argument(
+        "--seed", type=int, default=1, help="reset and action seed"
+    )
+    multi_board.set_defaults(run=benchmark_multi_board)
+
+    observations = subparsers.add_parser(
+        "observations", help="environment step rate of every observation type"
+    )
+    observations.add_argument(
+        "--observation-types",
+        nargs="+",
+        default=["frame", "half_frame", "state"],
+        choices=["frame", "half_frame", "state"],
+    )
+    observations.add_argument("--steps", type=int, default=1000, help="steps to time")
+    observations.add_argument(
+        "--seed", type=int, default=1, help="reset and action seed"
+    )
+    observations.set_defaults(run=benchmark_observations)
+
+    async_vec_env = subparsers.add_parser(
+        "async-vec-env", help="partial batch stepping against synchronous stepping"
+    )
+    async_vec_env.add_argument("--envs", type=int, default=8, help="environments")
+    async_vec_env.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[8, 6, 4, 2], help="batch sizes"
+    )
+    async_vec_env.add_argument(
+        "--samples", type=int, default=2000, help="samples to time"
+    )
+    async_vec_env.add_argument(
+        "--inference-ms", type=float, default=0.0, help="policy delay per batch"
+    )
+    async_vec_env.add_argument(
+        "--observation-type", default="frame", choices=["frame", "state"]
+    )
+    async_vec_env.add_argument("--seed", type=int, default=1, help="reset seed")
+    async_vec_env.set_defaults(run=benchmark_async_vec_env)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
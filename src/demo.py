@@ -1,13 +1,24 @@
 # Klask Reborn
 # 2024 Braedan Kennedy (kennedyengineering)
 
+from KlaskLib.environment.environment import MAX_FORCE
+from KlaskLib.latency.latency import LatencyTracer, format_summary
+from KlaskLib.opponents.opponents import opponents
 from KlaskLib.simulator.simulator import KlaskSimulator
+import argparse
 import contextlib
+import time
+
+import numpy as np
 
 with contextlib.redirect_stdout(None):
     import pygame
 
 
+# Longest frame time the fixed timestep loop catches up on (s)
+MAX_FRAME_TIME = 0.25
+
+
 class KeyboardController:
     __position_x = 0
     __position_y = 0
@@ -43,21 +54,30 @@ class KeyboardController:
         self.__position_x -= 1
 
 
-# Initialize the simulator
-sim = KlaskSimulator(render_mode="human")
-
-sim.reset()
+class BotController(KeyboardController):
+    def __init__(self, opponent, sim):
+        # Keyboard inputs are ignored, the scripted opponent drives the puck
+        super().__init__(MAX_FORCE)
+        self.opponent = opponent
+        self.sim = sim
 
-# Initialize the controllers
-force = 0.005
-p1 = KeyboardController(force)
-p2 = KeyboardController(force)
+    def getAction(self):
+        # Act as player 2 on the current agent states, like KlaskEnv opponents
+        agent_states = self.sim.get_agent_state()
+        states = np.fromiter(agent_states.values(), dtype=np.float64)
+        action = self.opponent(states[None], player=2)[0]
+        return (float(action[0]) * self.force, float(action[1]) * self.force)
 
-running = True
 
-while running:
+def handle_events(p1, p2, tracer=None):
     # Check the event queue (only accessable if render_mode="human", is optional)
+    running = True
+    if tracer is not None:
+        tracer.poll()
     for event in pygame.event.get():
+        if tracer is not None and event.type in [pygame.KEYDOWN, pygame.KEYUP]:
+            tracer.input(pygame.key.name(event.key))
+
         if event.type == pygame.QUIT or (
             event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
         ):
@@ -106,6 +126,131 @@ while running:
             if event.key == pygame.K_DOWN:
                 p2.keyDown_released()
 
-    sim.step(p1.getAction(), p2.getAction())
+    return running
+
+
+def step(sim, p1, p2, tracer=None):
+    # Step the physics alone, timing the tick when tracing
+    if tracer is not None:
+        tracer.tick_begin()
+    sim.step(p1.getAction(), p2.getAction(), outputs=[])
+    if tracer is not None:
+        tracer.tick_end()
+
+
+def render(sim, tracer=None, alpha=1.0):
+    # Draw and flip the frame, timing it when tracing
+    if tracer is not None:
+        tracer.render_begin()
+    sim.render(alpha=alpha)
+    if tracer is not None:
+        tracer.render_end()
+        tracer.present(sim.present_time)
+
+
+def wait(clock, display_fps, tracer=None):
+    # Sleep off the rest of the frame period, timing the wait when tracing
+    if tracer is not None:
+        tracer.wait_begin()
+    clock.tick(display_fps)
+    if tracer is not None:
+        tracer.wait_end()
+
+
+def run_clocked(sim, p1, p2, tracer=None):
+    # Input, physics and rendering share one loop paced by the display frame rate
+    clock = pygame.time.Clock()
+    running = True
+    while running:
+        running = handle_events(p1, p2, tracer)
+
+        step(sim, p1, p2, tracer)
+        render(sim, tracer)
+        wait(clock, sim.display_fps, tracer)
+
+
+def run_fixed_timestep(sim, p1, p2, tracer=None):
+    # Physics advances on a fixed timestep accumulator, decoupled from the display.
+    # Input is sampled right before every physics tick, and rendering interpolates
+    # between the last two physics states at whatever rate the display sustains.
+    # Frame times are clamped, so a stall drops game time instead of catching up on
+    # every missed tick before drawing again. Rendering is paced to the display
+    # frame rate.
+    clock = pygame.time.Clock()
+    running = True
+    accumulator = 0.0
+    previous_time = time.perf_counter()
+    while running:
+        # Accumulate the elapsed wall clock time, slow frames are caught up on
+        current_time = time.perf_counter()
+        accumulator += min(current_time - previous_time, MAX_FRAME_TIME)
+        previous_time = current_time
+
+        # Advance the physics in fixed increments
+        while running and accumulator >= sim.time_step:
+            running = handle_events(p1, p2, tracer)
+
+            step(sim, p1, p2, tracer)
+            accumulator -= sim.time_step
+
+        # Render the interpolated state
+        if running:
+            render(sim, tracer, alpha=accumulator / sim.time_step)
+            wait(clock, sim.display_fps, tracer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Klask using the keyboard")
+    parser.add_argument(
+        "--fixed-timestep",
+        action="store_true",
+        help="advance physics at a fixed rate independent of the display frame rate "
+        f"(stalls longer than {MAX_FRAME_TIME:g}s drop game time)",
+    )
+    parser.add_argument(
+        "--opponent", choices=list(opponents), help="scripted bot for player 2"
+    )
+    parser.add_argument(
+        "--trace-latency",
+        action="store_true",
+        help="report input to display latency and frame times on exit",
+    )
+    parser.add_argument(
+        "--trace-output",
+        metavar="PATH",
+        help="also write a Chrome trace of the session (implies --trace-latency)",
+    )
+    args = parser.parse_args()
+
+    # Initialize the simulator, the loops render and pace the display themselves
+    sim = KlaskSimulator(render_mode="human_unclocked")
+
+    sim.reset()
+
+    # Initialize the controllers
+    force = 0.005
+    p1 = KeyboardController(force)
+    if args.opponent is None:
+        p2 = KeyboardController(force)
+    else:
+        p2 = BotController(opponents[args.opponent](), sim)
+
+    tracer = None
+    if args.trace_latency or args.trace_output is not None:
+        tracer = LatencyTracer()
+
+    if args.fixed_timestep:
+        run_fixed_timestep(sim, p1, p2, tracer)
+    else:
+        run_clocked(sim, p1, p2, tracer)
+
+    sim.close()
+
+    if tracer is not None:
+        print(format_summary(tracer.summary()))
+        if args.trace_output is not None:
+            tracer.export_chrome_trace(args.trace_output)
+
 
-sim.close()
+if __name__ == "__main__":
+    main()
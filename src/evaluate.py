@@ -0,0 +1,83 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.evaluation.tournament import OUTCOMES, run_tournament, summarize
+
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Round robin tournament between checkpoints and scripted baselines"
+    )
+    parser.add_argument(
+        "players",
+        nargs="+",
+        help='checkpoints ("weights/x.zip" or "PPO:weights/x.zip"), baselines '
+        '("baseline:stationary", "baseline:random", "baseline:chaser") and scripted '
+        'opponents ("scripted:goalkeeper", "scripted:shot_taker", ...)',
+    )
+    parser.add_argument("--games", type=int, default=20, help="games per pairing")
+    parser.add_argument("--max-steps", type=int, default=1000, help="steps per game")
+    parser.add_argument("--seed", type=int, default=0, help="tournament seed")
+    parser.add_argument("--workers", type=int, help="processes, defaults to all cores")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join("runs", "tournament"),
+        help="directory caching the results of finished pairings",
+    )
+    parser.add_argument(
+        "--bootstrap", type=int, default=1000, help="bootstrap resamples for the CI"
+    )
+    args = parser.parse_args()
+
+    def progress(spec_a, spec_b, counts):
+        print(f"finished {spec_a} vs {spec_b}: {counts}", flush=True)
+
+    results = run_tournament(
+        args.players,
+        games=args.games,
+        max_steps=args.max_steps,
+        seed=args.seed,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        progress=progress,
+    )
+    ratings = summarize(args.players, results, bootstrap=args.bootstrap)
+
+    # Ratings table
+    print()
+    print(f"{'player':<40} {'elo':>8} {'95% CI':>17}")
+    for rating in ratings:
+        print(
+            f"{rating['player']:<40} {rating['elo']:>8.1f} "
+            f"[{rating['elo_low']:>7.1f}, {rating['elo_high']:>7.1f}]"
+        )
+
+    # Outcome breakdown per pairing, from the perspective of the first player
+    print()
+    print(f"{'pairing':<60} " + " ".join(f"{outcome:>16}" for outcome in OUTCOMES))
+    for (spec_a, spec_b), counts in results.items():
+        print(
+            f"{spec_a + ' vs ' + spec_b:<60} "
+            + " ".join(f"{counts[outcome]:>16}" for outcome in OUTCOMES)
+        )
+
+    with open(os.path.join(args.cache_dir, "summary.json"), "w") as f:
+        json.dump(
+            {
+                "ratings": ratings,
+                "pairings": [
+                    {"first": spec_a, "second": spec_b, "counts": counts}
+                    for (spec_a, spec_b), counts in results.items()
+                ],
+            },
+            f,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.rollouts.rollouts import policies, run_rollouts
+
+import argparse
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate headless rollouts from scripted or random policies"
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join("runs", "rollouts"),
+        help="directory for shards and the manifest, reruns resume here",
+    )
+    parser.add_argument(
+        "--transitions", type=int, default=1000000, help="transitions to generate"
+    )
+    parser.add_argument(
+        "--shard-size", type=int, default=100000, help="transitions per shard"
+    )
+    parser.add_argument(
+        "--games", type=int, default=32, help="games played in lockstep per worker"
+    )
+    parser.add_argument("--max-steps", type=int, default=1000, help="steps per game")
+    parser.add_argument("--player1", default="random", choices=policies)
+    parser.add_argument("--player2", default="random", choices=policies)
+    parser.add_argument("--seed", type=int, default=0, help="run seed")
+    parser.add_argument("--workers", type=int, help="processes, defaults to all cores")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generated = 0
+
+    def progress(shard, finished, total):
+        nonlocal generated
+        generated += shard["transitions"]
+        rate = generated / (time.perf_counter() - start)
+        print(
+            f"shard {shard['index']} done ({finished}/{total}): "
+            f"{shard['transitions']} transitions, {shard['episodes']} episodes, "
+            f"{rate:.0f} transitions/s",
+            flush=True,
+        )
+
+    manifest = run_rollouts(
+        args.output,
+        args.transitions,
+        shard_size=args.shard_size,
+        games=args.games,
+        max_steps=args.max_steps,
+        player1=args.player1,
+        player2=args.player2,
+        seed=args.seed,
+        workers=args.workers,
+        progress=progress,
+    )
+    print(f"manifest written to {manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.environment.environment import MAX_FORCE
+from KlaskLib.server.client import KlaskMatchClient
+from KlaskLib.server.protocol import MSG_STATE
+
+import argparse
+import asyncio
+import random
+import time
+
+
+async def connect(args):
+    if args.unix is not None:
+        return await KlaskMatchClient.connect_unix(args.unix)
+    return await KlaskMatchClient.connect_tcp(args.host, args.port)
+
+
+async def run_bot(client, deadline, arrivals):
+    # Answer every state with a random action until the deadline passes
+    rng = random.Random()
+    previous = None
+    while time.perf_counter() < deadline:
+        msg_type, _ = await client.receive()
+        if msg_type != MSG_STATE:
+            continue
+
+        now = time.perf_counter()
+        if previous is not None:
+            arrivals.append(now - previous)
+        previous = now
+
+        client.send_action(
+            (rng.uniform(-MAX_FORCE, MAX_FORCE), rng.uniform(-MAX_FORCE, MAX_FORCE))
+        )
+
+
+async def run_stage(args, num_matches, first_match_id):
+    # Play bot-vs-bot in every match and collect server and client statistics
+    clients = []
+    for match_id in range(first_match_id, first_match_id + num_matches):
+        for player in (1, 2):
+            client = await connect(args)
+            client.join(match_id, player)
+            clients.append(client)
+
+    # Reset the server statistics at the start of the stage
+    monitor = await connect(args)
+    monitor.request_stats()
+    await monitor.receive()
+
+    deadline = time.perf_counter() + args.duration
+    arrivals = []
+    await asyncio.gather(*[run_bot(client, deadline, arrivals) for client in clients])
+
+    monitor.request_stats()
+    _, (ticks, duration, p50, p99, maximum) = await monitor.receive()
+
+    for client in clients + [monitor]:
+        await client.close()
+
+    arrivals.sort()
+    client_p99 = arrivals[int(0.99 * (len(arrivals) - 1))] if arrivals else 0.0
+    states_per_sec = len(arrivals) / args.duration / len(clients)
+
+    print(
+        f"{num_matches:>8} {ticks / duration:>10.1f} {p50 * 1e3:>10.3f} "
+        f"{p99 * 1e3:>10.3f} {maximum * 1e3:>10.3f} {states_per_sec:>12.1f} "
+        f"{client_p99 * 1e3:>12.3f}"
+    )
+
+
+async def load_test(args):
+    print(
+        f"{'matches':>8} {'ticks/s':>10} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'max ms':>10} {'states/s':>12} {'gap p99 ms':>12}"
+    )
+    first_match_id = 0
+    for num_matches in args.matches:
+        await run_stage(args, num_matches, first_match_id)
+        first_match_id += num_matches
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure KlaskMatchServer tick rate and latency as matches grow"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="TCP server address")
+    parser.add_argument("--port", type=int, default=7777, help="TCP server port")
+    parser.add_argument("--unix", help="Unix socket path to connect to instead")
+    parser.add_argument(
+        "--matches",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16, 64],
+        help="concurrent bot-vs-bot match counts to test",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="seconds per match count"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(load_test(args))
+
+
+if __name__ == "__main__":
+    main()
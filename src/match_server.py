@@ -0,0 +1,42 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.server.server import KlaskMatchServer
+
+import argparse
+import asyncio
+
+
+async def serve(args):
+    server = KlaskMatchServer(tick_rate=args.tick_rate, seed=args.seed)
+
+    if args.unix is not None:
+        await server.start_unix(args.unix)
+        print(f"Serving Klask matches on {args.unix}")
+    else:
+        port = await server.start_tcp(args.host, args.port)
+        print(f"Serving Klask matches on {args.host}:{port}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many concurrent Klask matches")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to bind")
+    parser.add_argument("--port", type=int, default=7777, help="TCP port to bind")
+    parser.add_argument("--unix", help="Unix socket path to bind instead of TCP")
+    parser.add_argument("--tick-rate", type=int, default=120, help="ticks per second")
+    parser.add_argument("--seed", type=int, help="base seed for match resets")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.distributed.protocol import OBSERVATION_TYPES
+from KlaskLib.distributed.worker import KlaskRolloutWorker
+from KlaskLib.opponents.opponents import opponents
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Host a block of Klask environments for a remote learner"
+    )
+    parser.add_argument("host", help="learner host")
+    parser.add_argument("port", type=int, help="learner port")
+    parser.add_argument("--envs", type=int, default=8, help="environments hosted")
+    parser.add_argument(
+        "--observation-type", default="frame", choices=OBSERVATION_TYPES
+    )
+    parser.add_argument(
+        "--opponent", choices=list(opponents), help="scripted player 2 opponent"
+    )
+    parser.add_argument(
+        "--max-episode-steps", type=int, default=1000, help="steps per episode"
+    )
+    parser.add_argument(
+        "--no-compress", action="store_true", help="send uncompressed results"
+    )
+    parser.add_argument(
+        "--reconnect-delay", type=float, default=1.0, help="seconds between retries"
+    )
+    args = parser.parse_args()
+
+    worker = KlaskRolloutWorker(
+        args.envs,
+        observation_type=args.observation_type,
+        opponent=args.opponent,
+        max_episode_steps=args.max_episode_steps,
+        compress=not args.no_compress,
+    )
+    try:
+        worker.run(args.host, args.port, reconnect_delay=args.reconnect_delay)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.spectator.spectator import DEFAULT_PORT, KlaskSpectator
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch every board publishing snapshots in one tiled window"
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port")
+    parser.add_argument("--tile-width", type=int, default=160, help="board width")
+    parser.add_argument("--columns", type=int, help="boards per row")
+    parser.add_argument("--fps", type=int, default=30, help="redraw rate")
+    args = parser.parse_args()
+
+    spectator = KlaskSpectator(
+        host=args.host,
+        port=args.port,
+        tile_width=args.tile_width,
+        columns=args.columns,
+        fps=args.fps,
+    )
+    try:
+        spectator.run()
+    finally:
+        spectator.close()
+
+
+if __name__ == "__main__":
+    main()
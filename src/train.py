@@ -2,18 +2,33 @@
 # 2024 Braedan Kennedy (kennedyengineering)
 
 from stable_baselines3.a2c import A2C
+from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
 
 from gymnasium.wrappers.time_limit import TimeLimit
 
 from KlaskLib.environment.environment import KlaskEnv
+from KlaskLib.spectator.spectator import DEFAULT_PORT, SpectatorPublisher
+from KlaskLib.training.double_buffered import (
+    DoubleBufferedA2C,
+    KlaskDoubleBufferedVecEnv,
+)
 
+import argparse
 
-def make_env():
+
+def make_env(board, monitor=False, spectator=None):
     def _init():
 
-        env = KlaskEnv(render_mode="human_unclocked")
+        # Spectated environments stay headless and publish snapshots instead
+        if spectator is None:
+            env = KlaskEnv(render_mode="human_unclocked")
+        else:
+            env = KlaskEnv(render_mode=None)
+            env = SpectatorPublisher(env, board, *spectator)
         env = TimeLimit(env, max_episode_steps=1000)
+        if monitor:
+            env = Monitor(env)
 
         return env
 
@@ -21,10 +36,44 @@ def make_env():
 
 
 def main():
-    vec_env = SubprocVecEnv([make_env() for _ in range(5)])
-    vec_env = VecMonitor(vec_env)
+    parser = argparse.ArgumentParser(description="Train a Klask agent with A2C")
+    parser.add_argument("--envs", type=int, default=5, help="environments")
+    parser.add_argument(
+        "--double-buffered",
+        action="store_true",
+        help="compute actions for half of the environments while the other half steps",
+    )
+    parser.add_argument(
+        "--spectate",
+        nargs="?",
+        const=f"127.0.0.1:{DEFAULT_PORT}",
+        metavar="HOST:PORT",
+        help="publish headless boards to src/spectator.py instead of opening windows",
+    )
+    args = parser.parse_args()
+
+    spectator = None
+    if args.spectate is not None:
+        host, port = args.spectate.rsplit(":", 1)
+        spectator = (host, int(port))
+
+    if args.double_buffered:
+        # Episodes are monitored per environment, the groups are stepped separately
+        vec_env = KlaskDoubleBufferedVecEnv(
+            [make_env(i, monitor=True, spectator=spectator) for i in range(args.envs)]
+        )
+        model = DoubleBufferedA2C("CnnPolicy", vec_env, verbose=1)
+    else:
+        vec_env = SubprocVecEnv(
+            [make_env(i, spectator=spectator) for i in range(args.envs)]
+        )
+        vec_env = VecMonitor(vec_env)
+        model = A2C("CnnPolicy", vec_env, verbose=1)
+
+    model.learn(total_timesteps=100_000)
 
-    model = A2C("CnnPolicy", vec_env, verbose=1).learn(total_timesteps=100_000)
+    if args.double_buffered:
+        print(vec_env.statistics())
 
 
 if __name__ == "__main__":
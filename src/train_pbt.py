@@ -0,0 +1,81 @@
+# Klask Reborn
+# 2024 Braedan Kennedy (kennedyengineering)
+
+from KlaskLib.opponents.opponents import opponents
+from KlaskLib.pbt.pbt import HYPERPARAMETERS, run_pbt
+
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Population based training of Klask agents across all cores"
+    )
+    parser.add_argument(
+        "--name", default="pbt", help="run name, under runs/ and weights/"
+    )
+    parser.add_argument("--members", type=int, default=4, help="population size")
+    parser.add_argument(
+        "--generations", type=int, default=10, help="generations to train"
+    )
+    parser.add_argument(
+        "--timesteps",
+        type=int,
+        default=20000,
+        help="timesteps per member and generation",
+    )
+    parser.add_argument("--algorithm", default="A2C", choices=list(HYPERPARAMETERS))
+    parser.add_argument(
+        "--observation-type", default="state", choices=["frame", "state"]
+    )
+    parser.add_argument(
+        "--opponent", choices=list(opponents), help="scripted player 2 opponent"
+    )
+    parser.add_argument(
+        "--envs-per-core", type=int, default=1, help="environments per core of a member"
+    )
+    parser.add_argument(
+        "--exploit-fraction",
+        type=float,
+        default=0.25,
+        help="fraction of members replaced by copies of the best every generation",
+    )
+    parser.add_argument(
+        "--games", type=int, default=20, help="evaluation games per pairing"
+    )
+    parser.add_argument("--max-steps", type=int, default=1000, help="steps per game")
+    parser.add_argument("--seed", type=int, default=0, help="run seed")
+    args = parser.parse_args()
+
+    def progress(record):
+        print(f"generation {record['generation']}:", flush=True)
+        for member in sorted(record["members"], key=lambda member: -member["elo"]):
+            copied = member["copied_from"]
+            print(
+                f"  member {member['member']:3d}: elo {member['elo']:7.1f}, "
+                f"return {member['mean_return']}, {member['hyperparameters']}"
+                + ("" if copied is None else f" -> copies member {copied}"),
+                flush=True,
+            )
+
+    run_pbt(
+        os.path.join("runs", args.name),
+        os.path.join("weights", args.name),
+        members=args.members,
+        generations=args.generations,
+        timesteps=args.timesteps,
+        algorithm=args.algorithm,
+        observation_type=args.observation_type,
+        opponent=args.opponent,
+        envs_per_core=args.envs_per_core,
+        exploit_fraction=args.exploit_fraction,
+        games=args.games,
+        max_steps=args.max_steps,
+        seed=args.seed,
+        progress=progress,
+    )
+
+
+if __name__ == "__main__":
+    main()